@@ -3,21 +3,32 @@ LLM + TTS API 服務
 提供 RESTful API 供前端呼叫
 """
 
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
+import json
 import logging
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Sequence, Tuple
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 
 # 導入現有模組
-from prompts import get_chat_prompt, get_brand_info, get_quick_questions, is_valid_brand
-from tts_service import generate_audio, set_voice
-from config import GEMMA_MODELS, TTS_VOICES, DEFAULT_SETTINGS
-from json_database import json_db, init_admin_code
+from prompts import get_chat_prompt, get_prompt_prefix, get_available_styles, get_brand_info, get_quick_questions, is_valid_brand, build_knowledge_indexes, registry as prompt_registry, retriever as knowledge_retriever
+from tts_service import generate_audio, synthesize, stream_audio, encode_audio, get_tts_stats
+from text_utils import ResponseLimiter, resolve_length_limit, truncate_sentences
+from faq import faq_matcher
+from llm_service import llm_service
+from quick_answers import quick_answer_store
+from response_cache import llm_response_cache
+from concurrency import ConcurrencyLimitExceeded
+from config import GEMMA_MODELS, TTS_VOICES, DEFAULT_SETTINGS, LLM_SETTINGS, QUICK_ANSWER_SETTINGS, API_WORKERS, CONTEXT_CACHE_SETTINGS, RETRIEVAL_SETTINGS
+from storage import db, init_admin_code
+from log_writer import chat_log_writer
+from exporters import EXPORT_FORMATS, LOG_EXPORT_FIELDS, CODE_EXPORT_FIELDS, iter_export
 
 # 載入環境變數
 load_dotenv()
@@ -26,6 +37,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 管理員對話記錄查詢的每頁筆數上限
+ADMIN_LOG_PAGE_LIMIT = 1000
+
 # 初始化 FastAPI
 app = FastAPI(
     title="AI Assistant API",
@@ -88,6 +102,14 @@ class DeleteCodeRequest(BaseModel):
     code_to_delete: str  # 要刪除的序號
     admin_code: str      # 管理員序號
 
+class QuickAnswerWarmUpRequest(BaseModel):
+    admin_code: str      # 管理員序號
+    brand: Optional[str] = None  # 指定品牌，預設為所有品牌
+
+class CacheInvalidateRequest(BaseModel):
+    admin_code: str      # 管理員序號
+    brand: Optional[str] = None  # 指定品牌，預設為所有品牌
+
 class CreateCustomCodeRequest(BaseModel):
     custom_code: str     # 自定義序號
     code_type: str = "one_time"  # "one_time" 或 "permanent"
@@ -136,58 +158,186 @@ def get_user_agent(request: Request) -> str:
 
 async def validate_session_dependency(request: Request, session_id: str) -> dict:
     """驗證會話的依賴函數"""
-    session_info = json_db.validate_session(session_id)
+    session_info = db.validate_session(session_id)
     if not session_info["valid"]:
         raise HTTPException(status_code=401, detail=session_info["reason"])
     
     # 更新會話活動時間
-    json_db.update_session_activity(session_id)
+    db.update_session_activity(session_id)
     
     return session_info
 
+async def resolve_chat_session(brand: str, session_id: str, http_request: Request) -> Optional[dict]:
+    """依品牌規則驗證聊天會話
+    
+    Returns:
+        會話資訊，允許匿名訪問的品牌返回 None
+    """
+    # 創造智能科技不需要驗證，其他品牌預設需要驗證
+    if brand == 'creative_tech':
+        return None
+    
+    return await validate_session_dependency(http_request, session_id)
 
-async def get_llm_response(user_input: str, model_name: str = None, brand: str = "creative_tech", style: str = "professional") -> str:
-    """從 Gemini 獲取回應 - 使用多品牌智能提示詞系統"""
+
+def resolve_brand(brand: str, style: str) -> Tuple[str, str]:
+    """檢查品牌是否有效，無效時改用預設品牌與風格"""
+    if not is_valid_brand(brand):
+        logger.warning(f"無效的品牌: {brand}，使用預設品牌")
+        return "creative_tech", "professional"
+    return brand, style
+
+def validate_user_input(user_input: str) -> Optional[str]:
+    """檢查用戶輸入
+    
+    Returns:
+        輸入無效時返回提示訊息，有效時返回 None
+    """
+    # 檢查輸入是否有效
+    if not user_input or not user_input.strip():
+        return "請提供有效的問題"
+    
+    # 檢查輸入長度
+    if len(user_input) > 1000:
+        return "輸入太長了，請縮短您的問題"
+    
+    return None
+
+def build_llm_prompt(user_input: str, brand: str, style: str) -> str:
+    """生成完整提示詞 (品牌需先經 resolve_brand 檢查，輸入需先經 validate_user_input 檢查)"""
+    # 使用多品牌提示詞系統
+    logger.info(f"使用品牌 {brand} 的提示詞: {user_input[:30]}...")
+    return get_chat_prompt(brand, user_input, style)
+
+async def get_llm_response(user_input: str, model_name: str = None, brand: str = "creative_tech", style: str = "professional",
+                           max_output_tokens: Optional[int] = None) -> str:
+    """從 Gemini 獲取回應 - 使用多品牌智能提示詞系統
+    
+    max_output_tokens 限制生成長度；回應仍可能略長於請求字數，由呼叫端以 truncate_sentences() 在句子邊界截斷
+    """
     try:
-        # 檢查輸入是否有效
-        if not user_input or not user_input.strip():
-            return "請提供有效的問題"
+        brand, style = resolve_brand(brand, style)
+        selected_model = model_name or DEFAULT_SETTINGS["llm_model"]
         
-        # 檢查輸入長度
-        if len(user_input) > 1000:
-            return "輸入太長了，請縮短您的問題"
+        # 預設問題直接使用預先生成的回答
+        quick_answer = quick_answer_store.get(brand, style, user_input, selected_model, max_output_tokens)
+        if quick_answer:
+            logger.info(f"使用預先生成的回答: {user_input[:30]}")
+            return quick_answer
         
-        # 檢查品牌是否有效
-        if not is_valid_brand(brand):
-            logger.warning(f"無效的品牌: {brand}，使用預設品牌")
-            brand = "creative_tech"
-            style = "professional"
+        invalid_message = validate_user_input(user_input)
+        if invalid_message:
+            return invalid_message
         
-        # 使用多品牌提示詞系統
-        logger.info(f"使用品牌 {brand} 的提示詞: {user_input[:30]}...")
-        full_prompt = get_chat_prompt(brand, user_input, style)
+        # 常見問題直接使用品牌設定檔中的標準答案
+        faq_match = faq_matcher.match(brand, user_input)
+        if faq_match:
+            logger.info(f"使用常見問題的回答: {user_input[:30]} → {faq_match.question} ({faq_match.score:.2f})")
+            return faq_match.answer
         
-        logger.info("提示詞生成完成，發送到 Gemini")
+        cached_response = llm_response_cache.get(brand, style, selected_model, user_input, max_output_tokens)
+        if cached_response:
+            logger.info(f"使用快取的回答: {user_input[:30]}")
+            return cached_response
         
-        # 使用指定的模型或預設模型
-        selected_model = model_name or DEFAULT_SETTINGS["llm_model"]
-        model = genai.GenerativeModel(selected_model)
+        # 常見問題與快取都未命中才組提示詞 (啟用知識檢索時包含一次檢索查詢)
+        full_prompt = build_llm_prompt(user_input, brand, style)
+        logger.info("提示詞生成完成，發送到 Gemini")
         
-        # 生成回應
-        response = model.generate_content(full_prompt)
+        # 使用指定的模型或預設模型，於 LLM 執行緒池中生成回應
+        response_text = await llm_service.generate(
+            full_prompt, selected_model, max_output_tokens, get_prompt_prefix(brand, style)
+        )
         
-        if response and response.text:
-            logger.info(f"Gemini 回應成功，長度: {len(response.text)}")
-            return response.text
+        if response_text:
+            logger.info(f"Gemini 回應成功，長度: {len(response_text)}")
+            llm_response_cache.set(brand, style, selected_model, user_input, response_text, max_output_tokens)
+            return response_text
         else:
             logger.warning("Gemini 沒有返回有效回應")
             return "抱歉，我暫時無法回應您的問題，請稍後再試"
+    
+    except ConcurrencyLimitExceeded as e:
+        logger.warning(f"LLM 請求過多: {e}")
+        return "目前詢問人數較多，請稍後再試"
+    
+    except asyncio.TimeoutError:
+        logger.error("LLM 呼叫逾時")
+        return "抱歉，回應時間過長，請稍後再試"
             
     except Exception as e:
         logger.error(f"LLM Error: {e}")
         # 提供更友善的錯誤訊息
         return "抱歉，處理您的問題時遇到了技術問題，請稍後再試"
 
+async def stream_llm_response(user_input: str, model_name: str = None, brand: str = "creative_tech", style: str = "professional",
+                              max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+    """從 Gemini 串流獲取回應，錯誤處理與 get_llm_response 一致"""
+    yielded = False
+    try:
+        brand, style = resolve_brand(brand, style)
+        selected_model = model_name or DEFAULT_SETTINGS["llm_model"]
+        
+        quick_answer = quick_answer_store.get(brand, style, user_input, selected_model, max_output_tokens)
+        if quick_answer:
+            logger.info(f"使用預先生成的回答: {user_input[:30]}")
+            yield quick_answer
+            return
+        
+        invalid_message = validate_user_input(user_input)
+        if invalid_message:
+            yield invalid_message
+            return
+        
+        faq_match = faq_matcher.match(brand, user_input)
+        if faq_match:
+            logger.info(f"使用常見問題的回答: {user_input[:30]} → {faq_match.question} ({faq_match.score:.2f})")
+            yield faq_match.answer
+            return
+        
+        cached_response = llm_response_cache.get(brand, style, selected_model, user_input, max_output_tokens)
+        if cached_response:
+            logger.info(f"使用快取的回答: {user_input[:30]}")
+            yield cached_response
+            return
+        
+        full_prompt = build_llm_prompt(user_input, brand, style)
+        logger.info("提示詞生成完成，以串流模式發送到 Gemini")
+        
+        parts = []
+        async for chunk in llm_service.stream(
+            full_prompt, selected_model, max_output_tokens, get_prompt_prefix(brand, style)
+        ):
+            yielded = True
+            parts.append(chunk)
+            yield chunk
+        
+        if yielded:
+            # 只快取完整結束的串流
+            llm_response_cache.set(brand, style, selected_model, user_input, "".join(parts), max_output_tokens)
+        else:
+            logger.warning("Gemini 沒有返回有效回應")
+            yield "抱歉，我暫時無法回應您的問題，請稍後再試"
+    
+    except ConcurrencyLimitExceeded as e:
+        logger.warning(f"LLM 請求過多: {e}")
+        yield "目前詢問人數較多，請稍後再試"
+    
+    except asyncio.TimeoutError:
+        logger.error("LLM 串流逾時")
+        if not yielded:
+            yield "抱歉，回應時間過長，請稍後再試"
+    
+    except Exception as e:
+        logger.error(f"LLM Stream Error: {e}")
+        # 已送出部分內容時不再附加錯誤訊息，避免回應內容混雜
+        if not yielded:
+            yield "抱歉，處理您的問題時遇到了技術問題，請稍後再試"
+
+def format_sse(event: str, data: dict) -> str:
+    """格式化 Server-Sent Events 訊息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.get("/")
 async def root():
     """API 根端點"""
@@ -198,15 +348,22 @@ async def root():
         "endpoints": {
             "login": "/api/login",
             "chat": "/api/chat",
+            "chat_stream": "/api/chat/stream",
             "tts": "/api/tts", 
+            "tts_stream": "/api/tts/stream",
             "chat_with_tts": "/api/chat-tts",
+            "chat_with_tts_stream": "/api/chat-tts/stream",
             "models": "/api/models",
             "voices": "/api/voices",
             "brands": "/api/brands",
             "brand_detail": "/api/brands/{brand}",
             "quick_questions": "/api/brands/{brand}/quick-questions",
             "generate_code": "/api/admin/generate-code",
-            "chat_logs": "/api/admin/logs"
+            "quick_answers": "/api/admin/quick-answers",
+            "chat_logs": "/api/admin/logs",
+            "export_logs": "/api/admin/export/logs",
+            "export_codes": "/api/admin/export/codes",
+            "metrics": "/api/metrics"
         }
     }
 
@@ -214,9 +371,10 @@ async def root():
 @app.post("/api/login", response_model=LoginResponse)
 async def login(request: LoginRequest, http_request: Request):
     """用戶登入端點"""
+    loop = asyncio.get_running_loop()
     try:
-        # 驗證存取序號
-        validation_result = json_db.validate_access_code(request.access_code)
+        # 驗證並兌換存取序號：一次性序號以原子操作標記為已使用，寫入在執行緒池中等待落地
+        validation_result = await loop.run_in_executor(None, db.redeem_access_code, request.access_code)
         
         if not validation_result["valid"]:
             # 如果驗證失敗，檢查是否是因為檔案不存在
@@ -226,7 +384,7 @@ async def login(request: LoginRequest, http_request: Request):
                     # 重新初始化管理員序號
                     init_admin_code()
                     # 再次驗證
-                    validation_result = json_db.validate_access_code(request.access_code)
+                    validation_result = await loop.run_in_executor(None, db.redeem_access_code, request.access_code)
                     if not validation_result["valid"]:
                         logger.warning(f"重新初始化後仍然登入失敗: {validation_result['reason']} - 序號: {request.access_code}")
                         return LoginResponse(
@@ -251,11 +409,9 @@ async def login(request: LoginRequest, http_request: Request):
         user_agent = get_user_agent(http_request)
         
         # 創建會話
-        session_id = json_db.create_session(request.access_code, ip_address, user_agent)
-        
-        # 如果是一次性序號，標記為已使用
-        if validation_result["type"] == "one_time":
-            json_db.use_access_code(request.access_code)
+        session_id = await loop.run_in_executor(
+            None, db.create_session, request.access_code, ip_address, user_agent, validation_result["type"]
+        )
         
         logger.info(f"用戶登入成功 - 序號: {request.access_code}, 類型: {validation_result['type']}, IP: {ip_address}")
         
@@ -274,40 +430,36 @@ async def login(request: LoginRequest, http_request: Request):
 async def chat(request: ChatRequest, http_request: Request):
     """LLM 對話端點 (條件式會話驗證)"""
     try:
-        # 檢查品牌是否需要驗證 - 簡化版本
-        brand_requires_auth = True  # 預設需要驗證
-        
-        # 創造智能科技不需要驗證
-        if request.brand == 'creative_tech':
-            brand_requires_auth = False
-        
-        session_info = None
+        # 檢查品牌是否需要驗證
+        session_info = await resolve_chat_session(request.brand, request.session_id, http_request)
+        brand_requires_auth = session_info is not None
         access_code = 'anonymous'
         
         if brand_requires_auth:
-            # 需要驗證的品牌，進行會話驗證
-            session_info = await validate_session_dependency(http_request, request.session_id)
             access_code = session_info['access_code']
             logger.info(f"收到聊天請求 (品牌: {request.brand}, 序號: {access_code}): {request.message}")
         else:
             # 不需要驗證的品牌，允許匿名訪問
             logger.info(f"收到聊天請求 (品牌: {request.brand}, 匿名訪問): {request.message}")
         
-        # 獲取 LLM 回應
+        # 獲取 LLM 回應，依 max_length 限制生成長度並在句子邊界截斷
+        max_chars, max_output_tokens = resolve_length_limit(request.max_length)
         response = await get_llm_response(
             request.message, 
             request.model, 
             request.brand, 
-            request.style
+            request.style,
+            max_output_tokens
         )
         original_length = len(response)
+        response, truncated = truncate_sentences(response, max_chars)
         
         # 記錄對話 (如果需要驗證才記錄)
         if brand_requires_auth and session_info:
             ip_address = get_client_ip(http_request)
             user_agent = get_user_agent(http_request)
             
-            json_db.log_chat(
+            await chat_log_writer.submit(
                 session_id=request.session_id,
                 access_code=access_code,
                 user_message=request.message,
@@ -323,24 +475,97 @@ async def chat(request: ChatRequest, http_request: Request):
         return ChatResponse(
             response=response,
             original_length=original_length,
-            truncated=False
+            truncated=truncated
         )
         
     except Exception as e:
         logger.error(f"聊天處理錯誤: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """LLM 串流對話端點 (Server-Sent Events)
+    
+    事件格式：
+    - token: {"text": 片段文字}
+    - done: {"response": 完整回應, "original_length": 長度, "truncated": 是否截斷}
+    
+    設定 max_length 時片段以完整句子為單位送出，加入下一句會超過上限即結束串流。
+    """
+    # 會話驗證需在開始串流前完成，才能以 401 回應
+    session_info = await resolve_chat_session(request.brand, request.session_id, http_request)
+    if session_info:
+        logger.info(f"收到串流聊天請求 (品牌: {request.brand}, 序號: {session_info['access_code']}): {request.message}")
+    else:
+        logger.info(f"收到串流聊天請求 (品牌: {request.brand}, 匿名訪問): {request.message}")
+    
+    ip_address = get_client_ip(http_request)
+    user_agent = get_user_agent(http_request)
+    max_chars, max_output_tokens = resolve_length_limit(request.max_length)
+    
+    async def event_generator():
+        parts = []
+        limiter = ResponseLimiter(max_chars)
+        llm_stream = stream_llm_response(
+            request.message,
+            request.model,
+            request.brand,
+            request.style,
+            max_output_tokens
+        )
+        try:
+            async for chunk in llm_stream:
+                # 未限制長度時直接轉送片段，否則等句子完整後確認仍在上限內才送出
+                segments = [limiter.passthrough(chunk)] if max_chars is None else limiter.feed(chunk)
+                for text in segments:
+                    parts.append(text)
+                    yield format_sse("token", {"text": text})
+                if limiter.truncated:
+                    break  # 已達上限，停止讀取以結束上游生成
+            for text in limiter.flush():
+                parts.append(text)
+                yield format_sse("token", {"text": text})
+        finally:
+            await llm_stream.aclose()
+        
+        response = "".join(parts).strip()
+        
+        # 串流結束後記錄完整對話 (如果需要驗證才記錄)
+        if session_info:
+            await chat_log_writer.submit(
+                session_id=request.session_id,
+                access_code=session_info['access_code'],
+                user_message=request.message,
+                bot_response=response,
+                brand=request.brand,
+                ip_address=ip_address,
+                user_agent=user_agent
+            )
+        
+        logger.info(f"LLM 串流回應完成，長度: {len(response)}, 截斷: {limiter.truncated}")
+        yield format_sse("done", {
+            "response": response,
+            "original_length": limiter.received,
+            "truncated": limiter.truncated
+        })
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 關閉 Nginx 緩衝，讓片段即時送達
+        }
+    )
+
 @app.post("/api/tts", response_model=TTSResponse)
 async def text_to_speech(request: TTSRequest):
     """TTS 語音合成端點"""
     try:
         logger.info(f"收到 TTS 請求: {request.text[:50]}...")
         
-        # 設定語音
-        set_voice(request.voice)
-        
-        # 生成語音
-        audio_data = await generate_audio(request.text)
+        # 生成語音 (語音以參數傳入，不修改全域設定)
+        audio_data = await generate_audio(request.text, request.voice)
         success = audio_data is not None
         
         logger.info(f"TTS 處理完成，成功: {success}")
@@ -354,25 +579,73 @@ async def text_to_speech(request: TTSRequest):
         logger.error(f"TTS 處理錯誤: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def create_audio_stream_response(text: str, voice: str) -> StreamingResponse:
+    """建立 MP3 音訊串流回應
+    
+    先取得第一個音訊片段再開始回應，讓合成失敗時仍能回傳錯誤狀態碼
+    """
+    audio_iterator = stream_audio(text, voice)
+    try:
+        first_chunk = await audio_iterator.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="無法生成語音")
+    except ConcurrencyLimitExceeded as e:
+        logger.warning(f"TTS 請求過多: {e}")
+        raise HTTPException(status_code=503, detail="目前語音請求較多，請稍後再試")
+    except Exception as e:
+        logger.error(f"TTS 串流錯誤: {e}")
+        raise HTTPException(status_code=502, detail="語音服務暫時無法使用")
+    
+    async def audio_generator():
+        yield first_chunk
+        try:
+            async for chunk in audio_iterator:
+                yield chunk
+        except Exception as e:
+            # 已開始傳送音訊，只能中止串流
+            logger.error(f"TTS 串流中斷: {e}")
+    
+    return StreamingResponse(
+        audio_generator(),
+        media_type="audio/mpeg",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.post("/api/tts/stream")
+async def text_to_speech_stream(request: TTSRequest):
+    """TTS 語音合成串流端點，直接以 chunked audio/mpeg 回傳音訊"""
+    logger.info(f"收到 TTS 串流請求: {request.text[:50]}...")
+    return await create_audio_stream_response(request.text, request.voice)
+
+@app.get("/api/tts/stream")
+async def text_to_speech_stream_get(text: str, voice: str = DEFAULT_SETTINGS["tts_voice"]):
+    """TTS 語音合成串流端點 (GET 版本，可直接作為 <audio> 的 src 邊下載邊播放)"""
+    logger.info(f"收到 TTS 串流請求: {text[:50]}...")
+    return await create_audio_stream_response(text, voice)
+
 @app.post("/api/chat-tts", response_model=ChatTTSResponse)
 async def chat_with_tts(request: ChatTTSRequest):
     """LLM 對話 + TTS 語音合成組合端點"""
     try:
         logger.info(f"收到聊天+TTS請求: {request.message}")
         
-        # 獲取 LLM 回應
+        # 獲取 LLM 回應，截斷後再合成語音，避免合成不會顯示的文字
+        max_chars, max_output_tokens = resolve_length_limit(request.max_length)
         response = await get_llm_response(
             request.message, 
             request.model, 
             request.brand, 
-            request.style
+            request.style,
+            max_output_tokens
         )
         original_length = len(response)
+        response, truncated = truncate_sentences(response, max_chars)
         
-        # 不再進行截斷，直接使用原始回應
         # 生成語音
-        set_voice(request.voice)
-        audio_data = await generate_audio(response)
+        audio_data = await generate_audio(response, request.voice)
         tts_success = audio_data is not None
         
         logger.info(f"聊天+TTS完成，文字長度: {len(response)}, TTS成功: {tts_success}")
@@ -381,7 +654,7 @@ async def chat_with_tts(request: ChatTTSRequest):
             response=response,
             audio_data=audio_data,
             original_length=original_length,
-            truncated=False,
+            truncated=truncated,
             tts_success=tts_success
         )
         
@@ -389,6 +662,101 @@ async def chat_with_tts(request: ChatTTSRequest):
         logger.error(f"聊天+TTS處理錯誤: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat-tts/stream")
+async def chat_with_tts_stream(request: ChatTTSRequest):
+    """LLM 對話 + TTS 語音合成的管線化串流端點 (Server-Sent Events)
+    
+    LLM 串流輸出在句尾標點處切分，每個完整句子立即開始語音合成，
+    不需等待完整回應。事件依句子順序送出：
+    - text: {"index": 句子序號, "text": 句子}
+    - audio: {"index": 句子序號, "audio_data": 音訊 data URI, "success": bool}
+    - done: {"response": 完整回應, "original_length": 長度, "truncated": 是否截斷, "segments": 句子數}
+    
+    設定 max_length 時，加入下一句會超過上限即停止生成，超出的句子不會合成語音。
+    """
+    logger.info(f"收到管線化聊天+TTS請求: {request.message}")
+    max_chars, max_output_tokens = resolve_length_limit(request.max_length)
+    
+    async def event_generator():
+        segments: asyncio.Queue = asyncio.Queue()
+        parts = []
+        tts_tasks = []
+        
+        def schedule(sentence: str):
+            task = asyncio.create_task(synthesize(sentence, request.voice))
+            tts_tasks.append(task)
+            segments.put_nowait((sentence, task))
+        
+        limiter = ResponseLimiter(max_chars)
+        
+        async def produce():
+            # 讀取 LLM 串流並切分句子，每句完成且未超過長度上限即排入語音合成
+            llm_stream = stream_llm_response(
+                request.message,
+                request.model,
+                request.brand,
+                request.style,
+                max_output_tokens
+            )
+            try:
+                async for chunk in llm_stream:
+                    for segment in limiter.feed(chunk):
+                        parts.append(segment)
+                        schedule(segment.strip())
+                    if limiter.truncated:
+                        break
+                for segment in limiter.flush():
+                    parts.append(segment)
+                    schedule(segment.strip())
+            finally:
+                await llm_stream.aclose()
+                segments.put_nowait(None)
+        
+        producer = asyncio.create_task(produce())
+        index = 0
+        tts_success_count = 0
+        try:
+            while True:
+                segment = await segments.get()
+                if segment is None:
+                    break
+                sentence, task = segment
+                yield format_sse("text", {"index": index, "text": sentence})
+                
+                audio_data = await task
+                if audio_data:
+                    tts_success_count += 1
+                yield format_sse("audio", {
+                    "index": index,
+                    "audio_data": encode_audio(audio_data) if audio_data else None,
+                    "success": audio_data is not None
+                })
+                index += 1
+            
+            await producer
+            response = "".join(parts).strip()
+            logger.info(f"管線化聊天+TTS完成，文字長度: {len(response)}, 句子數: {index}, TTS成功: {tts_success_count}")
+            yield format_sse("done", {
+                "response": response,
+                "original_length": limiter.received,
+                "truncated": limiter.truncated,
+                "segments": index
+            })
+        finally:
+            # 用戶端中斷連線時取消尚未完成的工作
+            producer.cancel()
+            for task in tts_tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.get("/api/models")
 async def get_models():
     """獲取可用的 LLM 模型列表"""
@@ -436,15 +804,18 @@ async def generate_access_code(request: GenerateCodeRequest):
     """生成新的存取序號 (需要管理員權限)"""
     try:
         # 驗證管理員序號
-        admin_validation = json_db.validate_access_code(request.admin_code)
+        admin_validation = db.validate_access_code(request.admin_code)
         if not admin_validation["valid"] or admin_validation["type"] != "permanent":
             return GenerateCodeResponse(
                 success=False,
                 message="無效的管理員序號"
             )
         
-        # 生成新序號
-        new_code = json_db.generate_access_code(request.code_type, request.description)
+        # 生成新序號 (寫入會等待變更落地，在執行緒中進行以免阻塞事件迴圈)
+        loop = asyncio.get_running_loop()
+        new_code = await loop.run_in_executor(
+            None, db.generate_access_code, request.code_type, request.description
+        )
         
         logger.info(f"管理員 {request.admin_code} 生成新序號: {new_code} (類型: {request.code_type})")
         
@@ -459,23 +830,39 @@ async def generate_access_code(request: GenerateCodeRequest):
         raise HTTPException(status_code=500, detail="生成序號失敗")
 
 @app.get("/api/admin/logs")
-async def get_chat_logs(admin_code: str, access_code: str = None, limit: int = 100):
-    """獲取對話記錄 (需要管理員權限)"""
+async def get_chat_logs(admin_code: str, access_code: str = None, brand: str = None,
+                        session_id: str = None, start: str = None, end: str = None,
+                        limit: int = 100, cursor: str = None):
+    """獲取對話記錄 (需要管理員權限)
+    
+    支援依序號、品牌、會話與時間範圍 (ISO 格式) 篩選；
+    回應中的 next_cursor 可傳回 cursor 參數取得下一頁。
+    """
     try:
         # 驗證管理員序號
-        admin_validation = json_db.validate_access_code(admin_code)
+        admin_validation = db.validate_access_code(admin_code)
         if not admin_validation["valid"] or admin_validation["type"] != "permanent":
             raise HTTPException(status_code=403, detail="無效的管理員序號")
         
-        # 獲取對話記錄
-        logs = json_db.get_chat_logs(access_code, limit)
+        # 查詢對話記錄 (每頁筆數有上限，記憶體用量固定)
+        limit = max(1, min(limit, ADMIN_LOG_PAGE_LIMIT))
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None,
+            lambda: db.query_chat_logs(access_code, brand, session_id, start, end, limit, cursor)
+        )
         
         return {
             "success": True,
-            "logs": logs,
-            "total": len(logs)
+            "logs": result["logs"],
+            "total": len(result["logs"]),
+            "next_cursor": result["next_cursor"]
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"獲取記錄錯誤: {e}")
         raise HTTPException(status_code=500, detail="獲取記錄失敗")
@@ -485,12 +872,12 @@ async def get_access_codes(admin_code: str):
     """獲取所有序號 (需要管理員權限)"""
     try:
         # 驗證管理員序號
-        admin_validation = json_db.validate_access_code(admin_code)
+        admin_validation = db.validate_access_code(admin_code)
         if not admin_validation["valid"] or admin_validation["type"] != "permanent":
             raise HTTPException(status_code=403, detail="無效的管理員序號")
         
         # 獲取所有序號
-        codes = json_db.get_access_codes()
+        codes = db.get_access_codes()
         
         return {
             "success": True,
@@ -502,12 +889,73 @@ async def get_access_codes(admin_code: str):
         logger.error(f"獲取序號錯誤: {e}")
         raise HTTPException(status_code=500, detail="獲取序號失敗")
 
+def create_export_response(rows: Iterable[Dict], export_format: str, fields: Sequence[str],
+                           name: str) -> StreamingResponse:
+    """建立串流匯出回應
+    
+    rows 為逐批讀取存儲的產生器，StreamingResponse 會在執行緒池中逐塊取用，
+    伺服器記憶體用量與匯出筆數無關。
+    """
+    def body() -> Iterator[bytes]:
+        try:
+            yield from iter_export(rows, export_format, fields)
+        except Exception as e:
+            # 回應標頭已送出，只能記錄錯誤並中斷傳輸
+            logger.error(f"匯出 {name} 中斷: {e}")
+            raise
+    
+    filename = f"{name}_{datetime.now():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/admin/export/logs")
+async def export_chat_logs(admin_code: str, access_code: str = None, brand: str = None,
+                           session_id: str = None, start: str = None, end: str = None,
+                           export_format: str = Query("ndjson", alias="format")):
+    """串流匯出對話記錄 (需要管理員權限)
+    
+    支援 ndjson 與 csv 格式，篩選條件與 /api/admin/logs 相同。
+    """
+    admin_validation = db.validate_access_code(admin_code)
+    if not admin_validation["valid"] or admin_validation["type"] != "permanent":
+        raise HTTPException(status_code=403, detail="無效的管理員序號")
+    
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支援的匯出格式: {export_format}")
+    
+    rows = db.iter_chat_logs(access_code, brand, session_id, start, end)
+    return create_export_response(rows, export_format, LOG_EXPORT_FIELDS, "chat_logs")
+
+@app.get("/api/admin/export/codes")
+async def export_access_codes(admin_code: str, code_type: str = None, is_used: Optional[bool] = None,
+                              start: str = None, end: str = None,
+                              export_format: str = Query("ndjson", alias="format")):
+    """串流匯出序號 (需要管理員權限)
+    
+    可依序號類型、使用狀態與建立時間範圍篩選。
+    """
+    admin_validation = db.validate_access_code(admin_code)
+    if not admin_validation["valid"] or admin_validation["type"] != "permanent":
+        raise HTTPException(status_code=403, detail="無效的管理員序號")
+    
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支援的匯出格式: {export_format}")
+    
+    rows = db.iter_access_codes(code_type, is_used, start, end)
+    return create_export_response(rows, export_format, CODE_EXPORT_FIELDS, "access_codes")
+
 @app.post("/api/admin/reset-code", response_model=GenerateCodeResponse)
 async def reset_access_code(request: ResetCodeRequest):
     """重置一次性序號 (需要管理員權限)"""
     try:
         # 重置序號
-        reset_result = json_db.reset_access_code(request.code_to_reset, request.admin_code)
+        loop = asyncio.get_running_loop()
+        reset_result = await loop.run_in_executor(
+            None, db.reset_access_code, request.code_to_reset, request.admin_code
+        )
         
         if reset_result["success"]:
             logger.info(f"管理員 {request.admin_code} 重置序號: {request.code_to_reset}")
@@ -527,7 +975,10 @@ async def delete_access_code(request: DeleteCodeRequest):
     """刪除序號 (需要管理員權限)"""
     try:
         # 刪除序號
-        delete_result = json_db.delete_access_code(request.code_to_delete, request.admin_code)
+        loop = asyncio.get_running_loop()
+        delete_result = await loop.run_in_executor(
+            None, db.delete_access_code, request.code_to_delete, request.admin_code
+        )
         
         if delete_result["success"]:
             logger.info(f"管理員 {request.admin_code} 刪除序號: {request.code_to_delete}")
@@ -547,7 +998,10 @@ async def create_custom_access_code(request: CreateCustomCodeRequest):
     """創建自定義序號 (需要管理員權限)"""
     try:
         # 創建自定義序號
-        create_result = json_db.create_custom_code(
+        loop = asyncio.get_running_loop()
+        create_result = await loop.run_in_executor(
+            None,
+            db.create_custom_code,
             request.custom_code, 
             request.code_type, 
             request.description, 
@@ -567,14 +1021,85 @@ async def create_custom_access_code(request: CreateCustomCodeRequest):
         logger.error(f"創建自定義序號錯誤: {e}")
         raise HTTPException(status_code=500, detail="創建自定義序號失敗")
 
+@app.post("/api/admin/quick-answers/warm-up")
+async def warm_up_quick_answers(request: QuickAnswerWarmUpRequest):
+    """在背景重新生成預設問題的回答與語音 (需要管理員權限)"""
+    # 驗證管理員序號
+    admin_validation = db.validate_access_code(request.admin_code)
+    if not admin_validation["valid"] or admin_validation["type"] != "permanent":
+        raise HTTPException(status_code=403, detail="無效的管理員序號")
+    
+    if request.brand and not is_valid_brand(request.brand):
+        raise HTTPException(status_code=404, detail=f"品牌 '{request.brand}' 不存在")
+    
+    brands = [request.brand] if request.brand else None
+    started = quick_answer_store.start_warm_up(brands)
+    if started:
+        logger.info(f"管理員 {request.admin_code} 啟動預設問題預先渲染 (品牌: {request.brand or '全部'})")
+    
+    return {
+        "success": started,
+        "message": "已開始預先渲染" if started else "預先渲染進行中，請稍後再試"
+    }
+
+@app.get("/api/admin/quick-answers")
+async def get_quick_answers(admin_code: str, brand: str = None):
+    """獲取預先生成的預設問題回答 (需要管理員權限)"""
+    # 驗證管理員序號
+    admin_validation = db.validate_access_code(admin_code)
+    if not admin_validation["valid"] or admin_validation["type"] != "permanent":
+        raise HTTPException(status_code=403, detail="無效的管理員序號")
+    
+    answers = quick_answer_store.list_answers(brand)
+    return {
+        "success": True,
+        "answers": answers,
+        "total": len(answers),
+        "stats": quick_answer_store.get_stats()
+    }
+
+@app.post("/api/admin/cache/invalidate")
+async def invalidate_llm_cache(request: CacheInvalidateRequest):
+    """清除 LLM 回應快取，提示詞更新後使用 (需要管理員權限)"""
+    # 驗證管理員序號
+    admin_validation = db.validate_access_code(request.admin_code)
+    if not admin_validation["valid"] or admin_validation["type"] != "permanent":
+        raise HTTPException(status_code=403, detail="無效的管理員序號")
+    
+    removed = llm_response_cache.invalidate(request.brand)
+    logger.info(f"管理員 {request.admin_code} 清除 LLM 回應快取 (品牌: {request.brand or '全部'})")
+    
+    return {
+        "success": True,
+        "removed": removed,
+        "message": f"已清除 {removed} 筆快取"
+    }
+
 @app.get("/api/health")
 async def health_check():
     """健康檢查端點"""
     return {
         "status": "healthy",
+        "llm_ready": llm_service.ready,
         "timestamp": "2024-01-01T00:00:00Z"
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """服務運行統計端點"""
+    return {
+        "prompts": prompt_registry.get_stats(),
+        "retrieval": knowledge_retriever.get_stats(),
+        "llm": llm_service.get_stats(),
+        "tts": get_tts_stats(),
+        "quick_answers": quick_answer_store.get_stats(),
+        "faq": faq_matcher.get_stats(),
+        "llm_cache": llm_response_cache.get_stats(),
+        "storage": db.get_stats(),
+        "sessions": db.sessions.get_stats(),
+        "chat_log_writer": chat_log_writer.get_stats()
+    }
+
 # 啟動時初始化
 @app.on_event("startup")
 async def startup_event():
@@ -582,18 +1107,69 @@ async def startup_event():
     try:
         # 初始化管理員序號
         init_admin_code()
+        chat_log_writer.start()
+        db.sessions.start_sweeper()
         logger.info("資料庫初始化完成")
     except Exception as e:
         logger.error(f"啟動初始化錯誤: {e}")
+    
+    # 建立共用模型實例，並在開始接收請求前預熱連線
+    llm_service.initialize()
+    if LLM_SETTINGS["warmup_on_startup"]:
+        await llm_service.warm_up()
+    else:
+        llm_service.ready = True
+    
+    prompt_registry.add_reload_listener(on_prompt_pack_reloaded)
+    
+    # 建立品牌知識檢索索引，讓第一個請求不必等待建立
+    if RETRIEVAL_SETTINGS["enabled"] and RETRIEVAL_SETTINGS["build_on_startup"]:
+        chunks = build_knowledge_indexes()
+        logger.info(f"品牌知識索引建立完成: {chunks} 段")
+    
+    # 在背景將各品牌 × 風格的固定提示詞前綴登記為供應商端快取
+    # (啟用知識檢索時前綴隨問題改變，get_prompt_prefix 返回 None 而不登記)
+    if CONTEXT_CACHE_SETTINGS["enabled"] and CONTEXT_CACHE_SETTINGS["register_on_startup"]:
+        prefixes = [
+            prefix
+            for brand in get_brand_info()
+            for style in get_available_styles(brand)
+            if (prefix := get_prompt_prefix(brand, style))
+        ]
+        app.state.context_cache_registration = asyncio.create_task(llm_service.register_context_cache(prefixes))
+    
+    # 在背景預先生成預設問題的回答與語音，不延遲服務啟動
+    if QUICK_ANSWER_SETTINGS["warmup_on_startup"]:
+        quick_answer_store.start_warm_up()
+
+def on_prompt_pack_reloaded(brand: str):
+    """品牌設定檔更新後，清除該品牌的 LLM 回應快取並重新預先生成預設問題"""
+    llm_response_cache.invalidate(brand)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # 不在事件迴圈中，預設問題留待下次預熱
+    if QUICK_ANSWER_SETTINGS["warmup_on_startup"]:
+        quick_answer_store.start_warm_up([brand])
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """應用關閉時執行"""
+    # 寫入佇列中尚未落地的對話記錄
+    await chat_log_writer.stop()
+    await db.sessions.stop_sweeper()
+    db.close()
+    llm_service.shutdown()
 
 if __name__ == "__main__":
     import uvicorn
     
-    # 開發模式
+    # 開發模式 (單一 worker 時自動重載；多 worker 時不支援重載)
     uvicorn.run(
         "api_server:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=API_WORKERS == 1,
+        workers=API_WORKERS,
         log_level="info"
     )
@@ -0,0 +1,128 @@
+"""
+品牌知識檢索基準測試
+比較完整品牌知識與知識檢索 (只放入相關段落) 兩種提示詞的長度與端到端延遲
+
+使用方式 (在 backend 目錄執行):
+    python benchmark_retrieval.py                      # 只比較提示詞長度與組裝時間，不呼叫 LLM
+    python benchmark_retrieval.py --live --repeat 3    # 實際呼叫 LLM 比較端到端延遲 (需要 GOOGLE_API_KEY)
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from config import DEFAULT_SETTINGS, RETRIEVAL_SETTINGS
+from prompts import get_quick_questions, registry
+from prompts.retrieval import create_retriever
+
+# 預設問題之外，加入不需要品牌知識的問候語
+EXTRA_QUESTIONS = ["你好", "謝謝你"]
+
+
+def collect_questions(brands: List[str]) -> List[Tuple[str, str]]:
+    """取得各品牌的測試問題 (預設問題卡片與問候語)"""
+    return [
+        (brand, question)
+        for brand in brands
+        for question in get_quick_questions(brand) + EXTRA_QUESTIONS
+    ]
+
+
+def build_prompts(questions: List[Tuple[str, str]], rounds: int = 200) -> Dict[str, dict]:
+    """組出兩種模式的提示詞並量測組裝時間
+
+    Returns:
+        dict: 模式 → {"prompts": [...], "build_us": 每個提示詞的平均組裝微秒數}
+    """
+    retriever = create_retriever(RETRIEVAL_SETTINGS, enabled=True)
+    packs = {brand: registry.get(brand) for brand, _ in questions}
+    for pack in packs.values():
+        retriever.build(pack)
+
+    modes = {
+        "full": lambda brand, question: packs[brand].render(question),
+        "retrieval": lambda brand, question: retriever.render(packs[brand], question)
+    }
+
+    results = {}
+    for mode, render in modes.items():
+        prompts = [render(brand, question) for brand, question in questions]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for brand, question in questions:
+                render(brand, question)
+        elapsed = time.perf_counter() - start
+        results[mode] = {
+            "prompts": prompts,
+            "build_us": elapsed / (rounds * len(questions)) * 1_000_000
+        }
+    return results
+
+
+async def measure_latency(prompts: Dict[str, List[str]], model_name: str, repeat: int,
+                          max_output_tokens: int) -> Dict[str, List[float]]:
+    """依序呼叫 LLM 量測端到端延遲 (秒)，兩種模式交替執行以降低網路波動的影響"""
+    from llm_service import llm_service
+
+    llm_service.initialize()
+    latencies: Dict[str, List[float]] = {mode: [] for mode in prompts}
+    count = len(next(iter(prompts.values())))
+    try:
+        for _ in range(repeat):
+            for i in range(count):
+                for mode, mode_prompts in prompts.items():
+                    start = time.perf_counter()
+                    await llm_service.generate(mode_prompts[i], model_name, max_output_tokens)
+                    latencies[mode].append(time.perf_counter() - start)
+    finally:
+        llm_service.shutdown()
+    return latencies
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="品牌知識檢索基準測試")
+    parser.add_argument("--brand", action="append", help="只測試指定品牌 (可重複指定)，預設測試所有品牌")
+    parser.add_argument("--live", action="store_true", help="實際呼叫 LLM 量測端到端延遲")
+    parser.add_argument("--model", default=DEFAULT_SETTINGS["llm_model"], help="測試使用的模型")
+    parser.add_argument("--repeat", type=int, default=1, help="每個問題呼叫 LLM 的次數")
+    parser.add_argument("--max-output-tokens", type=int, default=128, help="輸出 token 上限")
+    args = parser.parse_args()
+
+    brands = args.brand or registry.brand_ids()
+    questions = collect_questions(brands)
+    results = build_prompts(questions)
+
+    print(f"問題數: {len(questions)}  品牌: {', '.join(brands)}")
+    print(f"知識檢索: top_k={RETRIEVAL_SETTINGS['top_k']}  min_score={RETRIEVAL_SETTINGS['min_score']}  "
+          f"max_chunk_chars={RETRIEVAL_SETTINGS['max_chunk_chars']}")
+    print()
+    print(f"{'模式':<12}{'平均字數':>10}{'最大字數':>10}{'組裝 (μs)':>12}")
+    for mode, result in results.items():
+        sizes = [len(prompt) for prompt in result["prompts"]]
+        print(f"{mode:<12}{statistics.mean(sizes):>10.0f}{max(sizes):>10}{result['build_us']:>12.1f}")
+
+    full_chars = sum(len(prompt) for prompt in results["full"]["prompts"])
+    retrieval_chars = sum(len(prompt) for prompt in results["retrieval"]["prompts"])
+    print(f"\n提示詞縮減: {1 - retrieval_chars / full_chars:.1%}")
+
+    if not args.live:
+        return
+
+    prompts = {mode: result["prompts"] for mode, result in results.items()}
+    latencies = asyncio.run(measure_latency(prompts, args.model, args.repeat, args.max_output_tokens))
+    print(f"\n端到端延遲 ({args.model}，每種模式 {len(latencies['full'])} 次)")
+    print(f"{'模式':<12}{'平均 (ms)':>12}{'P50 (ms)':>12}{'P95 (ms)':>12}")
+    for mode, values in latencies.items():
+        print(f"{mode:<12}{statistics.mean(values) * 1000:>12.0f}"
+              f"{percentile(values, 0.5) * 1000:>12.0f}{percentile(values, 0.95) * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+快取工具模組
+提供依容量淘汰、可設定存活時間的 LRU 快取
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """以項目數與總大小為上限的 LRU 快取
+
+    超出任一上限時，從最久未使用的項目開始淘汰。
+    項目可設定存活時間 (TTL)，過期項目在讀取時視為未命中並移除。
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = len):
+        """初始化 LRU 快取
+
+        Args:
+            max_entries: 最大項目數
+            max_bytes: 所有項目的總大小上限，None 表示不限制
+            sizeof: 計算項目大小的函數
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes = {}
+        self._expires_at = {}
+        self._lock = threading.Lock()
+
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """讀取快取項目，命中時將其移到最近使用的位置
+
+        Args:
+            key: 快取鍵
+
+        Returns:
+            快取值，未命中時返回 None
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            expires_at = self._expires_at.get(key)
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """寫入快取項目
+
+        Args:
+            key: 快取鍵
+            value: 快取值
+            ttl: 存活秒數，None 表示不過期
+
+        Returns:
+            bool: 是否成功寫入 (單一項目超過總大小上限時不寫入)
+        """
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            if ttl is not None:
+                self._expires_at[key] = time.monotonic() + ttl
+            self.current_bytes += size
+            self._evict()
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        """刪除快取項目
+
+        Returns:
+            bool: 項目是否存在
+        """
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            return True
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """刪除所有鍵符合條件的項目
+
+        Args:
+            predicate: 接收快取鍵、返回是否刪除的函數
+
+        Returns:
+            int: 刪除的項目數
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> int:
+        """清空快取
+
+        Returns:
+            int: 清除的項目數
+        """
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            self._sizes.clear()
+            self._expires_at.clear()
+            self.current_bytes = 0
+            return count
+
+    def _remove(self, key: Hashable):
+        """移除項目並更新容量 (呼叫端需持有鎖)"""
+        del self._data[key]
+        self._expires_at.pop(key, None)
+        self.current_bytes -= self._sizes.pop(key)
+
+    def _evict(self):
+        """淘汰最久未使用的項目直到符合上限 (呼叫端需持有鎖)"""
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get_stats(self) -> dict:
+        """獲取快取統計
+
+        Returns:
+            dict: 項目數、容量與命中率
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -0,0 +1,649 @@
+"""
+對話記錄存儲模組
+以僅追加 (append-only) 的 JSONL 分段檔案保存對話記錄，每筆寫入成本固定；
+每個分段維護一份次要索引 (時間範圍與各欄位值對應的行號)，查詢時只讀取可能符合的分段
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "chat-"
+SEGMENT_SUFFIX = ".jsonl"
+COMPRESSED_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx.json"
+INDEXED_FIELDS = ("access_code", "brand", "session_id")
+INDEX_CACHE_SIZE = 256
+
+
+def segment_id(path: Path) -> str:
+    """分段識別碼 (不含副檔名，壓縮前後相同，且依時間排序)"""
+    name = path.name
+    for suffix in (COMPRESSED_SUFFIX, SEGMENT_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def list_segment_files(directory) -> List[Path]:
+    """依時間順序列出目錄中的所有分段檔"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    segments: Dict[str, Path] = {}
+    for path in directory.iterdir():
+        name = path.name
+        if not name.startswith(SEGMENT_PREFIX):
+            continue
+        if name.endswith(COMPRESSED_SUFFIX) or (name.endswith(SEGMENT_SUFFIX) and segment_id(path) not in segments):
+            # 壓縮完成到刪除原檔之間兩者並存，以壓縮檔為準
+            segments[segment_id(path)] = path
+    return [segments[key] for key in sorted(segments)]
+
+
+def read_segment_lines(path: Path) -> List[bytes]:
+    """讀取分段檔的所有非空白行 (未解析)，行號與索引一致"""
+    opener = gzip.open if path.name.endswith(COMPRESSED_SUFFIX) else open
+    try:
+        with opener(path, "rb") as f:
+            return [line for line in (raw.strip() for raw in f) if line]
+    except FileNotFoundError:
+        return []
+
+
+def iter_line_offsets(path: Path) -> Iterator[Tuple[int, bytes]]:
+    """逐行讀取未壓縮的分段檔，產生 (行首位元組位置, 非空白行內容)，行號與 read_segment_lines 一致"""
+    offset = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            line = raw.strip()
+            if line:
+                yield offset, line
+            offset += len(raw)
+
+
+def _parse_line(line: bytes) -> Optional[Dict]:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+class SegmentIndex:
+    """單一分段的次要索引
+
+    記錄分段的筆數、時間範圍，以及 access_code / brand / session_id 各值所在的行號 (遞增)。
+    目前寫入中的分段另外記錄每行的位元組位置 (offsets)，查詢時只需讀取候選行，不寫入索引檔。
+    """
+
+    __slots__ = ("count", "min_ts", "max_ts", "postings", "offsets")
+
+    def __init__(self, track_offsets: bool = False):
+        self.count = 0
+        self.min_ts: Optional[str] = None
+        self.max_ts: Optional[str] = None
+        self.postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in INDEXED_FIELDS}
+        self.offsets: Optional[List[int]] = [] if track_offsets else None
+
+    def add(self, entry: Optional[Dict], offset: Optional[int] = None):
+        """加入下一行的記錄；無法解析的行傳入 None，只佔用行號
+
+        Args:
+            entry: 記錄
+            offset: 行首的位元組位置 (只在記錄位置的索引使用)
+        """
+        line = self.count
+        self.count += 1
+        if self.offsets is not None:
+            self.offsets.append(offset)
+        if entry is None:
+            return
+        timestamp = entry.get("timestamp")
+        if timestamp:
+            if self.min_ts is None or timestamp < self.min_ts:
+                self.min_ts = timestamp
+            if self.max_ts is None or timestamp > self.max_ts:
+                self.max_ts = timestamp
+        for field in INDEXED_FIELDS:
+            value = entry.get(field)
+            if value:
+                self.postings[field].setdefault(value, []).append(line)
+
+    @classmethod
+    def build(cls, lines: Iterable[bytes]) -> "SegmentIndex":
+        """由分段內容建立索引"""
+        index = cls()
+        for line in lines:
+            index.add(_parse_line(line))
+        return index
+
+    @classmethod
+    def build_with_offsets(cls, path: Path) -> "SegmentIndex":
+        """由未壓縮的分段檔建立索引，並記錄每行的位元組位置"""
+        index = cls(track_offsets=True)
+        for offset, line in iter_line_offsets(path):
+            index.add(_parse_line(line), offset)
+        return index
+
+    def overlaps(self, start: Optional[str], end: Optional[str]) -> bool:
+        """分段的時間範圍是否與查詢範圍重疊"""
+        if self.count == 0:
+            return False
+        if start and self.max_ts and self.max_ts < start:
+            return False
+        if end and self.min_ts and self.min_ts > end:
+            return False
+        return True
+
+    def candidate_lines(self, filters: Dict[str, str], before: Optional[int] = None) -> List[int]:
+        """符合所有欄位條件的行號，由大到小
+
+        Args:
+            filters: 欄位 -> 值
+            before: 只返回小於此行號的行
+        """
+        limit = self.count if before is None else min(before, self.count)
+        if not filters:
+            return list(range(limit - 1, -1, -1))
+
+        # 從最短的倒排列表開始取交集
+        lists = sorted((self.postings[field].get(value, []) for field, value in filters.items()), key=len)
+        if not lists[0]:
+            return []
+        candidates = [line for line in lists[0] if line < limit]
+        for other in lists[1:]:
+            other_set = set(other)
+            candidates = [line for line in candidates if line in other_set]
+        candidates.reverse()
+        return candidates
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "min_ts": self.min_ts, "max_ts": self.max_ts, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SegmentIndex":
+        index = cls()
+        index.count = data["count"]
+        index.min_ts = data["min_ts"]
+        index.max_ts = data["max_ts"]
+        index.postings.update(data["postings"])
+        return index
+
+
+def read_segment_file(path: Path) -> List[Dict]:
+    """讀取單一分段檔的所有記錄 (依寫入順序)"""
+    opener = gzip.open if path.name.endswith(COMPRESSED_SUFFIX) else open
+    entries = []
+    try:
+        with opener(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 寫入中斷造成的不完整行
+                    logger.warning(f"略過損壞的記錄: {path.name}")
+    except FileNotFoundError:
+        # 分段在讀取期間被保留政策刪除
+        pass
+    return entries
+
+
+class SegmentedLogStore:
+    """分段式對話記錄存儲
+
+    新記錄只追加到目前的分段檔；分段超過大小上限或跨日時關閉並開啟新分段，
+    已關閉的分段可選擇壓縮，並依保留政策刪除過舊的分段。
+    壓縮與保留政策在背景執行緒中依序執行，不會讓寫入與查詢等待。
+    """
+
+    def __init__(self, directory: str, max_segment_bytes: int = 16 * 1024 * 1024,
+                 rotate_daily: bool = True, compress: bool = True,
+                 retention_days: int = 0, max_segments: int = 0):
+        """初始化分段式存儲
+
+        Args:
+            directory: 分段檔目錄
+            max_segment_bytes: 單一分段的大小上限
+            rotate_daily: 是否在跨日時切換分段
+            compress: 是否以 gzip 壓縮已關閉的分段
+            retention_days: 保留天數，0 表示不限制
+            max_segments: 保留的分段數上限，0 表示不限制
+        """
+        self.directory = Path(directory)
+        self.max_segment_bytes = max_segment_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.retention_days = retention_days
+        self.max_segments = max_segments
+
+        self._lock = threading.RLock()
+        self._active_path: Optional[Path] = None
+        self._active_file = None
+        self._active_size = 0
+        self._active_day: Optional[str] = None
+        self._active_index = SegmentIndex()
+        self._sequence = 0
+        self._index_cache: "OrderedDict[str, SegmentIndex]" = OrderedDict()  # 已關閉分段的索引
+        self._lines_cache: Optional[Tuple[str, List[bytes]]] = None  # 最近讀取的已關閉分段內容
+        # 已關閉分段的壓縮與保留政策，單一執行緒依序執行
+        self._maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-log")
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open_latest_segment()
+
+    # ---- 寫入 ----
+
+    def append(self, entry: Dict):
+        """追加一筆記錄"""
+        self.append_many([entry])
+
+    def append_many(self, entries: List[Dict]):
+        """追加多筆記錄 (一次寫入)
+
+        Args:
+            entries: 記錄列表，需包含 ISO 格式的 timestamp 欄位
+        """
+        if not entries:
+            return
+
+        lines = [(json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8") for entry in entries]
+        data = b"".join(lines)
+        with self._lock:
+            self._maybe_rotate(len(data))
+            self._active_file.write(data)
+            self._active_file.flush()
+            offset = self._active_size
+            self._active_size += len(data)
+            for entry, line in zip(entries, lines):
+                self._active_index.add(entry, offset)
+                offset += len(line)
+
+    def _segment_day(self, path: Path) -> str:
+        # chat-YYYYMMDD-HHMMSS-NNNN.jsonl
+        return path.name[len(SEGMENT_PREFIX):len(SEGMENT_PREFIX) + 8]
+
+    def _open_latest_segment(self):
+        """開啟最新的未壓縮分段，若沒有則建立新分段"""
+        with self._lock:
+            segments = self.list_segments()
+            if segments and segments[-1].name.endswith(SEGMENT_SUFFIX) and not segments[-1].name.endswith(COMPRESSED_SUFFIX):
+                self._active_path = segments[-1]
+                self._repair_tail(self._active_path)
+                self._active_index = SegmentIndex.build_with_offsets(self._active_path)
+                self._active_file = open(self._active_path, "ab")
+                self._active_size = self._active_path.stat().st_size
+                self._active_day = self._segment_day(self._active_path)
+            else:
+                self._start_segment()
+
+    def _repair_tail(self, path: Path):
+        """修復寫入中斷留下的不完整最後一行 (呼叫端需持有鎖)
+
+        最後一行缺少換行時，若內容是完整的 JSON 則補上換行，否則截除到前一個換行，
+        避免之後追加的記錄接在殘缺的行後面，造成記錄損壞與索引行號錯位。
+        """
+        with open(path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+
+            # 由檔尾往前找最後一個換行
+            keep = 0
+            pos = size
+            while pos > 0:
+                step = min(64 * 1024, pos)
+                pos -= step
+                f.seek(pos)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    keep = pos + newline + 1
+                    break
+
+            f.seek(keep)
+            tail = f.read()
+            try:
+                json.loads(tail)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                f.truncate(keep)
+                logger.warning(f"對話記錄分段結尾有不完整的記錄，已截除 {size - keep} bytes: {path.name}")
+            else:
+                f.write(b"\n")
+
+    def _start_segment(self):
+        """建立新分段 (呼叫端需持有鎖)"""
+        now = datetime.now()
+        self._sequence += 1
+        name = f"{SEGMENT_PREFIX}{now.strftime('%Y%m%d-%H%M%S')}-{self._sequence % 10000:04d}{SEGMENT_SUFFIX}"
+        self._active_path = self.directory / name
+        self._active_index = SegmentIndex(track_offsets=True)
+        self._active_file = open(self._active_path, "ab")
+        self._active_size = self._active_path.stat().st_size
+        self._active_day = now.strftime("%Y%m%d")
+
+    def _maybe_rotate(self, incoming_bytes: int):
+        """依大小或日期切換分段 (呼叫端需持有鎖)"""
+        size_exceeded = self._active_size > 0 and self._active_size + incoming_bytes > self.max_segment_bytes
+        day_changed = self.rotate_daily and self._active_day != datetime.now().strftime("%Y%m%d")
+        if not (size_exceeded or day_changed):
+            return
+
+        closed_path = self._active_path
+        closed_index = self._active_index
+        # 關閉後的分段改以索引檔與整段讀取查詢，不再保留行位置
+        closed_index.offsets = None
+        self._active_file.close()
+        self._start_segment()
+
+        if closed_path.stat().st_size == 0:
+            closed_path.unlink()
+            closed_path = None
+        else:
+            self._write_index(closed_path, closed_index)
+        # 壓縮可能需要數秒，交由背景執行緒處理；完成前查詢仍讀取未壓縮的分段
+        self._maintenance.submit(self._finish_segment, closed_path)
+
+    def _finish_segment(self, path: Optional[Path]):
+        """壓縮剛關閉的分段並套用保留政策 (在背景執行緒執行，不持有鎖)"""
+        try:
+            if path is not None and self.compress:
+                self._compress_segment(path)
+            self._apply_retention()
+        except Exception as e:
+            logger.error(f"對話記錄分段整理失敗: {e}")
+
+    def _compress_segment(self, path: Path):
+        """壓縮已關閉的分段"""
+        compressed_path = path.with_name(path.name[:-len(SEGMENT_SUFFIX)] + COMPRESSED_SUFFIX)
+        tmp_path = compressed_path.with_name("." + compressed_path.name + ".tmp")
+        with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, compressed_path)
+        path.unlink()
+
+    def _apply_retention(self):
+        """刪除超出保留政策的已關閉分段"""
+        with self._lock:
+            active_path = self._active_path
+        closed = [path for path in self.list_segments() if path != active_path]
+
+        if self.max_segments > 0:
+            # 目前分段也計入保留數量
+            excess = len(closed) + 1 - self.max_segments
+            for path in closed[:max(0, excess)]:
+                self._remove_segment(path)
+            closed = closed[max(0, excess):]
+
+        if self.retention_days > 0:
+            cutoff = time.time() - self.retention_days * 86400
+            for path in closed:
+                if path.stat().st_mtime < cutoff:
+                    self._remove_segment(path)
+
+    def _remove_segment(self, path: Path):
+        """刪除分段及其索引"""
+        path.unlink()
+        self._index_path(path).unlink(missing_ok=True)
+        key = segment_id(path)
+        with self._lock:
+            self._index_cache.pop(key, None)
+            if self._lines_cache is not None and self._lines_cache[0] == key:
+                self._lines_cache = None
+
+    # ---- 索引 ----
+
+    def _index_path(self, path: Path) -> Path:
+        return self.directory / (segment_id(path) + INDEX_SUFFIX)
+
+    def _write_index(self, path: Path, index: SegmentIndex):
+        """寫入分段的索引檔 (可由分段內容重建，不需 fsync)"""
+        index_path = self._index_path(path)
+        tmp_path = index_path.with_name("." + index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, index_path)
+        self._cache_index(segment_id(path), index)
+
+    def _cache_index(self, key: str, index: SegmentIndex):
+        self._index_cache[key] = index
+        self._index_cache.move_to_end(key)
+        while len(self._index_cache) > INDEX_CACHE_SIZE:
+            self._index_cache.popitem(last=False)
+
+    def _load_index(self, path: Path) -> SegmentIndex:
+        """取得已關閉分段的索引；索引檔不存在或損壞時由分段內容重建"""
+        key = segment_id(path)
+        index = self._index_cache.get(key)
+        if index is not None:
+            self._index_cache.move_to_end(key)
+            return index
+
+        try:
+            with open(self._index_path(path), "r", encoding="utf-8") as f:
+                index = SegmentIndex.from_dict(json.load(f))
+            self._cache_index(key, index)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            index = SegmentIndex.build(read_segment_lines(path))
+            if index.count:
+                self._write_index(path, index)
+        return index
+
+    def close(self):
+        """關閉目前的分段檔，並等待進行中的壓縮完成"""
+        with self._lock:
+            if self._active_file and not self._active_file.closed:
+                self._active_file.close()
+        self._maintenance.shutdown(wait=True)
+
+    # ---- 讀取 ----
+
+    def list_segments(self) -> List[Path]:
+        """依時間順序列出所有分段"""
+        return list_segment_files(self.directory)
+
+    def read_segment(self, path: Path) -> List[Dict]:
+        """讀取單一分段的所有記錄 (依寫入順序)"""
+        return read_segment_file(path)
+
+    def iter_newest_first(self) -> Iterator[Dict]:
+        """由新到舊逐筆讀取記錄，一次只載入一個分段"""
+        with self._lock:
+            if self._active_file and not self._active_file.closed:
+                self._active_file.flush()
+            segments = self.list_segments()
+
+        for path in reversed(segments):
+            yield from reversed(self.read_segment(path))
+
+    def query(self, filters: Dict[str, str] = None, start: str = None, end: str = None,
+              limit: int = 100, after: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """依條件由新到舊查詢記錄
+
+        只讀取時間範圍重疊且索引中含有符合值的分段，並只解析候選行；
+        記憶體用量以單一分段為上限，與總記錄量無關。
+
+        Args:
+            filters: 欄位條件，欄位需為 INDEXED_FIELDS 之一
+            start: 最早時間 (ISO 格式，含)
+            end: 最晚時間 (ISO 格式，含)
+            limit: 最大筆數
+            after: 上一頁最後一筆的位置 (分段識別碼, 行號)，從其後繼續
+
+        Returns:
+            tuple: (記錄列表, 最後一筆的位置；已無更多記錄時為 None)
+        """
+        results: List[Dict] = []
+        entries = self.iter_query(filters, start, end, after)
+        if limit <= 0:
+            return results, None
+
+        for entry, position in entries:
+            results.append(entry)
+            if len(results) >= limit:
+                return results, position
+        return results, None
+
+    def iter_query(self, filters: Dict[str, str] = None, start: str = None, end: str = None,
+                   after: Optional[Tuple[str, int]] = None) -> Iterator[Tuple[Dict, Tuple[str, int]]]:
+        """依條件由新到舊逐筆產生 (記錄, 位置)，每個分段只讀取一次
+
+        參數與 query() 相同；適合匯出等需要讀取全部結果的情境，不必逐頁重新讀取分段。
+
+        Raises:
+            ValueError: 查詢欄位不在 INDEXED_FIELDS 中 (呼叫時立即檢查)
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value}
+        for field in filters:
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"不支援的查詢欄位: {field}")
+        return self._iter_query(filters, start, end, after)
+
+    def _iter_query(self, filters: Dict[str, str], start: Optional[str], end: Optional[str],
+                    after: Optional[Tuple[str, int]]) -> Iterator[Tuple[Dict, Tuple[str, int]]]:
+        after_segment, after_line = after if after else (None, None)
+
+        with self._lock:
+            if self._active_file and not self._active_file.closed:
+                self._active_file.flush()
+            segments = self.list_segments()
+            active_id = segment_id(self._active_path) if self._active_path else None
+            active_index = self._active_index
+
+        for path in reversed(segments):
+            key = segment_id(path)
+            if after_segment is not None and key > after_segment:
+                continue
+            before = after_line if key == after_segment else None
+
+            offsets = None
+            if key == active_id:
+                # 目前分段仍在寫入，候選行需在鎖內計算
+                with self._lock:
+                    if not active_index.overlaps(start, end):
+                        continue
+                    candidates = active_index.candidate_lines(filters, before)
+                    offsets = active_index.offsets
+            else:
+                with self._lock:
+                    index = self._load_index(path)
+                if not index.overlaps(start, end):
+                    continue
+                candidates = index.candidate_lines(filters, before)
+
+            if not candidates:
+                continue
+
+            if offsets is not None:
+                rows = self._read_active_lines(path, candidates, offsets)
+            else:
+                lines = self._read_closed_lines(path)
+                rows = ((line_no, lines[line_no]) for line_no in candidates if line_no < len(lines))
+            for line_no, line in rows:
+                entry = _parse_line(line)
+                if entry is None:
+                    continue
+                timestamp = entry.get("timestamp", "")
+                if (start and timestamp < start) or (end and timestamp > end):
+                    continue
+                yield entry, (key, line_no)
+
+    def _read_active_lines(self, path: Path, candidates: List[int],
+                           offsets: List[int]) -> Iterator[Tuple[int, bytes]]:
+        """依行首位置只讀取目前分段的候選行，產生 (行號, 內容)
+
+        offsets 只會在尾端追加，候選行的位置在讀取期間不會改變。
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # 查詢期間分段已切換並壓縮
+            lines = self._read_closed_lines(path)
+            yield from ((line_no, lines[line_no]) for line_no in candidates if line_no < len(lines))
+            return
+
+        with f:
+            for line_no in candidates:
+                f.seek(offsets[line_no])
+                yield line_no, f.readline().strip()
+
+    def _read_closed_lines(self, path: Path) -> List[bytes]:
+        """讀取已關閉分段的所有行
+
+        已關閉的分段內容不再改變，保留最近讀取的一個分段，
+        讓連續分頁查詢同一個分段 (尤其是壓縮分段) 時不必每頁重新讀取與解壓。
+        """
+        key = segment_id(path)
+        cached = self._lines_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        lines = read_segment_lines(path)
+        if not lines and path.name.endswith(SEGMENT_SUFFIX) and not path.exists():
+            # 列出分段後才完成壓縮，改讀壓縮檔
+            lines = read_segment_lines(path.with_name(key + COMPRESSED_SUFFIX))
+        if lines:
+            self._lines_cache = (key, lines)
+        return lines
+
+    def get_logs(self, access_code: str = None, limit: int = 100) -> List[Dict]:
+        """獲取最新的記錄
+
+        Args:
+            access_code: 只返回此序號的記錄，None 表示全部
+            limit: 最大筆數
+
+        Returns:
+            list: 由新到舊排列的記錄
+        """
+        return self.query({"access_code": access_code}, limit=limit)[0]
+
+    def migrate_legacy_file(self, legacy_file: str):
+        """匯入舊版 chat_logs.json 的記錄，完成後將舊檔改名保留
+
+        Args:
+            legacy_file: 舊版對話記錄檔路徑
+        """
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                logs = json.load(f).get("logs", [])
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"舊版對話記錄無法解析，略過匯入: {e}")
+            return
+
+        logs.sort(key=lambda entry: entry.get("timestamp", ""))
+        self.append_many(logs)
+        os.replace(legacy_file, legacy_file + ".migrated")
+        logger.info(f"已匯入舊版對話記錄 {len(logs)} 筆")
+
+    def get_stats(self) -> dict:
+        """獲取存儲統計
+
+        Returns:
+            dict: 分段數量、大小與目前分段資訊
+        """
+        segments = self.list_segments()
+        return {
+            "directory": str(self.directory),
+            "segments": len(segments),
+            "total_bytes": sum(path.stat().st_size for path in segments if path.exists()),
+            "active_segment": self._active_path.name if self._active_path else None,
+            "active_bytes": self._active_size
+        }
@@ -0,0 +1,201 @@
+"""
+並發控制工具模組
+提供具上限的並發限制器 (統計排隊深度與等待時間)，以及合併相同請求的 single-flight 工具
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """等待佇列已滿時拋出"""
+
+
+class ConcurrencyLimiter:
+    """具上限的並發限制器
+
+    以 asyncio.Semaphore 限制同時執行的工作數量，超出上限的請求會排隊等待，
+    並記錄排隊深度、等待時間等統計資訊。
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_waiting: Optional[int] = None):
+        """初始化並發限制器
+
+        Args:
+            name: 限制器名稱，用於日誌與統計
+            max_concurrency: 同時執行的最大數量
+            max_waiting: 等待佇列上限，None 表示不限制
+        """
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_waiting = max_waiting
+        # Python 3.9 的 Semaphore 會在建立時綁定事件迴圈，因此延遲到首次使用時建立
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.peak_waiting = 0
+        self.total_acquired = 0
+        self.total_rejected = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.last_wait_time = 0.0
+
+    async def acquire_slot(self) -> float:
+        """取得執行名額，需自行呼叫 release_slot() 釋放
+
+        適用於名額需要保留到其他工作 (例如執行緒) 結束才釋放的情境，一般情況請使用 acquire()。
+
+        Returns:
+            float: 等待秒數
+
+        Raises:
+            ConcurrencyLimitExceeded: 等待佇列已滿時
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.max_waiting is not None and self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.total_rejected += 1
+            raise ConcurrencyLimitExceeded(f"{self.name} 等待佇列已滿 ({self.waiting})")
+
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        wait_time = time.perf_counter() - start
+        self.total_acquired += 1
+        self.total_wait_time += wait_time
+        self.last_wait_time = wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return wait_time
+
+    def release_slot(self):
+        """釋放 acquire_slot() 取得的名額 (需在事件迴圈執行緒中呼叫)"""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """取得執行名額，離開 context 時釋放
+
+        Raises:
+            ConcurrencyLimitExceeded: 等待佇列已滿時
+        """
+        wait_time = await self.acquire_slot()
+        try:
+            yield wait_time
+        finally:
+            self.release_slot()
+
+    def get_stats(self) -> dict:
+        """獲取統計資訊
+
+        Returns:
+            dict: 執行中數量、排隊深度與等待時間統計
+        """
+        avg_wait = self.total_wait_time / self.total_acquired if self.total_acquired else 0.0
+        return {
+            "name": self.name,
+            "max_concurrency": self.max_concurrency,
+            "max_waiting": self.max_waiting,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "peak_queue_depth": self.peak_waiting,
+            "total_acquired": self.total_acquired,
+            "total_rejected": self.total_rejected,
+            "avg_wait_ms": round(avg_wait * 1000, 2),
+            "max_wait_ms": round(self.max_wait_time * 1000, 2),
+            "last_wait_ms": round(self.last_wait_time * 1000, 2)
+        }
+
+
+class _Flight:
+    """進行中的共用呼叫"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合併相同鍵的並發呼叫
+
+    同一個鍵在進行中時，後續呼叫不會再發起新的上游請求，而是等待並共用第一個呼叫的結果
+    (包含例外)。個別呼叫端被取消不會影響其他等待者；所有等待者都取消時才取消上游呼叫。
+    """
+
+    def __init__(self, name: str):
+        """初始化 single-flight
+
+        Args:
+            name: 名稱，用於統計
+        """
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """執行或加入相同鍵的呼叫
+
+        Args:
+            key: 合併用的鍵
+            func: 無參數的協程函數，只有在沒有進行中的相同呼叫時才會執行
+
+        Returns:
+            共用呼叫的結果
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield 讓單一呼叫端的取消不會傳遞到共用的上游呼叫
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 所有等待者都已離開，取消上游呼叫並讓之後的請求重新發起
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.cancelled += 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        """移除已結束的呼叫"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def get_stats(self) -> dict:
+        """獲取合併統計
+
+        Returns:
+            dict: 上游呼叫數、被合併的請求數與進行中的呼叫數
+        """
+        return {
+            "name": self.name,
+            "in_flight_keys": len(self._flights),
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled
+        }
@@ -11,6 +11,54 @@ load_dotenv()
 # 管理員設定
 ADMIN_ACCESS_CODE = os.getenv('ADMIN_ACCESS_CODE', 'ai360')
 
+# API 服務 worker 數量 (大於 1 時必須使用可共用的會話存儲與 SQLite 存儲後端，
+# 例如 SESSION_BACKEND=sqlite、STORAGE_BACKEND=sqlite，否則啟動時會拋出錯誤)
+API_WORKERS = int(os.getenv('API_WORKERS', '1'))
+
+# 存儲後端設定
+STORAGE_SETTINGS = {
+    "backend": os.getenv('STORAGE_BACKEND', 'json').lower(),  # json 或 sqlite
+    "sqlite_path": os.getenv('SQLITE_PATH', 'backend/mvp.db'),  # SQLite 資料庫檔案
+    "sqlite_busy_timeout": float(os.getenv('SQLITE_BUSY_TIMEOUT', '5')),  # 等待寫入鎖的秒數
+    "migrate_from_json": os.getenv('SQLITE_MIGRATE_FROM_JSON', 'true').lower() == 'true'  # 空資料庫時自動匯入 JSON 資料
+}
+
+# 會話設定
+SESSION_SETTINGS = {
+    "backend": os.getenv('SESSION_BACKEND', 'memory').lower(),  # memory (單一 worker)、sqlite (同主機多 worker) 或 redis
+    "sqlite_path": os.getenv('SESSION_SQLITE_PATH', 'backend/sessions.db'),  # SQLite 會話資料庫檔案
+    "sqlite_busy_timeout": float(os.getenv('SESSION_SQLITE_BUSY_TIMEOUT', '5')),  # 等待寫入鎖的秒數
+    "redis_url": os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0'),  # Redis 連線位址
+    "touch_interval": float(os.getenv('SESSION_TOUCH_INTERVAL', '30')),  # 共用存儲中活動時間的最短寫入間隔秒數
+    "idle_ttl": float(os.getenv('SESSION_IDLE_TTL', '7200')),  # 閒置存活秒數，0 表示不限制
+    "absolute_ttl": float(os.getenv('SESSION_ABSOLUTE_TTL', '86400')),  # 自登入起的最長存活秒數，0 表示不限制
+    "max_sessions": int(os.getenv('SESSION_MAX', '50000')),  # 會話數上限，超過時淘汰最久未活動的會話
+    "sweep_interval": float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))  # 背景清理間隔秒數
+}
+
+# 序號檔案外部修改檢查間隔 (秒)
+CODES_RELOAD_INTERVAL = float(os.getenv('CODES_RELOAD_INTERVAL', '2'))
+
+# 序號檔案合併寫入設定
+CODES_COMMIT_SETTINGS = {
+    "window": float(os.getenv('CODES_COMMIT_WINDOW_MS', '2')) / 1000,  # 收到變更後等待合併更多變更的時間
+    "timeout": float(os.getenv('CODES_COMMIT_TIMEOUT', '10'))  # 等待變更落地的最長秒數
+}
+
+# 對話記錄存儲設定
+CHAT_LOG_SETTINGS = {
+    "directory": os.getenv('CHAT_LOG_DIR', 'backend/chat_logs'),  # 分段檔目錄
+    "max_segment_bytes": int(os.getenv('CHAT_LOG_SEGMENT_MB', '16')) * 1024 * 1024,  # 單一分段大小上限
+    "rotate_daily": os.getenv('CHAT_LOG_ROTATE_DAILY', 'true').lower() == 'true',  # 跨日切換分段
+    "compress": os.getenv('CHAT_LOG_COMPRESS', 'true').lower() == 'true',  # 壓縮已關閉的分段
+    "retention_days": int(os.getenv('CHAT_LOG_RETENTION_DAYS', '0')),  # 保留天數，0 表示永久保留
+    "max_segments": int(os.getenv('CHAT_LOG_MAX_SEGMENTS', '0')),  # 保留分段數上限，0 表示不限制
+    "queue_size": int(os.getenv('CHAT_LOG_QUEUE_SIZE', '10000')),  # 背景寫入佇列上限
+    "batch_size": int(os.getenv('CHAT_LOG_BATCH_SIZE', '200')),  # 單次寫入的最大筆數
+    "flush_interval": float(os.getenv('CHAT_LOG_FLUSH_INTERVAL', '0.5')),  # 批次最長等待秒數
+    "enqueue_timeout": float(os.getenv('CHAT_LOG_ENQUEUE_TIMEOUT', '1'))  # 佇列已滿時的最長等待秒數
+}
+
 # Gemma 模型選項
 GEMMA_MODELS = {
     "gemma-3-27b-it": "Gemma 3 27B (推薦)",
@@ -34,6 +82,12 @@ ASSISTANT_MODES = {
     "avatar_my_tts": "虛擬人物 + 我的語音 (覆蓋)"
 }
 
+# 品牌提示詞設定檔
+PROMPT_SETTINGS = {
+    "packs_dir": os.getenv('PROMPT_PACKS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts', 'packs')),  # 品牌設定檔目錄
+    "reload_interval": float(os.getenv('PROMPT_RELOAD_INTERVAL', '2'))  # 檢查設定檔變更的間隔秒數
+}
+
 # 預設設定
 DEFAULT_SETTINGS = {
     "llm_model": "gemma-3-27b-it",
@@ -41,3 +95,80 @@ DEFAULT_SETTINGS = {
     "max_response_length": 40,
     "assistant_mode": "text_tts"
 }
+
+# 回應長度設定 (請求的 max_length 以字數計)
+RESPONSE_LENGTH_SETTINGS = {
+    "length_tolerance": float(os.getenv('RESPONSE_LENGTH_TOLERANCE', '1.25')),  # 截斷字數 = max_length × 倍數，保留提示詞「通常 30-50 字」的彈性
+    "tokens_per_char": float(os.getenv('RESPONSE_TOKENS_PER_CHAR', '1.5')),  # 截斷字數換算為輸出 token 上限的倍數，讓最後一句有機會自然結束
+    "min_output_tokens": int(os.getenv('RESPONSE_MIN_OUTPUT_TOKENS', '32'))  # 輸出 token 上限的最小值
+}
+
+# 提示詞前綴快取設定 (品牌 × 風格的固定前綴登記為供應商端快取)
+CONTEXT_CACHE_SETTINGS = {
+    "enabled": os.getenv('CONTEXT_CACHE_ENABLED', 'false').lower() == 'true',
+    "provider": os.getenv('CONTEXT_CACHE_PROVIDER', 'gemini'),  # gemini | local (本地替身，用於開發測試)
+    "ttl": float(os.getenv('CONTEXT_CACHE_TTL', '3600')),  # 快取存活秒數
+    "refresh_margin": float(os.getenv('CONTEXT_CACHE_REFRESH_MARGIN', '300')),  # 剩餘存活時間低於此秒數時延長
+    "retry_after": float(os.getenv('CONTEXT_CACHE_RETRY_AFTER', '600')),  # 登記失敗後暫停嘗試的秒數
+    "min_prefix_chars": int(os.getenv('CONTEXT_CACHE_MIN_PREFIX_CHARS', '0')),  # 前綴短於此長度時不使用快取
+    "register_on_startup": os.getenv('CONTEXT_CACHE_REGISTER_ON_STARTUP', 'true').lower() == 'true'  # 啟動時預先登記所有品牌 × 風格
+}
+
+# 常見問題快速回應設定 (與品牌設定檔 faq 中的問題幾乎相同時直接回答，不呼叫 LLM，預設關閉)
+FAQ_SETTINGS = {
+    "enabled": os.getenv('FAQ_ENABLED', 'false').lower() == 'true',
+    "min_score": float(os.getenv('FAQ_MIN_SCORE', '0.9'))  # 直接回答所需的最低分數 (相似度 × 問題涵蓋比例，0~1)
+}
+
+# 品牌知識檢索設定 (提示詞只放入與問題相關的品牌知識段落，預設關閉)
+RETRIEVAL_SETTINGS = {
+    "enabled": os.getenv('RETRIEVAL_ENABLED', 'false').lower() == 'true',
+    "top_k": int(os.getenv('RETRIEVAL_TOP_K', '3')),  # 每次最多放入的段落數
+    "min_score": float(os.getenv('RETRIEVAL_MIN_SCORE', '0.05')),  # 段落相似度下限 (0~1)
+    "max_chunk_chars": int(os.getenv('RETRIEVAL_MAX_CHUNK_CHARS', '120')),  # 單段長度上限，過長的段落依行切開
+    "build_on_startup": os.getenv('RETRIEVAL_BUILD_ON_STARTUP', 'true').lower() == 'true'  # 啟動時預先建立所有品牌的索引
+}
+
+# LLM 並發設定
+LLM_SETTINGS = {
+    "max_concurrency": int(os.getenv('LLM_MAX_CONCURRENCY', '16')),  # 同時進行的 LLM 呼叫上限
+    "max_waiting": int(os.getenv('LLM_MAX_WAITING', '200')),  # 排隊等待的請求上限
+    "request_timeout": float(os.getenv('LLM_REQUEST_TIMEOUT', '60')),  # 單次呼叫逾時秒數
+    "warmup_on_startup": os.getenv('LLM_WARMUP_ON_STARTUP', 'true').lower() == 'true',  # 啟動時預熱模型
+    "warmup_timeout": float(os.getenv('LLM_WARMUP_TIMEOUT', '20'))  # 預熱探測逾時秒數
+}
+
+# TTS 並發設定
+TTS_SETTINGS = {
+    "max_concurrency": int(os.getenv('TTS_MAX_CONCURRENCY', '8')),  # 同時進行的 edge-tts 連線上限
+    "max_waiting": int(os.getenv('TTS_MAX_WAITING', '100'))  # 排隊等待的合成請求上限
+}
+
+# TTS 音訊快取設定
+TTS_CACHE_SETTINGS = {
+    "enabled": os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true',
+    "max_entries": int(os.getenv('TTS_CACHE_MAX_ENTRIES', '2000')),  # 最大快取筆數
+    "max_bytes": int(os.getenv('TTS_CACHE_MAX_MB', '64')) * 1024 * 1024  # 快取總容量上限
+}
+
+# 預設問題預先渲染設定
+QUICK_ANSWER_SETTINGS = {
+    "warmup_on_startup": os.getenv('QUICK_ANSWER_WARMUP_ON_STARTUP', 'true').lower() == 'true',  # 啟動時預先生成
+    "with_audio": os.getenv('QUICK_ANSWER_WITH_AUDIO', 'true').lower() == 'true',  # 同時生成預設語音的音訊
+    "concurrency": int(os.getenv('QUICK_ANSWER_CONCURRENCY', '4'))  # 預先渲染時的並發數
+}
+
+# LLM 回應快取設定 (預設關閉)
+LLM_CACHE_SETTINGS = {
+    "enabled": os.getenv('LLM_CACHE_ENABLED', 'false').lower() == 'true',
+    "ttl": int(os.getenv('LLM_CACHE_TTL', '600')),  # 預設存活秒數
+    # 各品牌存活秒數，格式: brand=seconds,brand=seconds
+    "brand_ttl": {
+        brand.strip(): int(ttl)
+        for brand, ttl in (
+            item.split('=', 1) for item in os.getenv('LLM_CACHE_BRAND_TTL', '').split(',') if '=' in item
+        )
+    },
+    "max_entries": int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000')),  # 最大快取筆數
+    "max_bytes": int(os.getenv('LLM_CACHE_MAX_MB', '16')) * 1024 * 1024  # 快取總容量上限
+}
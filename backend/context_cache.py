@@ -0,0 +1,323 @@
+"""
+提示詞前綴快取模組
+將品牌 × 風格的固定提示詞前綴登記為 LLM 供應商端的快取內容，
+之後每次請求只需送出用戶輸入，減少輸入 token 的處理時間與費用
+"""
+
+import datetime
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import google.generativeai as genai
+
+from config import CONTEXT_CACHE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+class ContextCacheProvider(ABC):
+    """供應商端快取介面
+
+    create() 返回 (handle, model)：handle 供後續延長或刪除快取，
+    model 提供與 genai.GenerativeModel 相同的 generate_content()，呼叫時只需傳入前綴之後的內容。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        """供應商是否支援快取"""
+
+    @abstractmethod
+    def create(self, model_name: str, prefix: str, ttl: float, base_model: Any) -> Tuple[Any, Any]:
+        """登記快取內容
+
+        Args:
+            model_name: 模型名稱
+            prefix: 固定前綴
+            ttl: 存活秒數
+            base_model: 不使用快取時的模型實例
+
+        Returns:
+            tuple: (handle, 使用快取的模型)
+        """
+
+    @abstractmethod
+    def refresh(self, handle: Any, ttl: float):
+        """延長快取存活時間"""
+
+    @abstractmethod
+    def delete(self, handle: Any):
+        """刪除快取內容"""
+
+
+class GeminiContextCacheProvider(ContextCacheProvider):
+    """Gemini 的 CachedContent 快取
+
+    需要提供 genai.caching 的 SDK 版本；目前鎖定的 google-generativeai 0.3.1 不支援，
+    此時 is_available() 返回 False，所有請求使用完整提示詞。
+    """
+
+    name = "gemini"
+
+    def is_available(self) -> bool:
+        return hasattr(genai, "caching")
+
+    def create(self, model_name: str, prefix: str, ttl: float, base_model: Any) -> Tuple[Any, Any]:
+        if not model_name.startswith("models/"):
+            model_name = f"models/{model_name}"
+        cached_content = genai.caching.CachedContent.create(
+            model=model_name,
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl)
+        )
+        return cached_content, genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+
+    def refresh(self, handle: Any, ttl: float):
+        handle.update(ttl=datetime.timedelta(seconds=ttl))
+
+    def delete(self, handle: Any):
+        handle.delete()
+
+
+class _LocalCachedModel:
+    """本地快取的模型代理，呼叫時在內容前補上前綴後交給實際模型"""
+
+    def __init__(self, provider: "LocalContextCacheProvider", handle: str, model: Any):
+        self._provider = provider
+        self._handle = handle
+        self._model = model
+
+    def generate_content(self, contents: str, **kwargs):
+        prefix = self._provider.lookup(self._handle)
+        return self._model.generate_content(prefix + contents, **kwargs)
+
+
+class LocalContextCacheProvider(ContextCacheProvider):
+    """本地替身供應商
+
+    以記憶體保存前綴並模擬存活時間，過期後呼叫會失敗，與供應商端快取過期時的行為一致。
+    用於開發與測試快取登記、延長與退回完整提示詞的流程，不會實際減少上游 token。
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def is_available(self) -> bool:
+        return True
+
+    def create(self, model_name: str, prefix: str, ttl: float, base_model: Any) -> Tuple[Any, Any]:
+        with self._lock:
+            self._counter += 1
+            handle = f"local/{self._counter}"
+            self._entries[handle] = (prefix, time.monotonic() + ttl)
+        return handle, _LocalCachedModel(self, handle, base_model)
+
+    def refresh(self, handle: Any, ttl: float):
+        with self._lock:
+            if handle not in self._entries:
+                raise KeyError(f"快取內容不存在: {handle}")
+            prefix, _ = self._entries[handle]
+            self._entries[handle] = (prefix, time.monotonic() + ttl)
+
+    def delete(self, handle: Any):
+        with self._lock:
+            self._entries.pop(handle, None)
+
+    def lookup(self, handle: str) -> str:
+        """取得快取的前綴
+
+        Raises:
+            KeyError: 快取不存在或已過期
+        """
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(handle, None)
+                raise KeyError(f"快取內容不存在或已過期: {handle}")
+            return entry[0]
+
+
+class _CacheEntry:
+    __slots__ = ("handle", "model", "expires_at")
+
+    def __init__(self, handle: Any, model: Any, expires_at: float):
+        self.handle = handle
+        self.model = model
+        self.expires_at = expires_at
+
+
+class ContextCacheManager:
+    """管理提示詞前綴的供應商端快取
+
+    以 (模型, 前綴雜湊) 為鍵，首次使用時登記快取，剩餘存活時間低於 refresh_margin 時於使用前延長。
+    登記或延長失敗時返回 None 讓呼叫端改送完整提示詞，並在 retry_after 秒內不再嘗試同一個前綴。
+    品牌設定更新後前綴改變，會自然使用新的快取鍵。
+    """
+
+    def __init__(self, provider: ContextCacheProvider, enabled: bool = True, ttl: float = 3600,
+                 refresh_margin: float = 300, retry_after: float = 600, min_prefix_chars: int = 0):
+        """初始化快取管理
+
+        Args:
+            provider: 供應商
+            enabled: 是否啟用
+            ttl: 快取存活秒數
+            refresh_margin: 剩餘存活時間低於此秒數時延長
+            retry_after: 登記失敗後暫停嘗試的秒數
+            min_prefix_chars: 前綴短於此長度時不使用快取
+        """
+        self.provider = provider
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl / 2)
+        self.retry_after = retry_after
+        self.min_prefix_chars = min_prefix_chars
+
+        self.enabled = enabled and provider.is_available()
+        if enabled and not self.enabled:
+            logger.warning(f"LLM 供應商 ({provider.name}) 不支援提示詞快取，將使用完整提示詞")
+
+        self._entries: Dict[Tuple[str, str], _CacheEntry] = {}
+        self._failed_until: Dict[Tuple[str, str], float] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.invalidations = 0
+        self.prefix_chars_saved = 0
+
+    @staticmethod
+    def make_key(model_name: str, prefix: str) -> Tuple[str, str]:
+        return model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+    def get_model(self, model_name: str, prefix: str, base_model: Any) -> Optional[Any]:
+        """取得使用快取前綴的模型 (會進行網路呼叫，需在執行緒池中執行)
+
+        Args:
+            model_name: 模型名稱
+            prefix: 固定前綴
+            base_model: 不使用快取時的模型實例
+
+        Returns:
+            使用快取的模型，呼叫時只需傳入前綴之後的內容；無法使用快取時返回 None
+        """
+        if not self.enabled or not prefix or len(prefix) < self.min_prefix_chars:
+            return None
+
+        key = self.make_key(model_name, prefix)
+        with self._lock:
+            if self._failed_until.get(key, 0.0) > time.monotonic():
+                self.fallbacks += 1
+                return None
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 同一個前綴同時只有一個執行緒登記或延長，其他執行緒等待後直接使用結果
+        with key_lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            try:
+                if entry is None or entry.expires_at <= now:
+                    handle, model = self.provider.create(model_name, prefix, self.ttl, base_model)
+                    entry = _CacheEntry(handle, model, now + self.ttl)
+                    self.creates += 1
+                    logger.info(f"提示詞前綴已登記快取: {model_name} ({len(prefix)} 字，存活 {self.ttl:.0f} 秒)")
+                elif entry.expires_at - now < self.refresh_margin:
+                    self.provider.refresh(entry.handle, self.ttl)
+                    entry.expires_at = now + self.ttl
+                    self.refreshes += 1
+            except Exception as e:
+                self._entries.pop(key, None)
+                with self._lock:
+                    self._failed_until[key] = now + self.retry_after
+                    self.failures += 1
+                    self.fallbacks += 1
+                logger.warning(f"提示詞快取無法使用，改送完整提示詞: {model_name} - {e}")
+                return None
+
+            self._entries[key] = entry
+
+        with self._lock:
+            self.hits += 1
+            self.prefix_chars_saved += len(prefix)
+        return entry.model
+
+    def register(self, model_name: str, prefixes: Iterable[str], base_model: Any) -> int:
+        """預先登記多個前綴 (例如啟動時登記所有品牌 × 風格)
+
+        Returns:
+            int: 成功登記的數量
+        """
+        registered = 0
+        for prefix in set(prefixes):
+            if self.get_model(model_name, prefix, base_model) is not None:
+                registered += 1
+        return registered
+
+    def invalidate(self, model_name: str, prefix: str):
+        """使用快取呼叫失敗時移除該前綴的快取，下次使用時重新登記"""
+        key = self.make_key(model_name, prefix)
+        entry = self._entries.pop(key, None)
+        with self._lock:
+            self.invalidations += 1
+        if entry is not None:
+            try:
+                self.provider.delete(entry.handle)
+            except Exception as e:
+                logger.debug(f"刪除提示詞快取失敗: {e}")
+
+    def get_stats(self) -> dict:
+        """獲取快取統計"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "provider": self.provider.name,
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "creates": self.creates,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "fallbacks": self.fallbacks,
+                "invalidations": self.invalidations,
+                "prefix_chars_saved": self.prefix_chars_saved
+            }
+
+
+def create_context_cache(provider: str = None) -> ContextCacheManager:
+    """依配置建立提示詞快取管理
+
+    Args:
+        provider: gemini 或 local，預設使用配置值
+    """
+    provider = provider or CONTEXT_CACHE_SETTINGS["provider"]
+    if provider == "local":
+        cache_provider = LocalContextCacheProvider()
+    elif provider == "gemini":
+        cache_provider = GeminiContextCacheProvider()
+    else:
+        raise ValueError(f"不支援的提示詞快取供應商: {provider}")
+
+    return ContextCacheManager(
+        cache_provider,
+        enabled=CONTEXT_CACHE_SETTINGS["enabled"],
+        ttl=CONTEXT_CACHE_SETTINGS["ttl"],
+        refresh_margin=CONTEXT_CACHE_SETTINGS["refresh_margin"],
+        retry_after=CONTEXT_CACHE_SETTINGS["retry_after"],
+        min_prefix_chars=CONTEXT_CACHE_SETTINGS["min_prefix_chars"]
+    )
+
+
+# 全域提示詞快取實例
+context_cache = create_context_cache()
@@ -0,0 +1,90 @@
+"""
+資料匯出工具
+將記錄迭代器逐列序列化為 NDJSON 或 CSV，並合併成適當大小的區塊供串流回應使用
+"""
+
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, Sequence
+
+# StreamingResponse 會自動為 text/* 類型附加 charset=utf-8，此處不重複指定
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+LOG_EXPORT_FIELDS = (
+    "timestamp", "session_id", "access_code", "brand",
+    "ip_address", "user_agent", "user_message", "bot_response"
+)
+CODE_EXPORT_FIELDS = (
+    "code", "type", "description", "is_used", "created_at",
+    "used_at", "reset_count", "usage_history"
+)
+
+# 累積到此大小才送出一個區塊，避免每列一個 chunk 的傳輸開銷
+CHUNK_SIZE = 64 * 1024
+
+
+def _iter_ndjson_lines(rows: Iterable[Dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def _iter_csv_lines(rows: Iterable[Dict], fields: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    # UTF-8 BOM 讓 Excel 正確辨識中文
+    writer.writerow(fields)
+    yield "\ufeff" + flush()
+
+    for row in rows:
+        values = []
+        for field in fields:
+            value = row.get(field)
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, ensure_ascii=False)
+            values.append("" if value is None else value)
+        writer.writerow(values)
+        yield flush()
+
+
+def iter_export(rows: Iterable[Dict], export_format: str, fields: Sequence[str]) -> Iterator[bytes]:
+    """將記錄串流序列化為指定格式
+
+    Args:
+        rows: 記錄迭代器
+        export_format: ndjson 或 csv
+        fields: CSV 欄位順序
+
+    Yields:
+        bytes: 約 CHUNK_SIZE 大小的資料區塊
+
+    Raises:
+        ValueError: 不支援的格式
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"不支援的匯出格式: {export_format}")
+
+    lines = _iter_ndjson_lines(rows) if export_format == "ndjson" else _iter_csv_lines(rows, fields)
+
+    pending = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b"".join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield b"".join(pending)
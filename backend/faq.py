@@ -0,0 +1,171 @@
+"""
+常見問題快速回應模組
+以品牌設定檔中的 faq 問答建立字元 n-gram 索引，
+用戶問題與已知問題 (或其他問法) 相同或幾乎相同時直接返回標準答案，不呼叫 LLM
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from config import FAQ_SETTINGS
+from ngram_index import NgramIndex, char_ngrams, normalize_chars
+from prompts import registry
+from prompts.registry import BrandPack
+
+logger = logging.getLogger(__name__)
+
+
+class FaqMatch(NamedTuple):
+    """常見問題比對結果"""
+    question: str  # 比對到的標準問題
+    answer: str
+    score: float  # 相似度 (0~1)
+
+
+class _BrandFaq:
+    """單一品牌的常見問題索引，標準問題與其他問法各自建立一份文件"""
+
+    __slots__ = ("mtime", "entries", "doc_entries", "doc_grams", "exact", "index")
+
+    def __init__(self, pack: BrandPack):
+        self.mtime = pack.mtime
+        self.entries: List[Tuple[str, str]] = []
+        self.doc_entries: List[int] = []
+        self.doc_grams: List[FrozenSet[str]] = []
+        # 正規化後的問題與其他問法 → 問答索引，完全相同時直接命中
+        self.exact: Dict[str, int] = {}
+        documents: List[str] = []
+
+        for item in pack.data.get("faq", []):
+            question, answer = item.get("question"), item.get("answer")
+            if not question or not answer:
+                logger.warning(f"品牌 {pack.brand_id} 的常見問題缺少 question 或 answer，已略過")
+                continue
+            entry_id = len(self.entries)
+            self.entries.append((question, answer))
+            for text in [question] + list(item.get("aliases", [])):
+                documents.append(text)
+                self.doc_entries.append(entry_id)
+                self.doc_grams.append(frozenset(char_ngrams(text)))
+                self.exact.setdefault(normalize_chars(text), entry_id)
+
+        self.index = NgramIndex(documents)
+
+
+class FaqMatcher:
+    """常見問題比對器
+
+    標準答案不經過 LLM，因此只接受幾乎相同的問題：與標準問題或其他問法 (忽略空白與標點) 完全相同時直接命中，
+    否則相似度須再乘上用戶問題被該問法涵蓋的 n-gram 比例，問題多出的主詞 (例如「孕婦」「狗」) 會使分數低於門檻。
+    每個品牌的索引在首次使用時建立，品牌設定檔更新後 (修改時間改變) 自動重建。
+    """
+
+    def __init__(self, enabled: bool = False, min_score: float = 0.9):
+        """初始化比對器
+
+        Args:
+            enabled: 是否啟用
+            min_score: 直接回答所需的最低分數 (0~1)
+        """
+        self.enabled = enabled
+        self.min_score = min_score
+
+        self._brands: Dict[str, _BrandFaq] = {}
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.brand_hits: Dict[str, int] = {}
+        self.match_seconds = 0.0
+
+    def _get_brand(self, brand: str) -> Optional[_BrandFaq]:
+        pack = registry.get(brand)
+        if pack is None:
+            return None
+
+        brand_faq = self._brands.get(brand)
+        if brand_faq is None or brand_faq.mtime != pack.mtime:
+            brand_faq = _BrandFaq(pack)
+            with self._lock:
+                self._brands[brand] = brand_faq
+            if brand_faq.entries:
+                logger.info(f"常見問題索引已建立: {brand} ({len(brand_faq.entries)} 題)")
+        return brand_faq
+
+    def match(self, brand: str, question: str, record_stats: bool = True) -> Optional[FaqMatch]:
+        """比對用戶問題
+
+        Args:
+            brand: 品牌識別碼
+            question: 用戶問題
+            record_stats: 是否計入命中統計 (預先渲染等內部查詢不計入)
+
+        Returns:
+            相似度達到門檻時返回比對結果，否則 (或未啟用時) 返回 None
+        """
+        if not self.enabled:
+            return None
+
+        start = time.perf_counter()
+        brand_faq = self._get_brand(brand)
+        if brand_faq is None or not brand_faq.entries:
+            return None
+
+        result = None
+        entry_id = brand_faq.exact.get(normalize_chars(question))
+        if entry_id is not None:
+            result = FaqMatch(*brand_faq.entries[entry_id], 1.0)
+        else:
+            doc_id, score = self._best_document(brand_faq, question)
+            if doc_id is not None:
+                result = FaqMatch(*brand_faq.entries[brand_faq.doc_entries[doc_id]], score)
+
+        if not record_stats:
+            return result
+
+        with self._lock:
+            self.lookups += 1
+            self.match_seconds += time.perf_counter() - start
+            if result is not None:
+                self.hits += 1
+                self.brand_hits[brand] = self.brand_hits.get(brand, 0) + 1
+        return result
+
+    def _best_document(self, brand_faq: _BrandFaq, question: str) -> Tuple[Optional[int], float]:
+        """找出分數 (相似度 × 涵蓋比例) 達到門檻的最佳問法
+
+        Returns:
+            tuple: (文件索引, 分數)，沒有達到門檻的問法時文件索引為 None
+        """
+        query_grams = set(char_ngrams(question))
+        if not query_grams:
+            return None, 0.0
+
+        best_doc, best_score = None, 0.0
+        for doc_id, similarity in brand_faq.index.search(question, top_k=3, min_score=self.min_score):
+            coverage = len(query_grams & brand_faq.doc_grams[doc_id]) / len(query_grams)
+            score = similarity * coverage
+            if score >= self.min_score and score > best_score:
+                best_doc, best_score = doc_id, score
+        return best_doc, best_score
+
+    def get_stats(self) -> dict:
+        """獲取比對統計"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "min_score": self.min_score,
+                "entries": {brand: len(brand_faq.entries) for brand, brand_faq in self._brands.items()},
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.lookups - self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "brand_hits": dict(self.brand_hits),
+                "avg_match_us": round(self.match_seconds / self.lookups * 1_000_000, 1) if self.lookups else 0.0
+            }
+
+
+# 全域常見問題比對器實例
+faq_matcher = FaqMatcher(FAQ_SETTINGS["enabled"], FAQ_SETTINGS["min_score"])
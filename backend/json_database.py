@@ -1,28 +1,159 @@
 """
 基於 JSON 文件的資料庫模型和操作
-替代 SQLite，使用 JSON 文件存儲序號和對話記錄
+替代 SQLite，使用 JSON 文件存儲序號，對話記錄以分段 JSONL 檔追加存儲
 """
 
 import json
+import logging
 import secrets
+import tempfile
+import threading
+import time
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, Iterator, List, Dict, Tuple
 import os
 from pathlib import Path
-from config import ADMIN_ACCESS_CODE
+from config import ADMIN_ACCESS_CODE, CODES_RELOAD_INTERVAL, CODES_COMMIT_SETTINGS, CHAT_LOG_SETTINGS
+from chat_log_store import SegmentedLogStore
+from storage_backend import EXPORT_BATCH_SIZE, StorageBackend, decode_cursor, encode_cursor
 
-class JSONDatabase:
-    def __init__(self, codes_file: str = "backend/access_codes.json", logs_file: str = "backend/chat_logs.json"):
+logger = logging.getLogger(__name__)
+
+class CodesCommitter:
+    """序號檔案的單一寫入執行緒
+    
+    變更在記憶體中完成後只登記新版本號，由此執行緒將一段時間內的多筆變更合併為一次寫入 (group commit)，
+    等待中的呼叫端在包含其變更的版本落地後一起返回。
+    """
+    
+    def __init__(self, db: "JSONDatabase", window: float = None):
+        """初始化寫入執行緒
+        
+        Args:
+            db: 序號所屬的資料庫
+            window: 收到第一筆變更後再等待多少秒以合併更多變更，預設使用配置值
+        """
+        self.db = db
+        self.window = CODES_COMMIT_SETTINGS["window"] if window is None else window
+        self._cond = threading.Condition()
+        self._requested = 0  # 最新要求寫入的版本
+        self._durable = 0  # 已寫入磁碟的版本
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        
+        self.requests = 0
+        self.commits = 0
+        self.errors = 0
+        self.max_batch = 0
+        self.last_commit_ms = 0.0
+    
+    def request(self, version: int):
+        """要求將指定版本寫入磁碟"""
+        with self._cond:
+            self._requested = max(self._requested, version)
+            self.requests += 1
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="codes-committer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+    
+    def wait(self, version: int, timeout: float = None) -> bool:
+        """等待指定版本寫入磁碟
+        
+        Returns:
+            bool: 是否在時限內完成寫入
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._durable >= version, timeout)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._requested > self._durable or self._stopping)
+                if self._requested <= self._durable:
+                    self._thread = None
+                    return
+            
+            if self.window > 0 and not self._stopping:
+                time.sleep(self.window)
+            
+            start = time.perf_counter()
+            with self.db._lock:
+                version, payload = self.db._snapshot_codes()
+            try:
+                self.db._write_snapshot(version, payload)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"序號檔案寫入錯誤，稍後重試: {e}")
+                time.sleep(0.5)
+                continue
+            
+            with self._cond:
+                self.max_batch = max(self.max_batch, version - self._durable)
+                self._durable = max(self._durable, version)
+                self.commits += 1
+                self.last_commit_ms = round((time.perf_counter() - start) * 1000, 2)
+                self._cond.notify_all()
+    
+    def stop(self, timeout: float = 10):
+        """寫入剩餘的變更並停止執行緒"""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+    
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "commits": self.commits,
+            "pending_versions": self._requested - self._durable,
+            "max_batch": self.max_batch,
+            "last_commit_ms": self.last_commit_ms,
+            "errors": self.errors
+        }
+
+class JSONDatabase(StorageBackend):
+    backend_name = "json"
+    
+    def __init__(self, codes_file: str = "backend/access_codes.json", logs_dir: str = None,
+                 reload_interval: float = None, legacy_logs_file: str = "backend/chat_logs.json"):
+        super().__init__()
         self.codes_file = codes_file
-        self.logs_file = logs_file
-        self.sessions = {}  # 內存中的會話存儲
+        
+        # 對話記錄：僅追加的分段 JSONL 檔
+        self.log_store = SegmentedLogStore(
+            logs_dir or CHAT_LOG_SETTINGS["directory"],
+            max_segment_bytes=CHAT_LOG_SETTINGS["max_segment_bytes"],
+            rotate_daily=CHAT_LOG_SETTINGS["rotate_daily"],
+            compress=CHAT_LOG_SETTINGS["compress"],
+            retention_days=CHAT_LOG_SETTINGS["retention_days"],
+            max_segments=CHAT_LOG_SETTINGS["max_segments"]
+        )
+        self.log_store.migrate_legacy_file(legacy_logs_file)
+        
+        # 序號索引：以序號為鍵的記憶體字典，讀取時不需存取磁碟
+        self._codes: Dict[str, Dict] = {}
+        self._codes_loaded = False
+        self._codes_mtime = None
+        self._last_mtime_check = 0.0
+        self._reload_interval = CODES_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self._lock = threading.RLock()  # 序號索引的所有變更都在此鎖內完成
+        
+        # 寫入：變更遞增版本號，由單一寫入執行緒合併落地
+        self._codes_version = 0
+        self._written_version = 0
+        self._write_lock = threading.Lock()
+        self._committer = CodesCommitter(self)
+        
         self.init_files()
     
     def init_files(self):
         """初始化 JSON 文件"""
         # 確保目錄存在
         Path(self.codes_file).parent.mkdir(parents=True, exist_ok=True)
-        Path(self.logs_file).parent.mkdir(parents=True, exist_ok=True)
         
         # 初始化序號文件
         if not os.path.exists(self.codes_file):
@@ -40,14 +171,9 @@ class JSONDatabase:
                 ]
             }
             self.save_codes(initial_codes)
-        
-        # 初始化對話記錄文件
-        if not os.path.exists(self.logs_file):
-            initial_logs = {"logs": []}
-            self.save_logs(initial_logs)
     
-    def load_codes(self) -> Dict:
-        """載入序號數據"""
+    def _read_codes_file(self) -> Dict:
+        """從磁碟讀取序號文件"""
         try:
             with open(self.codes_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -63,301 +189,353 @@ class JSONDatabase:
                 # 如果還是失敗，返回空結構
                 return {"codes": []}
     
-    def save_codes(self, data: Dict):
-        """保存序號數據"""
-        with open(self.codes_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    def load_logs(self) -> Dict:
-        """載入對話記錄"""
+    def _get_codes_mtime(self) -> Optional[int]:
         try:
-            with open(self.logs_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {"logs": []}
+            return os.stat(self.codes_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def _reload_codes(self):
+        """從磁碟重建序號索引 (呼叫端需持有鎖)"""
+        data = self._read_codes_file()
+        old_codes = self._codes
+        self._codes = {code_info["code"]: code_info for code_info in data.get("codes", [])}
+        self._codes_mtime = self._get_codes_mtime()
+        
+        if self._codes_loaded:
+            # 外部修改中被刪除或重置的序號，其會話快照已過時
+            for code, old_info in old_codes.items():
+                new_info = self._codes.get(code)
+                if new_info is None or new_info.get("reset_count") != old_info.get("reset_count"):
+                    self.invalidate_code_sessions(code)
+        self._codes_loaded = True
     
-    def save_logs(self, data: Dict):
-        """保存對話記錄"""
-        with open(self.logs_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def _ensure_codes(self) -> Dict[str, Dict]:
+        """取得序號索引
+        
+        首次使用時載入；之後每隔 reload_interval 秒檢查一次檔案修改時間，
+        偵測到外部修改 (例如手動編輯) 時重新載入，其餘讀取完全不存取磁碟。
+        """
+        with self._lock:
+            if not self._codes_loaded:
+                self._reload_codes()
+                self._last_mtime_check = time.monotonic()
+                return self._codes
+            
+            now = time.monotonic()
+            if now - self._last_mtime_check >= self._reload_interval:
+                self._last_mtime_check = now
+                # 尚有變更未落地時不重新載入，避免以舊檔案覆蓋記憶體中的變更
+                if self._codes_version == self._written_version and self._get_codes_mtime() != self._codes_mtime:
+                    logger.info("偵測到序號檔案被外部修改，重新載入")
+                    self._reload_codes()
+            return self._codes
+    
+    def _snapshot_codes(self) -> Tuple[int, str]:
+        """序列化目前的序號索引 (呼叫端需持有鎖)
+        
+        Returns:
+            tuple: (版本號, JSON 字串)
+        """
+        data = {"codes": list(self._codes.values())}
+        return self._codes_version, json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    
+    def _write_snapshot(self, version: int, payload: str):
+        """以暫存檔加上原子替換的方式寫入序號快照，較舊的快照不會覆蓋較新的快照
+        
+        呼叫端不可在持有 _write_lock 時再取得 _lock，以免與持有 _lock 的同步寫入互相等待。
+        """
+        with self._write_lock:
+            if version <= self._written_version:
+                return
+            directory = os.path.dirname(os.path.abspath(self.codes_file))
+            fd, tmp_path = tempfile.mkstemp(prefix=".access_codes.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.codes_file)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            # 記錄自己寫入後的修改時間，避免被誤判為外部修改
+            self._codes_mtime = self._get_codes_mtime()
+            self._written_version = version
+    
+    def _mark_dirty(self) -> int:
+        """登記一筆已完成的記憶體變更並要求寫入 (呼叫端需持有鎖)
+        
+        Returns:
+            int: 包含此變更的版本號
+        """
+        self._codes_version += 1
+        self._committer.request(self._codes_version)
+        return self._codes_version
+    
+    def _wait_durable(self, version: int):
+        """等待包含變更的版本落地 (呼叫端不可持有鎖)"""
+        if not self._committer.wait(version, CODES_COMMIT_SETTINGS["timeout"]):
+            logger.warning(f"序號檔案寫入逾時 (版本 {version})，變更已生效但尚未落地")
+    
+    def load_codes(self) -> Dict:
+        """載入序號數據"""
+        with self._lock:
+            return {"codes": list(self._ensure_codes().values())}
+    
+    def save_codes(self, data: Dict):
+        """保存序號數據 (整份取代並同步寫入)"""
+        with self._lock:
+            self._codes = {code_info["code"]: code_info for code_info in data.get("codes", [])}
+            self._codes_loaded = True
+            self._codes_version += 1
+            self._write_snapshot(*self._snapshot_codes())
     
     def generate_access_code(self, code_type: str = "one_time", description: str = "") -> str:
         """生成存取序號"""
-        code = secrets.token_hex(8).upper()
-        
-        codes_data = self.load_codes()
-        new_code = {
-            "code": code,
-            "type": code_type,
-            "description": description,
-            "is_used": False,
-            "created_at": datetime.now().isoformat() + "Z",
-            "used_at": None,
-            "usage_history": []
-        }
-        
-        if code_type == "one_time":
-            new_code["reset_count"] = 0
-        
-        codes_data["codes"].append(new_code)
-        self.save_codes(codes_data)
-        
+        with self._lock:
+            codes = self._ensure_codes()
+            code = secrets.token_hex(8).upper()
+            while code in codes:
+                code = secrets.token_hex(8).upper()
+            
+            codes[code] = self.new_code_record(code, code_type, description)
+            version = self._mark_dirty()
+        
+        self._wait_durable(version)
         return code
     
     def validate_access_code(self, code: str) -> Dict:
         """驗證存取序號"""
-        codes_data = self.load_codes()
+        code_info = self._ensure_codes().get(code)
+        if code_info is None:
+            return {"valid": False, "reason": "序號不存在"}
         
-        for code_info in codes_data["codes"]:
-            if code_info["code"] == code:
-                # 檢查一次性序號是否已使用
-                if code_info["type"] == "one_time" and code_info["is_used"]:
-                    return {"valid": False, "reason": "序號已使用"}
-                
-                return {
-                    "valid": True,
-                    "code": code_info["code"],
-                    "type": code_info["type"],
-                    "is_used": code_info["is_used"],
-                    "created_at": code_info["created_at"]
-                }
+        # 檢查一次性序號是否已使用
+        if code_info["type"] == "one_time" and code_info["is_used"]:
+            return {"valid": False, "reason": "序號已使用"}
         
-        return {"valid": False, "reason": "序號不存在"}
+        return {
+            "valid": True,
+            "code": code_info["code"],
+            "type": code_info["type"],
+            "is_used": code_info["is_used"],
+            "created_at": code_info["created_at"]
+        }
     
     def use_access_code(self, code: str) -> bool:
         """標記序號為已使用（僅限一次性序號）"""
-        codes_data = self.load_codes()
-        
-        for code_info in codes_data["codes"]:
-            if code_info["code"] == code and code_info["type"] == "one_time":
-                code_info["is_used"] = True
-                code_info["used_at"] = datetime.now().isoformat() + "Z"
-                
-                # 記錄使用歷史
-                usage_record = {
-                    "used_at": code_info["used_at"],
-                    "action": "used"
-                }
-                code_info["usage_history"].append(usage_record)
-                
-                self.save_codes(codes_data)
-                return True
+        with self._lock:
+            code_info = self._ensure_codes().get(code)
+            if code_info is None or code_info["type"] != "one_time":
+                return False
+            
+            code_info["is_used"] = True
+            code_info["used_at"] = datetime.now().isoformat() + "Z"
+            
+            # 記錄使用歷史
+            usage_record = {
+                "used_at": code_info["used_at"],
+                "action": "used"
+            }
+            code_info["usage_history"].append(usage_record)
+            version = self._mark_dirty()
         
-        return False
+        self._wait_durable(version)
+        return True
+    
+    def redeem_access_code(self, code: str) -> Dict:
+        """驗證並兌換序號
+        
+        一次性序號的檢查與標記在同一把鎖內完成 (compare-and-set)，同一序號只有一個請求能兌換成功；
+        寫入由寫入執行緒合併，同時段的多筆兌換只需一次落地。
+        """
+        with self._lock:
+            validation = self.validate_access_code(code)
+            if not validation["valid"] or validation["type"] != "one_time":
+                return validation
+            
+            code_info = self._codes[code]
+            code_info["is_used"] = True
+            code_info["used_at"] = datetime.now().isoformat() + "Z"
+            code_info["usage_history"].append({
+                "used_at": code_info["used_at"],
+                "action": "used"
+            })
+            version = self._mark_dirty()
+        
+        self._wait_durable(version)
+        return validation
     
     def reset_access_code(self, code: str, admin_code: str = None) -> Dict:
         """重置一次性序號（管理員功能）"""
         # 驗證管理員權限
-        if admin_code:
-            admin_validation = self.validate_access_code(admin_code)
-            if not admin_validation["valid"] or admin_validation["type"] != "permanent":
-                return {"success": False, "message": "無效的管理員序號"}
-        
-        codes_data = self.load_codes()
-        
-        for code_info in codes_data["codes"]:
-            if code_info["code"] == code:
-                if code_info["type"] != "one_time":
-                    return {"success": False, "message": "只能重置一次性序號"}
-                
-                if not code_info["is_used"]:
-                    return {"success": False, "message": "序號尚未使用，無需重置"}
-                
-                # 重置序號
-                code_info["is_used"] = False
-                code_info["used_at"] = None
-                code_info["reset_count"] = code_info.get("reset_count", 0) + 1
-                
-                # 記錄重置歷史
-                reset_record = {
-                    "reset_at": datetime.now().isoformat() + "Z",
-                    "action": "reset",
-                    "reset_by": admin_code or "system"
-                }
-                code_info["usage_history"].append(reset_record)
-                
-                self.save_codes(codes_data)
-                return {
-                    "success": True, 
-                    "message": f"序號已重置，重置次數: {code_info['reset_count']}"
-                }
+        if admin_code and not self.is_admin_code(admin_code):
+            return {"success": False, "message": "無效的管理員序號"}
+        
+        with self._lock:
+            code_info = self._ensure_codes().get(code)
+            if code_info is None:
+                return {"success": False, "message": "序號不存在"}
+            
+            if code_info["type"] != "one_time":
+                return {"success": False, "message": "只能重置一次性序號"}
+            
+            if not code_info["is_used"]:
+                return {"success": False, "message": "序號尚未使用，無需重置"}
+            
+            # 重置序號
+            code_info["is_used"] = False
+            code_info["used_at"] = None
+            code_info["reset_count"] = code_info.get("reset_count", 0) + 1
+            
+            # 記錄重置歷史
+            reset_record = {
+                "reset_at": datetime.now().isoformat() + "Z",
+                "action": "reset",
+                "reset_by": admin_code or "system"
+            }
+            code_info["usage_history"].append(reset_record)
+            reset_count = code_info["reset_count"]
+            version = self._mark_dirty()
+            self.invalidate_code_sessions(code)
         
-        return {"success": False, "message": "序號不存在"}
+        self._wait_durable(version)
+        return {
+            "success": True, 
+            "message": f"序號已重置，重置次數: {reset_count}"
+        }
     
     def delete_access_code(self, code: str, admin_code: str = None) -> Dict:
         """刪除序號（管理員功能）"""
         # 驗證管理員權限
-        if admin_code:
-            admin_validation = self.validate_access_code(admin_code)
-            if not admin_validation["valid"] or admin_validation["type"] != "permanent":
-                return {"success": False, "message": "無效的管理員序號"}
-        
-        codes_data = self.load_codes()
-        
-        for i, code_info in enumerate(codes_data["codes"]):
-            if code_info["code"] == code:
-                # 不允許刪除管理員序號
-                if code_info["type"] == "permanent" and code_info["code"] == ADMIN_ACCESS_CODE:
-                    return {"success": False, "message": "不能刪除管理員序號"}
-                
-                # 刪除序號
-                deleted_code = codes_data["codes"].pop(i)
-                self.save_codes(codes_data)
-                
-                return {
-                    "success": True, 
-                    "message": f"序號 {code} 已刪除",
-                    "deleted_code": deleted_code
-                }
-        
-        return {"success": False, "message": "序號不存在"}
+        if admin_code and not self.is_admin_code(admin_code):
+            return {"success": False, "message": "無效的管理員序號"}
+        
+        with self._lock:
+            codes = self._ensure_codes()
+            code_info = codes.get(code)
+            if code_info is None:
+                return {"success": False, "message": "序號不存在"}
+            
+            # 不允許刪除管理員序號
+            if code_info["type"] == "permanent" and code_info["code"] == ADMIN_ACCESS_CODE:
+                return {"success": False, "message": "不能刪除管理員序號"}
+            
+            # 刪除序號
+            deleted_code = codes.pop(code)
+            version = self._mark_dirty()
+            self.invalidate_code_sessions(code)
+        
+        self._wait_durable(version)
+        return {
+            "success": True, 
+            "message": f"序號 {code} 已刪除",
+            "deleted_code": deleted_code
+        }
     
     def create_custom_code(self, custom_code: str, code_type: str = "one_time", description: str = "", admin_code: str = None) -> Dict:
         """創建自定義序號（管理員功能）"""
         # 驗證管理員權限
-        if admin_code:
-            admin_validation = self.validate_access_code(admin_code)
-            if not admin_validation["valid"] or admin_validation["type"] != "permanent":
-                return {"success": False, "message": "無效的管理員序號"}
-        
-        codes_data = self.load_codes()
-        
-        # 檢查序號是否已存在
-        for code_info in codes_data["codes"]:
-            if code_info["code"] == custom_code:
+        if admin_code and not self.is_admin_code(admin_code):
+            return {"success": False, "message": "無效的管理員序號"}
+        
+        with self._lock:
+            codes = self._ensure_codes()
+            
+            # 檢查序號是否已存在
+            if custom_code in codes:
                 return {"success": False, "message": "序號已存在"}
+            
+            # 創建新序號
+            codes[custom_code] = self.new_code_record(custom_code, code_type, description)
+            version = self._mark_dirty()
         
-        # 創建新序號
-        new_code = {
-            "code": custom_code,
-            "type": code_type,
-            "description": description,
-            "is_used": False,
-            "created_at": datetime.now().isoformat() + "Z",
-            "used_at": None,
-            "usage_history": []
-        }
-        
-        if code_type == "one_time":
-            new_code["reset_count"] = 0
-        
-        codes_data["codes"].append(new_code)
-        self.save_codes(codes_data)
-        
+        self._wait_durable(version)
         return {
             "success": True,
             "message": f"成功創建 {code_type} 序號: {custom_code}",
             "code": custom_code
         }
     
-    def create_session(self, access_code: str, ip_address: str, user_agent: str = "") -> str:
-        """創建會話"""
-        session_id = secrets.token_hex(16)
-        
-        self.sessions[session_id] = {
-            "session_id": session_id,
-            "access_code": access_code,
-            "ip_address": ip_address,
-            "user_agent": user_agent,
-            "started_at": datetime.now().isoformat() + "Z",
-            "last_activity": datetime.now().isoformat() + "Z",
-            "is_active": True
-        }
-        
-        return session_id
+    def log_chats(self, entries: List[Dict]):
+        """批次記錄多筆對話（一次寫入）"""
+        self.log_store.append_many(entries)
     
-    def validate_session(self, session_id: str) -> Dict:
-        """驗證會話"""
-        if session_id not in self.sessions:
-            return {"valid": False, "reason": "會話無效或已過期"}
-        
-        session = self.sessions[session_id]
-        if not session["is_active"]:
-            return {"valid": False, "reason": "會話已失效"}
-        
-        # 獲取序號類型
-        code_validation = self.validate_access_code(session["access_code"])
-        code_type = code_validation.get("type", "unknown") if code_validation["valid"] else "unknown"
-        
-        return {
-            "valid": True,
-            "session_id": session["session_id"],
-            "access_code": session["access_code"],
-            "ip_address": session["ip_address"],
-            "code_type": code_type
-        }
+    def get_chat_logs(self, access_code: str = None, limit: int = 100) -> List[Dict]:
+        """獲取對話記錄（由新到舊）"""
+        return self.log_store.get_logs(access_code, limit)
     
-    def update_session_activity(self, session_id: str):
-        """更新會話活動時間"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["last_activity"] = datetime.now().isoformat() + "Z"
+    def query_chat_logs(self, access_code: str = None, brand: str = None, session_id: str = None,
+                        start: str = None, end: str = None, limit: int = 100,
+                        cursor: Optional[str] = None) -> Dict:
+        """依條件分頁查詢對話記錄（由新到舊，使用分段索引）"""
+        after = None
+        if cursor:
+            segment, line = decode_cursor(cursor, 2)
+            if not isinstance(segment, str) or not isinstance(line, int):
+                raise ValueError("無效的分頁游標")
+            after = (segment, line)
+        
+        filters = {"access_code": access_code, "brand": brand, "session_id": session_id}
+        logs, last = self.log_store.query(filters, start, end, limit, after)
+        return {"logs": logs, "next_cursor": encode_cursor(*last) if last else None}
     
-    def log_chat(self, session_id: str, access_code: str, user_message: str, 
-                 bot_response: str, brand: str, ip_address: str, user_agent: str = ""):
-        """記錄對話（只保留最新50筆）"""
-        logs_data = self.load_logs()
-        
-        log_entry = {
-            "timestamp": datetime.now().isoformat() + "Z",
-            "session_id": session_id,
-            "access_code": access_code,
-            "user_message": user_message,
-            "bot_response": bot_response,
-            "brand": brand,
-            "ip_address": ip_address,
-            "user_agent": user_agent
-        }
-        
-        logs_data["logs"].append(log_entry)
-        
-        # 只保留最新的50筆記錄
-        if len(logs_data["logs"]) > 50:
-            # 按時間排序，保留最新的50筆
-            logs_data["logs"].sort(key=lambda x: x["timestamp"], reverse=True)
-            logs_data["logs"] = logs_data["logs"][:50]
-        
-        self.save_logs(logs_data)
-    
-    def get_chat_logs(self, access_code: str = None, limit: int = 100) -> List[Dict]:
-        """獲取對話記錄"""
-        logs_data = self.load_logs()
-        logs = logs_data["logs"]
-        
-        if access_code:
-            logs = [log for log in logs if log["access_code"] == access_code]
-        
-        # 按時間倒序排列並限制數量
-        logs.sort(key=lambda x: x["timestamp"], reverse=True)
-        return logs[:limit]
+    def iter_chat_logs(self, access_code: str = None, brand: str = None, session_id: str = None,
+                       start: str = None, end: str = None,
+                       batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+        """逐筆迭代符合條件的對話記錄（由新到舊）
+
+        直接串流分段查詢結果，每個分段只讀取一次，不經由分頁重複讀取分段
+        """
+        filters = {"access_code": access_code, "brand": brand, "session_id": session_id}
+        for entry, _ in self.log_store.iter_query(filters, start, end):
+            yield entry
     
     def get_access_codes(self) -> List[Dict]:
         """獲取所有序號"""
-        codes_data = self.load_codes()
-        return codes_data["codes"]
-
-# 全域資料庫實例
-json_db = JSONDatabase()
-
-# 初始化時確保有管理員序號
-def init_admin_code():
-    """確保管理員序號存在"""
-    codes_data = json_db.load_codes()
-    admin_exists = any(code["code"] == ADMIN_ACCESS_CODE for code in codes_data["codes"])
-    
-    if not admin_exists:
-        admin_code = {
-            "code": ADMIN_ACCESS_CODE,
-            "type": "permanent",
-            "description": "管理員測試用永久通行證",
-            "is_used": False,
-            "created_at": datetime.now().isoformat() + "Z",
-            "used_at": None,
-            "usage_history": []
-        }
-        codes_data["codes"].append(admin_code)
-        json_db.save_codes(codes_data)
-        print(f"已創建管理員永久通行證: {ADMIN_ACCESS_CODE}")
-
-# 執行初始化
-if __name__ == "__main__":
-    init_admin_code()
+        with self._lock:
+            return [dict(code_info) for code_info in self._ensure_codes().values()]
+    
+    def iter_access_codes(self, code_type: str = None, is_used: bool = None,
+                          start: str = None, end: str = None) -> Iterator[Dict]:
+        """逐筆迭代符合條件的序號
+        
+        先取得序號清單的快照，再分批於鎖內複製記錄，避免長時間持有鎖。
+        """
+        with self._lock:
+            code_keys = list(self._ensure_codes())
+        
+        for offset in range(0, len(code_keys), EXPORT_BATCH_SIZE):
+            batch = []
+            with self._lock:
+                codes = self._ensure_codes()
+                for code in code_keys[offset:offset + EXPORT_BATCH_SIZE]:
+                    code_info = codes.get(code)
+                    if code_info is None:
+                        continue  # 匯出期間已被刪除
+                    if code_type and code_info.get("type") != code_type:
+                        continue
+                    if is_used is not None and bool(code_info.get("is_used")) != is_used:
+                        continue
+                    created_at = code_info.get("created_at") or ""
+                    if (start and created_at < start) or (end and created_at > end):
+                        continue
+                    batch.append(dict(code_info))
+            yield from batch
+    
+    def get_stats(self) -> dict:
+        """獲取存儲統計"""
+        stats = super().get_stats()
+        with self._lock:
+            stats["codes"] = len(self._ensure_codes())
+        stats["codes_committer"] = self._committer.get_stats()
+        stats["chat_logs"] = self.log_store.get_stats()
+        return stats
+    
+    def close(self):
+        """寫入尚未落地的序號變更，並關閉目前的記錄分段檔"""
+        self._committer.stop()
+        super().close()
+        self.log_store.close()
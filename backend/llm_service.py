@@ -0,0 +1,355 @@
+"""
+LLM (Gemini) 服務模組
+在專用執行緒池中執行同步的 Gemini SDK 呼叫，避免阻塞事件迴圈
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import google.generativeai as genai
+
+from concurrency import ConcurrencyLimiter, SingleFlight
+from config import DEFAULT_SETTINGS, GEMMA_MODELS, LLM_SETTINGS
+from context_cache import context_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LLMService:
+    """LLM 服務類別"""
+
+    def __init__(self, max_concurrency: int = None, max_waiting: int = None, timeout: float = None):
+        """初始化 LLM 服務
+
+        Args:
+            max_concurrency: 同時進行的 LLM 呼叫上限，預設使用配置值
+            max_waiting: 排隊等待的請求上限，預設使用配置值
+            timeout: 單次呼叫逾時秒數，預設使用配置值
+        """
+        max_concurrency = max_concurrency or LLM_SETTINGS["max_concurrency"]
+        self.timeout = timeout or LLM_SETTINGS["request_timeout"]
+        self.limiter = ConcurrencyLimiter(
+            "llm",
+            max_concurrency,
+            max_waiting if max_waiting is not None else LLM_SETTINGS["max_waiting"]
+        )
+        # 執行緒數量與並發上限一致；名額在執行緒實際結束後才釋放 (見 _run_in_slot)，
+        # 逾時仍在執行的呼叫繼續佔用名額，取得名額的呼叫因此不會在執行緒池中排隊
+        self.executor = ThreadPoolExecutor(max_workers=self.limiter.max_concurrency, thread_name_prefix="llm")
+        # 相同模型與提示詞的並發請求共用一次上游呼叫
+        self.singleflight = SingleFlight("llm")
+
+        # 模型註冊表：每個模型名稱只建立一次，重複使用底層連線
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self.warmup_results: Dict[str, dict] = {}
+        self.ready = False
+
+    def initialize(self):
+        """建立 config.GEMMA_MODELS 中所有模型的共用實例"""
+        for model_name in GEMMA_MODELS:
+            if model_name not in self._models:
+                self._models[model_name] = genai.GenerativeModel(model_name)
+        logger.info(f"LLM 模型註冊完成: {list(self._models.keys())}")
+
+    def get_model(self, model_name: str) -> genai.GenerativeModel:
+        """從註冊表取得模型實例
+
+        未註冊的模型名稱會臨時建立實例且不加入註冊表，避免任意輸入讓註冊表無限成長
+
+        Args:
+            model_name: 模型名稱
+
+        Returns:
+            genai.GenerativeModel: 模型實例
+        """
+        model = self._models.get(model_name)
+        if model is None:
+            if model_name in GEMMA_MODELS:
+                model = genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+            else:
+                logger.warning(f"未註冊的模型: {model_name}")
+                model = genai.GenerativeModel(model_name)
+        return model
+
+    async def warm_up(self, timeout: float = None) -> Dict[str, dict]:
+        """以低成本的探測請求預熱所有已註冊的模型
+
+        預熱會建立 gRPC 連線並完成 TLS 交握，讓部署後的首批請求不需承擔冷啟動成本。
+        探測失敗只會記錄在結果中，不會阻止服務啟動。
+
+        Args:
+            timeout: 每個模型的探測逾時秒數，預設使用配置值
+
+        Returns:
+            dict: {model_name: {"success": bool, "latency_ms": float, "error": str}}
+        """
+        timeout = timeout or LLM_SETTINGS["warmup_timeout"]
+        if not self._models:
+            self.initialize()
+
+        async def probe(model_name: str) -> dict:
+            start = time.perf_counter()
+            try:
+                await self._run_in_slot(timeout, self._probe_sync, model_name)
+                result = {"success": True}
+            except Exception as e:
+                result = {"success": False, "error": str(e) or e.__class__.__name__}
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            return result
+
+        model_names = list(self._models.keys())
+        results = await asyncio.gather(*(probe(name) for name in model_names))
+        self.warmup_results = dict(zip(model_names, results))
+        self.ready = True
+
+        for model_name, result in self.warmup_results.items():
+            if result["success"]:
+                logger.info(f"LLM 模型預熱完成: {model_name} ({result['latency_ms']} ms)")
+            else:
+                logger.warning(f"LLM 模型預熱失敗: {model_name} - {result['error']}")
+        return self.warmup_results
+
+    async def register_context_cache(self, prefixes: List[str], model_name: str = None) -> int:
+        """預先將提示詞前綴登記為供應商端快取，前綴快取未啟用時不做任何事
+
+        Args:
+            prefixes: 固定前綴列表 (例如所有品牌 × 風格)
+            model_name: 模型名稱，預設使用配置中的預設模型
+
+        Returns:
+            int: 成功登記的數量
+        """
+        if not context_cache.enabled:
+            return 0
+        selected_model = model_name or DEFAULT_SETTINGS["llm_model"]
+        registered = await self._run_in_slot(
+            None, context_cache.register, selected_model, prefixes, self.get_model(selected_model)
+        )
+        logger.info(f"提示詞前綴快取登記完成: {registered}/{len(set(prefixes))}")
+        return registered
+
+    async def _run_in_slot(self, timeout: Optional[float], func, *args):
+        """取得並發名額後在執行緒池中執行同步呼叫
+
+        名額在執行緒實際結束時才釋放：逾時或呼叫端取消只會放棄等待結果，
+        仍在執行的呼叫繼續佔用名額，執行中的執行緒數因此不會超過並發上限。
+
+        Args:
+            timeout: 等待結果的逾時秒數，None 表示不限
+            func: 同步函式
+            *args: 函式參數
+
+        Raises:
+            ConcurrencyLimitExceeded: 等待佇列已滿時
+            asyncio.TimeoutError: 超過逾時秒數
+        """
+        wait_time = await self.limiter.acquire_slot()
+        if wait_time > 0.5:
+            logger.info(f"LLM 請求排隊 {wait_time:.2f} 秒 (排隊中: {self.limiter.waiting})")
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        except BaseException:
+            self.limiter.release_slot()
+            raise
+        future.add_done_callback(self._release_slot)
+        # shield 讓逾時或取消不會提前結束 future，名額保留到執行緒實際結束
+        return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+
+    def _release_slot(self, future: asyncio.Future):
+        """執行緒結束時釋放名額"""
+        self.limiter.release_slot()
+        if not future.cancelled():
+            # 已放棄等待的呼叫不會再讀取結果，先取出例外以免 asyncio 記錄「例外未被取得」
+            future.exception()
+
+    def _probe_sync(self, model_name: str):
+        """預熱用的最小生成請求"""
+        return self._models[model_name].generate_content(
+            "hi",
+            generation_config={"max_output_tokens": 1}
+        )
+
+    @staticmethod
+    def _generation_config(max_output_tokens: Optional[int]) -> Optional[dict]:
+        """產生生成設定，未指定輸出上限時使用模型預設值"""
+        if not max_output_tokens:
+            return None
+        return {"max_output_tokens": max_output_tokens}
+
+    def _resolve_model(self, model_name: str, prompt: str, cache_prefix: Optional[str]) -> Tuple[Any, str, bool]:
+        """選擇呼叫的模型與送出的內容
+
+        提示詞以 cache_prefix 開頭且前綴快取可用時，改用快取前綴的模型並只送出之後的內容；
+        只有已註冊的模型會使用前綴快取，避免任意模型名稱讓快取無限成長
+
+        Returns:
+            tuple: (模型, 送出的內容, 是否使用前綴快取)
+        """
+        base_model = self.get_model(model_name)
+        if cache_prefix and model_name in self._models and prompt.startswith(cache_prefix):
+            cached_model = context_cache.get_model(model_name, cache_prefix, base_model)
+            if cached_model is not None:
+                return cached_model, prompt[len(cache_prefix):], True
+        return base_model, prompt, False
+
+    async def generate(self, prompt: str, model_name: str = None,
+                       max_output_tokens: Optional[int] = None,
+                       cache_prefix: Optional[str] = None) -> Optional[str]:
+        """非同步生成回應
+
+        相同模型、提示詞與輸出上限的並發請求會合併為一次上游呼叫，所有請求都取得相同結果
+
+        Args:
+            prompt: 完整提示詞
+            model_name: 模型名稱，預設使用配置中的預設模型
+            max_output_tokens: 輸出 token 上限，None 表示使用模型預設值
+            cache_prefix: 提示詞中可使用供應商端快取的固定前綴
+
+        Returns:
+            生成的文字，若模型沒有返回有效內容則返回 None
+
+        Raises:
+            ConcurrencyLimitExceeded: 等待佇列已滿時
+            asyncio.TimeoutError: 呼叫逾時
+        """
+        selected_model = model_name or DEFAULT_SETTINGS["llm_model"]
+        return await self.singleflight.do(
+            (selected_model, prompt, max_output_tokens),
+            lambda: self._generate(prompt, selected_model, max_output_tokens, cache_prefix)
+        )
+
+    async def _generate(self, prompt: str, selected_model: str,
+                        max_output_tokens: Optional[int], cache_prefix: Optional[str]) -> Optional[str]:
+        """取得並發名額後呼叫模型"""
+        response = await self._run_in_slot(
+            self.timeout, self._generate_sync, prompt, selected_model, max_output_tokens, cache_prefix
+        )
+
+        if response and response.text:
+            return response.text
+        return None
+
+    def _generate_sync(self, prompt: str, model_name: str, max_output_tokens: Optional[int] = None,
+                       cache_prefix: Optional[str] = None):
+        """在執行緒池中執行的同步呼叫，使用前綴快取失敗時改送完整提示詞"""
+        generation_config = self._generation_config(max_output_tokens)
+        model, contents, cached = self._resolve_model(model_name, prompt, cache_prefix)
+        if cached:
+            try:
+                return model.generate_content(contents, generation_config=generation_config)
+            except Exception as e:
+                logger.warning(f"使用提示詞快取呼叫失敗，改送完整提示詞: {e}")
+                context_cache.invalidate(model_name, cache_prefix)
+                model, contents = self.get_model(model_name), prompt
+        return model.generate_content(contents, generation_config=generation_config)
+
+    def _iter_stream(self, model: Any, contents: str, generation_config: Optional[dict]) -> Iterator[str]:
+        for chunk in model.generate_content(contents, stream=True, generation_config=generation_config):
+            text = chunk.text if chunk.parts else ""
+            if text:
+                yield text
+
+    def _stream_sync(self, prompt: str, model_name: str, max_output_tokens: Optional[int],
+                     cache_prefix: Optional[str]) -> Iterator[str]:
+        """在執行緒池中迭代的同步串流，尚未輸出任何片段前使用前綴快取失敗時改送完整提示詞"""
+        generation_config = self._generation_config(max_output_tokens)
+        model, contents, cached = self._resolve_model(model_name, prompt, cache_prefix)
+        if not cached:
+            yield from self._iter_stream(model, contents, generation_config)
+            return
+
+        yielded = False
+        try:
+            for text in self._iter_stream(model, contents, generation_config):
+                yielded = True
+                yield text
+        except Exception as e:
+            if yielded:
+                raise
+            logger.warning(f"使用提示詞快取串流失敗，改送完整提示詞: {e}")
+            context_cache.invalidate(model_name, cache_prefix)
+            yield from self._iter_stream(self.get_model(model_name), prompt, generation_config)
+
+    async def stream(self, prompt: str, model_name: str = None,
+                     max_output_tokens: Optional[int] = None,
+                     cache_prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """以串流方式非同步生成回應
+
+        同步的串流迭代在執行緒池中進行，每個片段透過 asyncio.Queue 交回事件迴圈。
+        串流期間持續佔用一個並發名額，直到背景執行緒結束；呼叫端提前結束迭代時，背景執行緒會在下一個片段後停止。
+
+        Args:
+            prompt: 完整提示詞
+            model_name: 模型名稱，預設使用配置中的預設模型
+            max_output_tokens: 輸出 token 上限，None 表示使用模型預設值
+            cache_prefix: 提示詞中可使用供應商端快取的固定前綴
+
+        Yields:
+            str: 生成的文字片段
+
+        Raises:
+            ConcurrencyLimitExceeded: 等待佇列已滿時
+            asyncio.TimeoutError: 片段間隔超過逾時秒數
+        """
+        selected_model = model_name or DEFAULT_SETTINGS["llm_model"]
+
+        await self.limiter.acquire_slot()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop_event = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for text in self._stream_sync(prompt, selected_model, max_output_tokens, cache_prefix):
+                    if stop_event.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        try:
+            producer = loop.run_in_executor(self.executor, produce)
+        except BaseException:
+            self.limiter.release_slot()
+            raise
+        # 背景執行緒實際結束後才釋放並發名額
+        producer.add_done_callback(self._release_slot)
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout=self.timeout)
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop_event.set()
+
+    def get_stats(self) -> dict:
+        """獲取 LLM 呼叫統計
+
+        Returns:
+            dict: 並發、排隊與模型預熱統計
+        """
+        stats = self.limiter.get_stats()
+        stats["singleflight"] = self.singleflight.get_stats()
+        stats["context_cache"] = context_cache.get_stats()
+        stats["ready"] = self.ready
+        stats["models"] = list(self._models.keys())
+        stats["warmup"] = self.warmup_results
+        return stats
+
+    def shutdown(self):
+        """關閉執行緒池"""
+        self.executor.shutdown(wait=False)
+
+
+# 全域 LLM 服務實例
+llm_service = LLMService()
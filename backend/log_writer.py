@@ -0,0 +1,182 @@
+"""
+對話記錄背景寫入模組
+請求只需將記錄放入記憶體佇列，由背景工作批次寫入磁碟，不在請求路徑上進行檔案 I/O
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from config import CHAT_LOG_SETTINGS
+from storage import db
+
+logger = logging.getLogger(__name__)
+
+
+class ChatLogWriter:
+    """批次寫入對話記錄的背景工作"""
+
+    def __init__(self, db, queue_size: int = None, batch_size: int = None,
+                 flush_interval: float = None, enqueue_timeout: float = None):
+        """初始化背景寫入器
+
+        Args:
+            db: 資料庫實例，需提供 make_log_entry() 與 log_chats()
+            queue_size: 佇列上限，預設使用配置值
+            batch_size: 單次寫入的最大筆數，預設使用配置值
+            flush_interval: 批次最長等待秒數，預設使用配置值
+            enqueue_timeout: 佇列已滿時的最長等待秒數，預設使用配置值
+        """
+        self.db = db
+        self.queue_size = queue_size or CHAT_LOG_SETTINGS["queue_size"]
+        self.batch_size = batch_size or CHAT_LOG_SETTINGS["batch_size"]
+        self.flush_interval = flush_interval or CHAT_LOG_SETTINGS["flush_interval"]
+        self.enqueue_timeout = enqueue_timeout or CHAT_LOG_SETTINGS["enqueue_timeout"]
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[Dict] = []  # 已取出佇列、尚未開始寫入的記錄
+        self._stopping = False
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.batches = 0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+        self.last_flush_time = 0.0
+        self.max_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """啟動背景寫入工作 (需在事件迴圈中呼叫)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("對話記錄背景寫入已啟動")
+
+    async def submit(self, **kwargs) -> bool:
+        """將一筆對話記錄放入寫入佇列
+
+        參數與 db.log_chat() 相同。佇列已滿時最多等待 enqueue_timeout 秒，
+        仍無空間則丟棄並計數，避免記錄寫入拖垮請求處理。
+
+        Returns:
+            bool: 是否成功排入佇列
+        """
+        entry = self.db.make_log_entry(**kwargs)
+        self.submitted += 1
+
+        if not self.running or self._stopping:
+            # 背景工作未啟動時直接寫入，確保記錄不遺失
+            await self._write([entry])
+            return True
+
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        try:
+            await asyncio.wait_for(self._queue.put(entry), timeout=self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning(f"對話記錄佇列已滿，丟棄記錄 (累計丟棄: {self.dropped})")
+            return False
+
+    async def _run(self):
+        """持續取出佇列中的記錄，依筆數或時間觸發批次寫入"""
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._queue.get()
+            batch = [entry]
+            self._pending = batch
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # 寫入一旦交給執行緒池就會完成，取消時不需重寫
+            self._pending = []
+            await self._write(batch)
+
+    async def _write(self, batch: List[Dict]):
+        """在執行緒池中寫入一批記錄"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            await loop.run_in_executor(None, self.db.log_chats, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"對話記錄寫入錯誤 ({len(batch)} 筆): {e}")
+            return
+
+        elapsed = time.perf_counter() - start
+        self.batches += 1
+        self.total_flush_time += elapsed
+        self.last_flush_time = elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+        self.max_batch = max(self.max_batch, len(batch))
+
+    async def stop(self):
+        """停止背景工作並寫入佇列中剩餘的記錄"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        remaining = self._pending
+        self._pending = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for i in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[i:i + self.batch_size])
+
+        self._task = None
+        logger.info(f"對話記錄背景寫入已停止，關閉前寫入 {len(remaining)} 筆")
+
+    def get_stats(self) -> dict:
+        """獲取寫入統計
+
+        Returns:
+            dict: 佇列長度、寫入筆數與寫入延遲
+        """
+        avg_flush = self.total_flush_time / self.batches if self.batches else 0.0
+        return {
+            "running": self.running,
+            "queue_length": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "batches": self.batches,
+            "max_batch": self.max_batch,
+            "avg_flush_ms": round(avg_flush * 1000, 2),
+            "max_flush_ms": round(self.max_flush_time * 1000, 2),
+            "last_flush_ms": round(self.last_flush_time * 1000, 2)
+        }
+
+
+# 全域對話記錄寫入器
+chat_log_writer = ChatLogWriter(db)
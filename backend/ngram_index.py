@@ -0,0 +1,118 @@
+"""
+字元 n-gram 檢索模組
+以字元 n-gram 的 TF-IDF 向量計算文字相似度，不需斷詞即可處理中文，
+全部在記憶體中以純 Python 完成，不依賴額外套件
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from text_utils import normalize_text
+
+# 預設使用 2-gram 與 3-gram：中文詞彙多為 2-3 字
+DEFAULT_NGRAM_RANGE = (2, 3)
+
+
+def normalize_chars(text: str) -> str:
+    """正規化文字並去除空白與標點，只保留小寫的文字與數字"""
+    return "".join(ch for ch in normalize_text(text).lower() if ch.isalnum())
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE) -> Counter:
+    """取出文字的字元 n-gram 次數
+
+    先正規化並去除空白與標點，只保留文字與數字；
+    文字短於最小 n 時以整段文字作為唯一的 n-gram。
+
+    Args:
+        text: 原始文字
+        ngram_range: (最小 n, 最大 n)
+
+    Returns:
+        Counter: n-gram → 出現次數
+    """
+    chars = normalize_chars(text)
+    low, high = ngram_range
+    grams = Counter()
+    for n in range(low, high + 1):
+        for i in range(len(chars) - n + 1):
+            grams[chars[i:i + n]] += 1
+    if not grams and chars:
+        grams[chars] = 1
+    return grams
+
+
+class NgramIndex:
+    """字元 n-gram TF-IDF 索引
+
+    建立時計算每份文件的正規化向量並整理成倒排表，查詢時只累加與查詢共有的 n-gram，
+    返回餘弦相似度 (0~1)。索引建立後只讀不改，可在多執行緒間共用。
+    """
+
+    def __init__(self, documents: Sequence[str], ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE):
+        """建立索引
+
+        Args:
+            documents: 文件列表，查詢結果以列表索引表示
+            ngram_range: (最小 n, 最大 n)
+        """
+        self.ngram_range = ngram_range
+        self.size = len(documents)
+
+        term_counts = [char_ngrams(doc, ngram_range) for doc in documents]
+        document_frequency = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+
+        # 平滑 IDF：出現在所有文件中的 n-gram 仍保有少量權重
+        self._idf: Dict[str, float] = {
+            gram: math.log((1 + self.size) / (1 + df)) + 1.0
+            for gram, df in document_frequency.items()
+        }
+        # 查詢中未出現在任何文件的 n-gram 視為最罕見，只計入查詢向量長度
+        self._unseen_idf = math.log(1 + self.size) + 1.0
+
+        self._postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc_id, counts in enumerate(term_counts):
+            weights = self._weights(counts)
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            if not norm:
+                continue
+            for gram, weight in weights.items():
+                self._postings[gram].append((doc_id, weight / norm))
+
+    def _weights(self, counts: Counter) -> Dict[str, float]:
+        return {
+            gram: (1.0 + math.log(count)) * self._idf.get(gram, self._unseen_idf)
+            for gram, count in counts.items()
+        }
+
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """查詢最相似的文件
+
+        Args:
+            query: 查詢文字
+            top_k: 返回的最大筆數
+            min_score: 相似度下限，低於此值的文件不返回
+
+        Returns:
+            list: [(文件索引, 相似度)]，依相似度由高到低排列
+        """
+        weights = self._weights(char_ngrams(query, self.ngram_range))
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm or top_k <= 0:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for gram, weight in weights.items():
+            for doc_id, doc_weight in self._postings.get(gram, ()):
+                scores[doc_id] += weight * doc_weight
+
+        results = (
+            (doc_id, score / norm)
+            for doc_id, score in scores.items()
+            if score / norm >= min_score
+        )
+        return heapq.nlargest(top_k, results, key=lambda item: item[1])
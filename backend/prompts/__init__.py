@@ -4,20 +4,32 @@
 
 from .manager import (
     get_chat_prompt,
+    get_prompt_prefix,
     get_available_styles,
+    resolve_style,
     get_quick_questions,
     get_brand_info,
     is_valid_brand,
+    get_brand_data,
+    build_knowledge_indexes,
+    registry,
+    retriever,
     get_simple_prompt  # 向後相容
 )
 
 # 匯出主要函數供外部使用
 __all__ = [
     'get_chat_prompt',
+    'get_prompt_prefix',
     'get_available_styles', 
+    'resolve_style',
     'get_quick_questions',
     'get_brand_info',
     'is_valid_brand',
+    'get_brand_data',
+    'build_knowledge_indexes',
+    'registry',
+    'retriever',
     'get_simple_prompt'
 ]
 
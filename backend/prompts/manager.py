@@ -1,122 +1,187 @@
 """
 多品牌提示詞管理器
-統一管理不同品牌的 AI 助理設定
+統一管理不同品牌的 AI 助理設定，品牌設定由 packs/ 目錄中的設定檔提供
 """
 
-from . import creative_tech
-from . import probiotics
-
-# 品牌註冊表
-BRANDS = {
-    "creative_tech": {
-        "name": "創造智能科技股份有限公司",
-        "module": creative_tech,
-        "description": "MarTech 行銷科技解決方案"
-    },
-    "probiotics": {
-        "name": "益生菌品牌 - 小益",
-        "module": probiotics,
-        "description": "腸道健康與免疫力調節的機能益生菌"
-    }
-}
+from typing import Optional
+
+from config import PROMPT_SETTINGS, RETRIEVAL_SETTINGS
+
+from .registry import PromptRegistry
+from .retrieval import create_retriever
+
+# 品牌註冊表：設定檔在首次使用時載入，變更後自動重新載入
+registry = PromptRegistry(PROMPT_SETTINGS["packs_dir"], PROMPT_SETTINGS["reload_interval"])
+
+# 品牌知識檢索器：啟用時提示詞只放入與問題相關的品牌知識段落
+retriever = create_retriever(RETRIEVAL_SETTINGS)
 
 def get_chat_prompt(brand: str, user_input: str, style: str = "default") -> str:
     """根據品牌獲取對話提示詞
-    
+
     Args:
         brand: 品牌識別碼 ("creative_tech", "probiotics")
         user_input: 用戶輸入
         style: 風格選擇
-        
+
     Returns:
         str: 完整的對話提示詞
-        
+
     Raises:
         ValueError: 當品牌不存在時
     """
-    if brand not in BRANDS:
-        raise ValueError(f"未知的品牌: {brand}. 可用品牌: {list(BRANDS.keys())}")
-    
-    brand_module = BRANDS[brand]["module"]
-    return brand_module.get_chat_prompt(user_input, style)
+    pack = registry.get(brand)
+    if pack is None:
+        raise ValueError(f"未知的品牌: {brand}. 可用品牌: {registry.brand_ids()}")
+
+    if retriever.enabled:
+        return retriever.render(pack, user_input, style)
+    return pack.render(user_input, style)
+
+def get_prompt_prefix(brand: str, style: str = "default") -> Optional[str]:
+    """獲取品牌 × 風格的固定提示詞前綴，可登記為供應商端快取
+
+    Args:
+        brand: 品牌識別碼
+        style: 風格選擇
+
+    Returns:
+        str: get_chat_prompt() 結果中用戶輸入之前的部分；
+             品牌不存在，或啟用知識檢索使前綴隨問題改變時返回 None
+    """
+    pack = registry.get(brand)
+    if pack is None or (retriever.enabled and pack.supports_context(style)):
+        return None
+
+    return pack.prefix(style)
+
+def build_knowledge_indexes() -> int:
+    """預先建立所有品牌的知識檢索索引 (未啟用知識檢索時不做任何事)
+
+    Returns:
+        int: 段落總數
+    """
+    if not retriever.enabled:
+        return 0
+
+    chunks = 0
+    for brand_id in registry.brand_ids():
+        pack = registry.get(brand_id)
+        if pack is not None:
+            chunks += retriever.build(pack)
+    return chunks
 
 def get_available_styles(brand: str) -> dict:
     """獲取指定品牌的可用風格
-    
+
     Args:
         brand: 品牌識別碼
-        
+
     Returns:
         dict: 風格選項字典
     """
-    if brand not in BRANDS:
+    pack = registry.get(brand)
+    if pack is None:
         return {}
-    
-    brand_module = BRANDS[brand]["module"]
-    return brand_module.get_available_styles()
+
+    return dict(pack.styles)
+
+def resolve_style(brand: str, style: str = None) -> str:
+    """解析品牌實際使用的風格
+
+    不支援的風格會改用品牌的第一個 (預設) 風格，與 get_chat_prompt 的行為一致
+
+    Args:
+        brand: 品牌識別碼
+        style: 要求的風格
+
+    Returns:
+        str: 實際使用的風格識別碼
+    """
+    styles = get_available_styles(brand)
+    if style in styles:
+        return style
+    return next(iter(styles), style)
 
 def get_quick_questions(brand: str) -> list:
     """獲取指定品牌的預設問題卡片
-    
+
     Args:
         brand: 品牌識別碼
-        
+
     Returns:
         list: 預設問題列表
     """
-    if brand not in BRANDS:
+    pack = registry.get(brand)
+    if pack is None:
         return []
-    
-    brand_module = BRANDS[brand]["module"]
-    return getattr(brand_module, 'QUICK_QUESTIONS', [])
+
+    return list(pack.quick_questions)
+
+def get_brand_data(brand: str, key: str, default=None):
+    """獲取品牌設定檔中的其他資料 (例如 lifestyle_questions)
+
+    Args:
+        brand: 品牌識別碼
+        key: 設定檔欄位
+        default: 品牌或欄位不存在時的預設值
+    """
+    pack = registry.get(brand)
+    if pack is None:
+        return default
+
+    return pack.data.get(key, default)
 
 def get_brand_info(brand: str = None) -> dict:
     """獲取品牌資訊
-    
+
     Args:
         brand: 品牌識別碼，若為 None 則返回所有品牌
-        
+
     Returns:
         dict: 品牌資訊
     """
     if brand is None:
-        return {
-            brand_id: {
-                "name": info["name"],
-                "description": info["description"]
-            }
-            for brand_id, info in BRANDS.items()
-        }
-    
-    if brand not in BRANDS:
+        brands = {}
+        for brand_id in registry.brand_ids():
+            pack = registry.get(brand_id)
+            if pack is not None:
+                brands[brand_id] = {
+                    "name": pack.name,
+                    "description": pack.description
+                }
+        return brands
+
+    pack = registry.get(brand)
+    if pack is None:
         return {}
-    
+
     return {
-        "name": BRANDS[brand]["name"],
-        "description": BRANDS[brand]["description"],
-        "styles": get_available_styles(brand),
-        "quick_questions": get_quick_questions(brand)
+        "name": pack.name,
+        "description": pack.description,
+        "styles": dict(pack.styles),
+        "quick_questions": list(pack.quick_questions)
     }
 
 def is_valid_brand(brand: str) -> bool:
     """檢查品牌是否有效
-    
+
     Args:
         brand: 品牌識別碼
-        
+
     Returns:
         bool: 是否為有效品牌
     """
-    return brand in BRANDS
+    return registry.get(brand) is not None
 
 # 向後相容性：預設使用創造智能科技
 def get_simple_prompt(user_input: str, style: str = "professional") -> str:
     """向後相容的簡化提示詞函數
-    
+
     Args:
         user_input: 用戶輸入
         style: 風格選擇
-        
+
     Returns:
         str: 創造智能科技的對話提示詞
     """
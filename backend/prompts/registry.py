@@ -0,0 +1,253 @@
+"""
+品牌提示詞註冊表
+從 packs/ 目錄載入資料化的品牌設定檔，首次使用時才讀取，
+並將每個品牌 × 風格的固定前綴預先組好，請求時只需接上用戶輸入
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 模板中用戶輸入的佔位符，之前的內容為固定前綴
+USER_INPUT_PLACEHOLDER = "{user_input}"
+
+# 模板中品牌知識的佔位符，啟用知識檢索時只填入與問題相關的段落
+CONTEXT_PLACEHOLDER = "{context}"
+
+PACK_SUFFIX = ".json"
+
+
+class BrandPack:
+    """已編譯的品牌設定
+
+    載入時即以模板組好每個風格的固定前綴與結尾，之後只讀不改。
+    """
+
+    __slots__ = ("brand_id", "name", "description", "styles", "quick_questions",
+                 "data", "mtime", "_prefixes", "_suffix", "_default_style",
+                 "_contexts", "_context_slots")
+
+    def __init__(self, brand_id: str, data: dict, mtime: float):
+        """編譯品牌設定
+
+        Args:
+            brand_id: 品牌識別碼 (檔名)
+            data: 設定檔內容
+            mtime: 設定檔修改時間
+
+        Raises:
+            ValueError: 設定檔缺少必要欄位或模板格式錯誤
+        """
+        styles = data.get("styles")
+        template = data.get("template", "")
+        if not styles:
+            raise ValueError(f"品牌 {brand_id} 沒有定義任何風格")
+        if template.count(USER_INPUT_PLACEHOLDER) != 1:
+            raise ValueError(f"品牌 {brand_id} 的模板必須包含一個 {USER_INPUT_PLACEHOLDER}")
+
+        self.brand_id = brand_id
+        self.name = data.get("name", brand_id)
+        self.description = data.get("description", "")
+        self.styles = {style_id: style.get("label", style_id) for style_id, style in styles.items()}
+        self.quick_questions = list(data.get("quick_questions", []))
+        self.data = data
+        self.mtime = mtime
+
+        head, tail = template.split(USER_INPUT_PLACEHOLDER)
+        self._prefixes = {}
+        self._contexts = {}
+        # 前綴中品牌知識前後的固定部分，供知識檢索替換 context；模板沒有唯一的 {context} 時不支援
+        self._context_slots = {}
+        for style_id, style in styles.items():
+            fields = {
+                "system_prompt": style.get("system_prompt", ""),
+                "context": style.get("context", "")
+            }
+            self._prefixes[style_id] = head.format(**fields)
+            self._contexts[style_id] = fields["context"]
+            if head.count(CONTEXT_PLACEHOLDER) == 1:
+                before, after = head.split(CONTEXT_PLACEHOLDER)
+                self._context_slots[style_id] = (before.format(**fields), after.format(**fields))
+        self._suffix = tail.format()
+        # 第一個風格為預設風格，不支援的風格一律使用預設風格
+        self._default_style = next(iter(styles))
+
+    def render(self, user_input: str, style: str = None) -> str:
+        """組出完整提示詞
+
+        Args:
+            user_input: 用戶輸入
+            style: 風格，不支援時使用預設風格
+
+        Returns:
+            str: 完整提示詞
+        """
+        return self.prefix(style) + user_input + self._suffix
+
+    def prefix(self, style: str = None) -> str:
+        """取得風格的固定前綴 (render() 結果中用戶輸入之前的部分)"""
+        return self._prefixes[self.resolve_style(style)]
+
+    def resolve_style(self, style: str = None) -> str:
+        """解析實際使用的風格，不支援時返回預設風格"""
+        return style if style in self._prefixes else self._default_style
+
+    def context(self, style: str = None) -> str:
+        """取得風格的完整品牌知識 (模板中的 context)"""
+        return self._contexts[self.resolve_style(style)]
+
+    def supports_context(self, style: str = None) -> bool:
+        """模板是否可替換品牌知識"""
+        return self.resolve_style(style) in self._context_slots
+
+    def render_with_context(self, user_input: str, context: str, style: str = None) -> str:
+        """以指定的品牌知識取代完整 context 組出提示詞
+
+        Args:
+            user_input: 用戶輸入
+            context: 要放入模板的品牌知識
+            style: 風格，不支援時使用預設風格
+
+        Returns:
+            str: 完整提示詞；模板不支援替換時與 render() 相同
+        """
+        slots = self._context_slots.get(self.resolve_style(style))
+        if slots is None:
+            return self.render(user_input, style)
+        before, after = slots
+        return before + context + after + user_input + self._suffix
+
+
+class PromptRegistry:
+    """品牌設定註冊表
+
+    品牌清單取自目錄中的設定檔名稱，設定檔內容在首次使用時才載入編譯。
+    已載入的設定檔每隔 reload_interval 秒檢查一次修改時間，變更後自動重新載入；
+    重新載入失敗時保留舊的設定。
+    """
+
+    def __init__(self, packs_dir: str, reload_interval: float = 2.0):
+        """初始化註冊表
+
+        Args:
+            packs_dir: 品牌設定檔目錄
+            reload_interval: 檢查設定檔變更的間隔秒數，0 表示每次使用都檢查
+        """
+        self.packs_dir = Path(packs_dir)
+        self.reload_interval = reload_interval
+
+        self._packs: Dict[str, BrandPack] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._brand_ids: List[str] = []
+        self._dir_mtime: Optional[float] = None
+        self._dir_checked_at = 0.0
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.RLock()
+
+        self.loads = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def add_reload_listener(self, listener: Callable[[str], None]):
+        """註冊設定檔重新載入後的回呼，參數為品牌識別碼"""
+        self._listeners.append(listener)
+
+    def brand_ids(self) -> List[str]:
+        """列出所有品牌識別碼 (只讀取目錄，不載入設定檔)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._dir_mtime is None or now - self._dir_checked_at >= self.reload_interval:
+                self._dir_checked_at = now
+                try:
+                    mtime = self.packs_dir.stat().st_mtime
+                except OSError:
+                    mtime = None
+                if mtime is None or mtime != self._dir_mtime:
+                    self._dir_mtime = mtime
+                    self._brand_ids = sorted(
+                        path.name[:-len(PACK_SUFFIX)]
+                        for path in self.packs_dir.glob(f"*{PACK_SUFFIX}")
+                    ) if mtime is not None else []
+            return list(self._brand_ids)
+
+    def has_brand(self, brand_id: str) -> bool:
+        """檢查品牌是否存在"""
+        return brand_id in self.brand_ids()
+
+    def get(self, brand_id: str) -> Optional[BrandPack]:
+        """取得品牌設定，首次使用時載入，設定檔變更時重新載入
+
+        Returns:
+            已編譯的品牌設定，品牌不存在時返回 None
+        """
+        if not brand_id or brand_id not in self.brand_ids():
+            return None
+
+        reloaded = False
+        with self._lock:
+            pack = self._packs.get(brand_id)
+            now = time.monotonic()
+            checked_at = self._checked_at.get(brand_id)
+            if checked_at is None or now - checked_at >= self.reload_interval:
+                self._checked_at[brand_id] = now
+                path = self._pack_path(brand_id)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    mtime = None
+
+                if mtime is not None and (pack is None or mtime != pack.mtime):
+                    loaded = self._load(brand_id, path, mtime)
+                    if loaded is not None:
+                        reloaded = pack is not None
+                        pack = loaded
+                        self._packs[brand_id] = pack
+
+        if reloaded:
+            self._notify(brand_id)
+        return pack
+
+    def _pack_path(self, brand_id: str) -> Path:
+        return self.packs_dir / f"{brand_id}{PACK_SUFFIX}"
+
+    def _load(self, brand_id: str, path: Path, mtime: float) -> Optional[BrandPack]:
+        """讀取並編譯設定檔，失敗時返回 None"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pack = BrandPack(brand_id, json.load(f), mtime)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            self.errors += 1
+            logger.error(f"載入品牌設定失敗: {path} - {e}")
+            return None
+
+        if brand_id in self._packs:
+            self.reloads += 1
+            logger.info(f"品牌設定已更新並重新載入: {brand_id}")
+        else:
+            self.loads += 1
+            logger.info(f"品牌設定已載入: {brand_id} ({len(pack.styles)} 種風格)")
+        return pack
+
+    def _notify(self, brand_id: str):
+        for listener in self._listeners:
+            try:
+                listener(brand_id)
+            except Exception as e:
+                logger.error(f"品牌設定更新回呼錯誤: {e}")
+
+    def get_stats(self) -> dict:
+        """獲取註冊表統計"""
+        with self._lock:
+            return {
+                "brands": len(self._brand_ids),
+                "loaded": sorted(self._packs),
+                "loads": self.loads,
+                "reloads": self.reloads,
+                "errors": self.errors
+            }
@@ -0,0 +1,190 @@
+"""
+品牌知識檢索
+將品牌設定檔中的 context 切成段落並建立字元 n-gram 索引，
+組提示詞時只放入與用戶問題最相關的幾段，縮短送給 LLM 的提示詞
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ngram_index import NgramIndex
+
+from .registry import BrandPack
+
+logger = logging.getLogger(__name__)
+
+_BLANK_LINE_RE = re.compile(r"\n\s*\n")
+
+# 以這些符號結尾的單行段落視為標題，併入下一段
+HEADING_ENDINGS = "：:"
+
+
+def split_chunks(text: str, max_chars: int = 120) -> List[str]:
+    """將品牌知識切成段落
+
+    以空行分段；只有一行且以冒號結尾的標題併入下一段。
+    超過 max_chars 的段落依行再切開，每一塊都保留段落的標題行。
+
+    Args:
+        text: 品牌知識全文
+        max_chars: 單段長度上限，0 表示不再切分
+
+    Returns:
+        list: 段落列表，依原文順序
+    """
+    paragraphs = [p.strip() for p in _BLANK_LINE_RE.split(text or "") if p.strip()]
+
+    merged: List[str] = []
+    heading = ""
+    for paragraph in paragraphs:
+        if "\n" not in paragraph and paragraph[-1] in HEADING_ENDINGS:
+            heading = f"{heading}\n{paragraph}" if heading else paragraph
+            continue
+        merged.append(f"{heading}\n{paragraph}" if heading else paragraph)
+        heading = ""
+    if heading:
+        merged.append(heading)
+
+    chunks: List[str] = []
+    for paragraph in merged:
+        lines = paragraph.split("\n")
+        if not max_chars or len(paragraph) <= max_chars or len(lines) == 1:
+            chunks.append(paragraph)
+            continue
+
+        title = lines[0] if lines[0][-1] in HEADING_ENDINGS else ""
+        body = lines[1:] if title else lines
+        current = [title] if title else []
+        for line in body:
+            if len(current) > (1 if title else 0) and len("\n".join(current + [line])) > max_chars:
+                chunks.append("\n".join(current))
+                current = [title] if title else []
+            current.append(line)
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class _StyleIndex:
+    __slots__ = ("mtime", "chunks", "index")
+
+    def __init__(self, mtime: float, chunks: List[str], index: NgramIndex):
+        self.mtime = mtime
+        self.chunks = chunks
+        self.index = index
+
+
+class KnowledgeRetriever:
+    """品牌知識檢索器
+
+    每個品牌 × 風格各有一份索引，以設定檔修改時間判斷是否需要重建，
+    品牌設定熱更新後下次使用時自動重建。
+    """
+
+    def __init__(self, enabled: bool = False, top_k: int = 3, min_score: float = 0.05,
+                 max_chunk_chars: int = 120):
+        """初始化檢索器
+
+        Args:
+            enabled: 是否啟用 (關閉時提示詞包含完整品牌知識)
+            top_k: 每次最多放入的段落數
+            min_score: 段落相似度下限，低於此值的段落不放入
+            max_chunk_chars: 單段長度上限
+        """
+        self.enabled = enabled
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_chunk_chars = max_chunk_chars
+
+        self._indexes: Dict[Tuple[str, str], _StyleIndex] = {}
+        self._lock = threading.Lock()
+
+        self.queries = 0
+        self.chunks_selected = 0
+        self.context_chars = 0
+        self.full_context_chars = 0
+
+    def _get_index(self, pack: BrandPack, style: str) -> _StyleIndex:
+        key = (pack.brand_id, style)
+        entry = self._indexes.get(key)
+        if entry is not None and entry.mtime == pack.mtime:
+            return entry
+
+        chunks = split_chunks(pack.context(style), self.max_chunk_chars)
+        entry = _StyleIndex(pack.mtime, chunks, NgramIndex(chunks))
+        with self._lock:
+            self._indexes[key] = entry
+        logger.debug(f"品牌知識索引已建立: {pack.brand_id}/{style} ({len(chunks)} 段)")
+        return entry
+
+    def build(self, pack: BrandPack) -> int:
+        """建立品牌所有風格的索引
+
+        Returns:
+            int: 段落總數
+        """
+        return sum(len(self._get_index(pack, style).chunks) for style in pack.styles)
+
+    def select(self, pack: BrandPack, user_input: str, style: str = None) -> str:
+        """選出與用戶輸入最相關的品牌知識段落
+
+        Args:
+            pack: 品牌設定
+            user_input: 用戶輸入
+            style: 風格
+
+        Returns:
+            str: 相關段落 (依原文順序以空行連接)，沒有相關段落時返回空字串
+        """
+        style = pack.resolve_style(style)
+        entry = self._get_index(pack, style)
+        hits = entry.index.search(user_input, self.top_k, self.min_score)
+        # 依原文順序排列，保持品牌知識的閱讀脈絡
+        selected = "\n\n".join(entry.chunks[doc_id] for doc_id, _ in sorted(hits))
+
+        with self._lock:
+            self.queries += 1
+            self.chunks_selected += len(hits)
+            self.context_chars += len(selected)
+            self.full_context_chars += len(pack.context(style))
+        return selected
+
+    def render(self, pack: BrandPack, user_input: str, style: str = None) -> str:
+        """組出只包含相關品牌知識的提示詞
+
+        模板不支援替換 context 時返回完整提示詞。
+        """
+        if not pack.supports_context(style):
+            return pack.render(user_input, style)
+        return pack.render_with_context(user_input, self.select(pack, user_input, style), style)
+
+    def get_stats(self) -> dict:
+        """獲取檢索統計"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "indexes": len(self._indexes),
+                "chunks": sum(len(entry.chunks) for entry in self._indexes.values()),
+                "queries": self.queries,
+                "avg_chunks_selected": round(self.chunks_selected / self.queries, 2) if self.queries else 0.0,
+                "context_chars": self.context_chars,
+                "full_context_chars": self.full_context_chars,
+                "context_reduction": round(1 - self.context_chars / self.full_context_chars, 4)
+                if self.full_context_chars else 0.0
+            }
+
+
+def create_retriever(settings: dict, enabled: Optional[bool] = None) -> KnowledgeRetriever:
+    """依配置建立知識檢索器
+
+    Args:
+        settings: RETRIEVAL_SETTINGS
+        enabled: 覆寫是否啟用 (例如基準測試時比較兩種模式)
+    """
+    return KnowledgeRetriever(
+        enabled=settings["enabled"] if enabled is None else enabled,
+        top_k=settings["top_k"],
+        min_score=settings["min_score"],
+        max_chunk_chars=settings["max_chunk_chars"]
+    )
@@ -0,0 +1,204 @@
+"""
+預設問題預先渲染模組
+預先為每個品牌 × 風格 × 預設問題生成回答與語音，讓一鍵提問直接由記憶體回應
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import DEFAULT_SETTINGS, QUICK_ANSWER_SETTINGS
+from faq import faq_matcher
+from llm_service import llm_service
+from prompts import get_available_styles, get_brand_info, get_chat_prompt, get_prompt_prefix, get_quick_questions, is_valid_brand, resolve_style
+from text_utils import normalize_text, resolve_length_limit, truncate_sentences
+from tts_service import pin_audio, synthesize, unpin_audio
+
+logger = logging.getLogger(__name__)
+
+
+class QuickAnswerStore:
+    """預設問題回答存儲"""
+
+    def __init__(self, model_name: str = None, voice: str = None, max_length: int = None):
+        """初始化預設問題回答存儲
+
+        Args:
+            model_name: 生成回答使用的模型，預設使用配置中的預設模型
+            voice: 生成音訊使用的語音，預設使用配置中的預設語音
+            max_length: 回答字數，預設與聊天請求的預設 max_length 相同
+        """
+        self.model_name = model_name or DEFAULT_SETTINGS["llm_model"]
+        self.voice = voice or DEFAULT_SETTINGS["tts_voice"]
+        # 以聊天請求的預設長度生成並截斷，常駐音訊的文字才會與 chat-tts 截斷後合成的文字一致
+        self.max_chars, self.max_output_tokens = resolve_length_limit(
+            max_length or DEFAULT_SETTINGS["max_response_length"]
+        )
+        self.answers: Dict[Tuple[str, str, str], dict] = {}
+
+        self.hits = 0
+        self.warming = False
+        self.last_warmup: Optional[dict] = None
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    def _key(self, brand: str, style: str, question: str) -> Tuple[str, str, str]:
+        return brand, resolve_style(brand, style), normalize_text(question)
+
+    def get(self, brand: str, style: str, question: str, model_name: str = None,
+            max_output_tokens: Optional[int] = None) -> Optional[str]:
+        """查詢預先生成的回答
+
+        Args:
+            brand: 品牌識別碼
+            style: 風格
+            question: 用戶問題
+            model_name: 請求使用的模型，與預先生成的模型不同時不使用預先生成的回答
+            max_output_tokens: 請求的輸出 token 上限，與預先生成時的長度預算不同時不使用預先生成的回答
+
+        Returns:
+            預先生成的回答，沒有時返回 None
+        """
+        if not self.answers:
+            return None
+        if model_name and model_name != self.model_name:
+            return None
+        # 預先生成的回答已依預設長度截斷，其他長度 (包括不限長度) 的請求改由 LLM 生成
+        if max_output_tokens != self.max_output_tokens:
+            return None
+
+        entry = self.answers.get(self._key(brand, style, question))
+        if entry is None:
+            return None
+        self.hits += 1
+        return entry["response"]
+
+    async def warm_up(self, brands: List[str] = None, with_audio: bool = None) -> dict:
+        """生成並存儲所有預設問題的回答與音訊
+
+        已存在的回答只在重新生成成功後才會被取代，生成失敗時保留舊的回答。
+
+        Args:
+            brands: 要預先渲染的品牌，預設為所有品牌
+            with_audio: 是否同時生成音訊，預設使用配置值
+
+        Returns:
+            dict: 本次預先渲染的結果摘要
+        """
+        if with_audio is None:
+            with_audio = QUICK_ANSWER_SETTINGS["with_audio"]
+        brands = [brand for brand in (brands or get_brand_info().keys()) if is_valid_brand(brand)]
+
+        jobs = [
+            (brand, style, question)
+            for brand in brands
+            for style in get_available_styles(brand)
+            for question in get_quick_questions(brand)
+        ]
+
+        semaphore = asyncio.Semaphore(max(1, QUICK_ANSWER_SETTINGS["concurrency"]))
+        start = time.perf_counter()
+        self.warming = True
+
+        async def render(brand: str, style: str, question: str) -> bool:
+            async with semaphore:
+                try:
+                    # 預設問題屬於常見問題時使用標準答案，與直接提問的回答一致
+                    faq_match = faq_matcher.match(brand, question, record_stats=False)
+                    if faq_match:
+                        response = faq_match.answer
+                    else:
+                        prompt = get_chat_prompt(brand, question, style)
+                        response = await llm_service.generate(
+                            prompt, self.model_name, self.max_output_tokens, get_prompt_prefix(brand, style)
+                        )
+                    if not response:
+                        logger.warning(f"預設問題預先渲染無回應: {brand}/{style} - {question}")
+                        return False
+                    response, _ = truncate_sentences(response, self.max_chars)
+
+                    audio_data = await synthesize(response, self.voice) if with_audio else None
+                    self._store(brand, style, question, response, audio_data)
+                    return True
+                except Exception as e:
+                    logger.error(f"預設問題預先渲染錯誤: {brand}/{style} - {question}: {e}")
+                    return False
+
+        try:
+            results = await asyncio.gather(*(render(*job) for job in jobs))
+        finally:
+            self.warming = False
+
+        self.last_warmup = {
+            "brands": brands,
+            "total": len(jobs),
+            "succeeded": sum(results),
+            "failed": len(jobs) - sum(results),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "finished_at": datetime.now().isoformat() + "Z"
+        }
+        logger.info(f"預設問題預先渲染完成: {self.last_warmup['succeeded']}/{len(jobs)} 成功")
+        return self.last_warmup
+
+    def start_warm_up(self, brands: List[str] = None) -> bool:
+        """在背景啟動預先渲染
+
+        Returns:
+            bool: 是否成功啟動 (已有預先渲染進行中時返回 False)
+        """
+        if self._warmup_task and not self._warmup_task.done():
+            return False
+        self._warmup_task = asyncio.create_task(self.warm_up(brands))
+        return True
+
+    def _store(self, brand: str, style: str, question: str, response: str, audio_data: Optional[bytes]):
+        """存儲回答並將音訊設為常駐"""
+        key = self._key(brand, style, question)
+        previous = self.answers.get(key)
+        if previous and previous["response"] != response:
+            unpin_audio(previous["response"], self.voice)
+
+        if audio_data:
+            pin_audio(response, audio_data, self.voice)
+
+        self.answers[key] = {
+            "brand": brand,
+            "style": key[1],
+            "question": question,
+            "response": response,
+            "audio_bytes": len(audio_data) if audio_data else 0,
+            "generated_at": datetime.now().isoformat() + "Z"
+        }
+
+    def list_answers(self, brand: str = None) -> List[dict]:
+        """列出已預先生成的回答
+
+        Args:
+            brand: 品牌識別碼，若為 None 則返回所有品牌
+
+        Returns:
+            list: 回答記錄列表
+        """
+        return [entry for entry in self.answers.values() if brand is None or entry["brand"] == brand]
+
+    def get_stats(self) -> dict:
+        """獲取預先渲染統計
+
+        Returns:
+            dict: 回答數、命中數與最近一次預先渲染結果
+        """
+        return {
+            "model": self.model_name,
+            "voice": self.voice,
+            "max_chars": self.max_chars,
+            "answers": len(self.answers),
+            "with_audio": sum(1 for entry in self.answers.values() if entry["audio_bytes"]),
+            "hits": self.hits,
+            "warming": self.warming,
+            "last_warmup": self.last_warmup
+        }
+
+
+# 全域預設問題回答存儲實例
+quick_answer_store = QuickAnswerStore()
@@ -0,0 +1,107 @@
+"""
+LLM 回應快取模組
+以 (品牌, 風格, 模型, 正規化問題, 輸出上限) 為鍵快取 LLM 回答，減少重複問題的延遲與配額消耗
+"""
+
+import logging
+from typing import Optional, Tuple
+
+from cache import LRUCache
+from config import LLM_CACHE_SETTINGS
+from prompts import resolve_style
+from text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """LLM 回應快取"""
+
+    def __init__(self, enabled: bool = None):
+        """初始化 LLM 回應快取
+
+        Args:
+            enabled: 是否啟用，預設使用配置值
+        """
+        self.enabled = LLM_CACHE_SETTINGS["enabled"] if enabled is None else enabled
+        self.default_ttl = LLM_CACHE_SETTINGS["ttl"]
+        self.brand_ttl = dict(LLM_CACHE_SETTINGS["brand_ttl"])
+        self.cache = LRUCache(
+            max_entries=LLM_CACHE_SETTINGS["max_entries"],
+            max_bytes=LLM_CACHE_SETTINGS["max_bytes"],
+            sizeof=lambda text: len(text.encode("utf-8"))
+        )
+        self.invalidations = 0
+
+    def make_key(self, brand: str, style: str, model_name: str, user_input: str,
+                 max_output_tokens: Optional[int] = None) -> Tuple[str, str, str, str, Optional[int]]:
+        """產生快取鍵
+
+        Args:
+            brand: 品牌識別碼
+            style: 風格 (會解析為品牌實際使用的風格)
+            model_name: 模型名稱
+            user_input: 用戶輸入
+            max_output_tokens: 生成時的輸出 token 上限，不同上限的回答長度不同，不可共用
+
+        Returns:
+            tuple: (品牌, 風格, 模型, 正規化問題, 輸出上限)
+        """
+        return brand, resolve_style(brand, style), model_name, normalize_text(user_input), max_output_tokens
+
+    def get(self, brand: str, style: str, model_name: str, user_input: str,
+            max_output_tokens: Optional[int] = None) -> Optional[str]:
+        """查詢快取的回答
+
+        Returns:
+            快取的回答，未啟用或未命中時返回 None
+        """
+        if not self.enabled:
+            return None
+        return self.cache.get(self.make_key(brand, style, model_name, user_input, max_output_tokens))
+
+    def set(self, brand: str, style: str, model_name: str, user_input: str, response: str,
+            max_output_tokens: Optional[int] = None):
+        """存入回答，存活時間依品牌設定"""
+        if not self.enabled or not response:
+            return
+        ttl = self.brand_ttl.get(brand, self.default_ttl)
+        if ttl <= 0:
+            return
+        self.cache.set(self.make_key(brand, style, model_name, user_input, max_output_tokens), response, ttl=ttl)
+
+    def invalidate(self, brand: str = None) -> int:
+        """清除快取 (例如提示詞更新後)
+
+        Args:
+            brand: 品牌識別碼，若為 None 則清除所有品牌
+
+        Returns:
+            int: 清除的項目數
+        """
+        if brand is None:
+            removed = self.cache.clear()
+        else:
+            removed = self.cache.delete_where(lambda key: key[0] == brand)
+        self.invalidations += 1
+        logger.info(f"LLM 回應快取已清除 (品牌: {brand or '全部'})，共 {removed} 筆")
+        return removed
+
+    def get_stats(self) -> dict:
+        """獲取快取統計
+
+        Returns:
+            dict: 命中率、容量與存活時間設定
+        """
+        stats = self.cache.get_stats()
+        stats.update({
+            "enabled": self.enabled,
+            "default_ttl": self.default_ttl,
+            "brand_ttl": self.brand_ttl,
+            "invalidations": self.invalidations
+        })
+        return stats
+
+
+# 全域 LLM 回應快取實例
+llm_response_cache = LLMResponseCache()
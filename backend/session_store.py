@@ -0,0 +1,692 @@
+"""
+會話存儲模組
+提供行程內記憶體、同主機共用的 SQLite 以及外部鍵值存儲 (如 Redis) 三種會話存儲，
+支援閒置/絕對存活時間、背景清理與數量上限
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from cache import LRUCache
+from config import API_WORKERS, SESSION_SETTINGS
+from sqlite_utils import ThreadLocalConnections
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRecord:
+    """單一會話記錄 (以 __slots__ 與數值時間戳降低每筆記憶體用量)"""
+
+    __slots__ = ("session_id", "access_code", "code_type", "ip_address", "user_agent",
+                 "created_at", "last_activity", "is_active")
+
+    def __init__(self, session_id: str, access_code: str, ip_address: str, user_agent: str = "",
+                 created_at: float = None, last_activity: float = None, is_active: bool = True,
+                 code_type: str = "unknown"):
+        now = time.time()
+        self.session_id = session_id
+        self.access_code = access_code
+        self.code_type = code_type  # 建立會話時的序號類型快照，序號被刪除或重置時會話隨之失效
+        self.ip_address = ip_address
+        self.user_agent = user_agent
+        self.created_at = now if created_at is None else created_at
+        self.last_activity = self.created_at if last_activity is None else last_activity
+        self.is_active = is_active
+
+    def is_expired(self, now: float, idle_ttl: float, absolute_ttl: float) -> bool:
+        """是否已超過閒置或絕對存活時間 (0 表示不限制)"""
+        if idle_ttl > 0 and now - self.last_activity > idle_ttl:
+            return True
+        if absolute_ttl > 0 and now - self.created_at > absolute_ttl:
+            return True
+        return False
+
+    def to_dict(self) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SessionRecord":
+        return cls(**{slot: data[slot] for slot in cls.__slots__ if slot in data})
+
+
+class SessionStore(ABC):
+    """會話存儲基底類別"""
+
+    backend_name = "base"
+
+    def __init__(self, idle_ttl: float = None, absolute_ttl: float = None,
+                 max_sessions: int = None, sweep_interval: float = None):
+        """初始化會話存儲
+
+        Args:
+            idle_ttl: 閒置存活秒數，0 表示不限制，預設使用配置值
+            absolute_ttl: 自建立起的最長存活秒數，0 表示不限制，預設使用配置值
+            max_sessions: 會話數上限，預設使用配置值
+            sweep_interval: 背景清理間隔秒數，預設使用配置值
+        """
+        self.idle_ttl = SESSION_SETTINGS["idle_ttl"] if idle_ttl is None else idle_ttl
+        self.absolute_ttl = SESSION_SETTINGS["absolute_ttl"] if absolute_ttl is None else absolute_ttl
+        self.max_sessions = max_sessions or SESSION_SETTINGS["max_sessions"]
+        self.sweep_interval = sweep_interval or SESSION_SETTINGS["sweep_interval"]
+
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.deleted = 0
+        self.invalidated = 0
+        self.sweeps = 0
+        self.last_sweep_ms = 0.0
+
+    def _new_record(self, access_code: str, ip_address: str, user_agent: str, code_type: str) -> SessionRecord:
+        return SessionRecord(secrets.token_hex(16), access_code, ip_address, user_agent, code_type=code_type)
+
+    @abstractmethod
+    def create(self, access_code: str, ip_address: str, user_agent: str = "",
+               code_type: str = "unknown") -> SessionRecord:
+        """建立新會話"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """取得未過期的會話，不存在或已過期時返回 None"""
+
+    @abstractmethod
+    def touch(self, session_id: str):
+        """更新會話活動時間"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """刪除會話，返回會話是否存在"""
+
+    @abstractmethod
+    def invalidate_code(self, access_code: str) -> int:
+        """移除使用指定序號建立的所有會話，返回移除的數量"""
+
+    @abstractmethod
+    def _sweep(self) -> int:
+        """移除所有過期會話，返回移除的數量"""
+
+    @abstractmethod
+    def count(self) -> Optional[int]:
+        """目前的會話數，無法得知時返回 None"""
+
+    def sweep(self) -> int:
+        """移除所有過期會話
+
+        Returns:
+            int: 移除的會話數
+        """
+        start = time.perf_counter()
+        removed = self._sweep()
+        self.expired += removed
+        self.sweeps += 1
+        self.last_sweep_ms = round((time.perf_counter() - start) * 1000, 2)
+        return removed
+
+    async def _sweep_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                # 共用存儲的清理會存取磁碟或網路，在執行緒池中執行
+                removed = await loop.run_in_executor(None, self.sweep)
+                if removed:
+                    logger.info(f"已清理過期會話 {removed} 筆")
+            except Exception as e:
+                logger.error(f"會話清理錯誤: {e}")
+
+    def start_sweeper(self):
+        """啟動背景清理工作 (需在事件迴圈中呼叫)"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop_sweeper(self):
+        """停止背景清理工作"""
+        if self._sweeper is None:
+            return
+        self._sweeper.cancel()
+        try:
+            await self._sweeper
+        except asyncio.CancelledError:
+            pass
+        self._sweeper = None
+
+    def close(self):
+        """釋放連線資源"""
+
+    def get_stats(self) -> dict:
+        """獲取會話統計
+
+        Returns:
+            dict: 存活、過期與淘汰的會話數
+        """
+        return {
+            "backend": self.backend_name,
+            "alive": self.count(),
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "deleted": self.deleted,
+            "invalidated": self.invalidated,
+            "idle_ttl": self.idle_ttl,
+            "absolute_ttl": self.absolute_ttl,
+            "sweeps": self.sweeps,
+            "last_sweep_ms": self.last_sweep_ms,
+            "sweeper_running": self._sweeper is not None and not self._sweeper.done()
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """行程內的會話存儲
+
+    會話依最近活動時間排序；超過上限時淘汰最久未活動的會話。
+    過期會話在讀取時立即失效，並由背景清理工作定期回收記憶體。
+    只適用於單一 worker，多 worker 部署請使用共用的存儲。
+    """
+
+    backend_name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._by_code: Dict[str, set] = {}  # 序號 -> 會話 ID，用於序號變更時讓會話失效
+        self._lock = threading.Lock()
+        self.peak_sessions = 0
+
+    def _remove(self, session_id: str) -> Optional[SessionRecord]:
+        """移除會話並更新序號索引 (呼叫端需持有鎖)"""
+        record = self._sessions.pop(session_id, None)
+        if record is not None:
+            session_ids = self._by_code.get(record.access_code)
+            if session_ids is not None:
+                session_ids.discard(session_id)
+                if not session_ids:
+                    del self._by_code[record.access_code]
+        return record
+
+    def create(self, access_code: str, ip_address: str, user_agent: str = "",
+               code_type: str = "unknown") -> SessionRecord:
+        """建立新會話，超過上限時淘汰最久未活動的會話"""
+        record = self._new_record(access_code, ip_address, user_agent, code_type)
+
+        with self._lock:
+            self._sessions[record.session_id] = record
+            self._by_code.setdefault(access_code, set()).add(record.session_id)
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._remove(next(iter(self._sessions)))
+                self.evicted += 1
+            self.peak_sessions = max(self.peak_sessions, len(self._sessions))
+        return record
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """取得未過期的會話，過期會話會被立即移除"""
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return None
+            if record.is_expired(time.time(), self.idle_ttl, self.absolute_ttl):
+                self._remove(session_id)
+                self.expired += 1
+                return None
+            return record
+
+    def touch(self, session_id: str):
+        """更新會話活動時間，並移到最近使用的位置"""
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is not None:
+                record.last_activity = time.time()
+                self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """刪除會話"""
+        with self._lock:
+            if self._remove(session_id) is None:
+                return False
+            self.deleted += 1
+            return True
+
+    def invalidate_code(self, access_code: str) -> int:
+        """移除使用指定序號建立的所有會話"""
+        with self._lock:
+            session_ids = list(self._by_code.get(access_code, ()))
+            for session_id in session_ids:
+                self._remove(session_id)
+            self.invalidated += len(session_ids)
+            return len(session_ids)
+
+    def _sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired_ids = [
+                session_id for session_id, record in self._sessions.items()
+                if record.is_expired(now, self.idle_ttl, self.absolute_ttl)
+            ]
+            for session_id in expired_ids:
+                self._remove(session_id)
+        return len(expired_ids)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        stats["peak"] = self.peak_sessions
+        return stats
+
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    access_code TEXT NOT NULL,
+    code_type TEXT NOT NULL DEFAULT 'unknown',
+    ip_address TEXT,
+    user_agent TEXT,
+    created_at REAL NOT NULL,
+    last_activity REAL NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions (last_activity);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_access_code ON sessions (access_code);
+"""
+
+SQL_INSERT_SESSION = (
+    "INSERT INTO sessions (session_id, access_code, code_type, ip_address, user_agent, created_at, last_activity, is_active) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_SELECT_SESSION = "SELECT * FROM sessions WHERE session_id = ?"
+SQL_TOUCH_SESSION = "UPDATE sessions SET last_activity = ? WHERE session_id = ?"
+SQL_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+SQL_DELETE_CODE_SESSIONS = "DELETE FROM sessions WHERE access_code = ?"
+SQL_COUNT_SESSIONS = "SELECT COUNT(*) FROM sessions"
+SQL_EVICT_SESSIONS = (
+    "DELETE FROM sessions WHERE session_id IN "
+    "(SELECT session_id FROM sessions ORDER BY last_activity LIMIT ?)"
+)
+SQL_SWEEP_SESSIONS = "DELETE FROM sessions WHERE last_activity < ? OR created_at < ?"
+
+
+class SharedSessionStore(SessionStore):
+    """跨行程共用的會話存儲基底類別
+
+    每次請求都更新活動時間會造成大量寫入，因此同一會話在 touch_interval 秒內只寫入一次；
+    閒置判定的誤差最多為 touch_interval 秒。
+    """
+
+    def __init__(self, touch_interval: float = None, **kwargs):
+        super().__init__(**kwargs)
+        self.touch_interval = SESSION_SETTINGS["touch_interval"] if touch_interval is None else touch_interval
+        if self.idle_ttl > 0:
+            # 寫入間隔不可接近閒置存活時間，否則活躍的會話也可能被判定為閒置
+            self.touch_interval = min(self.touch_interval, self.idle_ttl / 2)
+        # 本行程最近寫入的活動時間，只用於減少寫入
+        self._touched = LRUCache(max_entries=self.max_sessions, sizeof=lambda _: 0)
+        self.touch_writes = 0
+        self.touch_skipped = 0
+
+    def _should_write_touch(self, session_id: str, now: float) -> bool:
+        last_written = self._touched.get(session_id)
+        if last_written is not None and now - last_written < self.touch_interval:
+            self.touch_skipped += 1
+            return False
+        self._touched.set(session_id, now)
+        self.touch_writes += 1
+        return True
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        stats.update({
+            "touch_interval": self.touch_interval,
+            "touch_writes": self.touch_writes,
+            "touch_skipped": self.touch_skipped
+        })
+        return stats
+
+
+class SQLiteSessionStore(SharedSessionStore):
+    """以 SQLite 檔案保存會話，同一主機上的多個 worker 共用"""
+
+    backend_name = "sqlite"
+
+    def __init__(self, db_path: str = None, busy_timeout: float = None, **kwargs):
+        """初始化 SQLite 會話存儲
+
+        Args:
+            db_path: 資料庫檔案路徑，預設使用配置值
+            busy_timeout: 等待寫入鎖的秒數，預設使用配置值
+        """
+        super().__init__(**kwargs)
+        self.db_path = db_path or SESSION_SETTINGS["sqlite_path"]
+        self._connections = ThreadLocalConnections(
+            self.db_path, SESSION_SETTINGS["sqlite_busy_timeout"] if busy_timeout is None else busy_timeout
+        )
+        self._connections.get().executescript(SESSION_SCHEMA)
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> SessionRecord:
+        return SessionRecord(
+            row["session_id"], row["access_code"], row["ip_address"], row["user_agent"],
+            created_at=row["created_at"], last_activity=row["last_activity"], is_active=bool(row["is_active"]),
+            code_type=row["code_type"]
+        )
+
+    def create(self, access_code: str, ip_address: str, user_agent: str = "",
+               code_type: str = "unknown") -> SessionRecord:
+        """建立新會話，超過上限時淘汰最久未活動的會話"""
+        record = self._new_record(access_code, ip_address, user_agent, code_type)
+        with self._connections.transaction() as conn:
+            conn.execute(SQL_INSERT_SESSION, (
+                record.session_id, record.access_code, record.code_type, record.ip_address, record.user_agent,
+                record.created_at, record.last_activity, 1 if record.is_active else 0
+            ))
+            excess = conn.execute(SQL_COUNT_SESSIONS).fetchone()[0] - self.max_sessions
+            if excess > 0:
+                self.evicted += conn.execute(SQL_EVICT_SESSIONS, (excess,)).rowcount
+        self.created += 1
+        self._touched.set(record.session_id, record.last_activity)
+        return record
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """取得未過期的會話，過期會話會被立即刪除"""
+        conn = self._connections.get()
+        row = conn.execute(SQL_SELECT_SESSION, (session_id,)).fetchone()
+        if row is None:
+            return None
+        record = self._row_to_record(row)
+        if record.is_expired(time.time(), self.idle_ttl, self.absolute_ttl):
+            conn.execute(SQL_DELETE_SESSION, (session_id,))
+            self.expired += 1
+            return None
+        return record
+
+    def touch(self, session_id: str):
+        """更新會話活動時間"""
+        now = time.time()
+        if self._should_write_touch(session_id, now):
+            self._connections.get().execute(SQL_TOUCH_SESSION, (now, session_id))
+
+    def delete(self, session_id: str) -> bool:
+        """刪除會話"""
+        self._touched.delete(session_id)
+        if self._connections.get().execute(SQL_DELETE_SESSION, (session_id,)).rowcount == 0:
+            return False
+        self.deleted += 1
+        return True
+
+    def invalidate_code(self, access_code: str) -> int:
+        """移除使用指定序號建立的所有會話"""
+        removed = self._connections.get().execute(SQL_DELETE_CODE_SESSIONS, (access_code,)).rowcount
+        self.invalidated += removed
+        return removed
+
+    def _sweep(self) -> int:
+        now = time.time()
+        # 時間戳皆為正數，停用的限制以 -1 代替，條件永遠不成立
+        idle_cutoff = now - self.idle_ttl if self.idle_ttl > 0 else -1.0
+        absolute_cutoff = now - self.absolute_ttl if self.absolute_ttl > 0 else -1.0
+        return self._connections.get().execute(SQL_SWEEP_SESSIONS, (idle_cutoff, absolute_cutoff)).rowcount
+
+    def count(self) -> int:
+        return self._connections.get().execute(SQL_COUNT_SESSIONS).fetchone()[0]
+
+    def close(self):
+        self._connections.close_all()
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        stats["path"] = self.db_path
+        return stats
+
+
+class KeyValueSessionStore(SharedSessionStore):
+    """以外部鍵值存儲 (如 Redis) 保存會話，可跨主機共用
+
+    client 需提供 get(key)、set(key, value, ex=秒數)、delete(*keys)、expire(key, 秒數)
+    與集合操作 sadd / srem / smembers / scard (與 Redis 客戶端相同)，記錄以 JSON 字串保存。
+    過期由存儲端的 TTL 處理，數量上限與淘汰則交由存儲端的記憶體政策 (如 Redis maxmemory-policy)。
+    每個序號另存一個會話 ID 集合，供序號被刪除或重置時讓相關會話失效；
+    集合以 SADD / SREM 原子更新，多個 worker 同時以同一序號登入也不會遺失會話 ID。
+    """
+
+    backend_name = "kv"
+
+    def __init__(self, client, prefix: str = "session:", **kwargs):
+        """初始化鍵值會話存儲
+
+        Args:
+            client: 鍵值存儲客戶端
+            prefix: 鍵的前綴
+        """
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    def _code_key(self, access_code: str) -> str:
+        return self.prefix + "code:" + access_code
+
+    def _load_json(self, key: str):
+        raw = self.client.get(key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+    def _expire_seconds(self, record: SessionRecord, now: float) -> Optional[int]:
+        """依閒置與絕對存活時間計算鍵的存活秒數，皆不限制時返回 None"""
+        limits = []
+        if self.idle_ttl > 0:
+            limits.append(self.idle_ttl)
+        if self.absolute_ttl > 0:
+            limits.append(record.created_at + self.absolute_ttl - now)
+        if not limits:
+            return None
+        return max(1, int(min(limits) + 0.999))
+
+    def _save(self, record: SessionRecord, now: float):
+        self.client.set(self._key(record.session_id), json.dumps(record.to_dict()),
+                        ex=self._expire_seconds(record, now))
+
+    def create(self, access_code: str, ip_address: str, user_agent: str = "",
+               code_type: str = "unknown") -> SessionRecord:
+        """建立新會話"""
+        record = self._new_record(access_code, ip_address, user_agent, code_type)
+        self._save(record, record.created_at)
+
+        # 加入序號的會話集合；集合只用於失效處理，過期的會話 ID 留在集合中無害
+        code_key = self._code_key(access_code)
+        self.client.sadd(code_key, record.session_id)
+        if self.absolute_ttl > 0:
+            # 集合存活到最新會話的絕對存活時間結束；沒有絕對上限時不設過期
+            self.client.expire(code_key, int(self.absolute_ttl) + 1)
+        if self.client.scard(code_key) > self.max_sessions:
+            self._prune_code_sessions(code_key)
+        self.created += 1
+        self._touched.set(record.session_id, record.last_activity)
+        return record
+
+    def _code_session_ids(self, code_key: str) -> List[str]:
+        return [
+            member.decode("utf-8") if isinstance(member, bytes) else member
+            for member in self.client.smembers(code_key)
+        ]
+
+    def _prune_code_sessions(self, code_key: str):
+        """移除集合中已過期或已刪除的會話 ID，避免沒有絕對存活時間時集合無限成長"""
+        stale = [
+            session_id for session_id in self._code_session_ids(code_key)
+            if self.client.get(self._key(session_id)) is None
+        ]
+        if stale:
+            self.client.srem(code_key, *stale)
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """取得未過期的會話"""
+        data = self._load_json(self._key(session_id))
+        if data is None:
+            return None
+        record = SessionRecord.from_dict(data)
+        if record.is_expired(time.time(), self.idle_ttl, self.absolute_ttl):
+            self.client.delete(self._key(session_id))
+            self.expired += 1
+            return None
+        return record
+
+    def touch(self, session_id: str):
+        """更新會話活動時間並延長鍵的存活時間"""
+        now = time.time()
+        if not self._should_write_touch(session_id, now):
+            return
+        record = self.get(session_id)
+        if record is not None:
+            record.last_activity = now
+            self._save(record, now)
+
+    def delete(self, session_id: str) -> bool:
+        """刪除會話"""
+        self._touched.delete(session_id)
+        if not self.client.delete(self._key(session_id)):
+            return False
+        self.deleted += 1
+        return True
+
+    def invalidate_code(self, access_code: str) -> int:
+        """移除使用指定序號建立的所有會話"""
+        code_key = self._code_key(access_code)
+        session_ids = self._code_session_ids(code_key)
+        if not session_ids:
+            return 0
+        removed = self.client.delete(*[self._key(session_id) for session_id in session_ids])
+        # 只移除已處理的 ID，同時新建立的會話仍留在集合中
+        self.client.srem(code_key, *session_ids)
+        self.invalidated += removed
+        return removed
+
+    def _sweep(self) -> int:
+        # 過期鍵由存儲端自動刪除
+        return 0
+
+    def count(self) -> Optional[int]:
+        return None
+
+
+class LocalKeyValueClient:
+    """行程內的鍵值存儲，介面與 Redis 客戶端的 get/set/delete/expire 及集合操作相同
+
+    用於在沒有外部存儲的環境中測試 KeyValueSessionStore。
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _live_value(self, key: str):
+        """取得未過期的值 (呼叫端需持有鎖)"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live_value(key)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            value = self._live_value(key)
+            if value is None:
+                return False
+            self._data[key] = (value, time.time() + seconds)
+            return True
+
+    def sadd(self, key: str, *members: str) -> int:
+        with self._lock:
+            members_set = self._live_value(key)
+            if members_set is None:
+                members_set = set()
+                self._data[key] = (members_set, None)
+            added = len(set(members) - members_set)
+            members_set.update(members)
+            return added
+
+    def srem(self, key: str, *members: str) -> int:
+        with self._lock:
+            members_set = self._live_value(key)
+            if members_set is None:
+                return 0
+            removed = len(members_set & set(members))
+            members_set.difference_update(members)
+            if not members_set:
+                # 與 Redis 相同，空集合即刪除
+                del self._data[key]
+            return removed
+
+    def smembers(self, key: str) -> Set[str]:
+        with self._lock:
+            return set(self._live_value(key) or ())
+
+    def scard(self, key: str) -> int:
+        with self._lock:
+            return len(self._live_value(key) or ())
+
+
+def create_session_store(backend: str = None) -> SessionStore:
+    """依設定建立會話存儲
+
+    Args:
+        backend: "memory"、"sqlite" 或 "redis"，預設使用 SESSION_BACKEND 配置
+
+    Returns:
+        SessionStore: 會話存儲實例
+
+    Raises:
+        RuntimeError: API_WORKERS 大於 1 時使用 memory 會話存儲
+    """
+    backend = (backend or SESSION_SETTINGS["backend"]).lower()
+
+    if backend == "memory":
+        # 每個 worker 各有一份會話，登入後的請求送到其他 worker 會被視為未登入
+        if API_WORKERS > 1:
+            raise RuntimeError(f"API_WORKERS={API_WORKERS} 時不能使用 SESSION_BACKEND=memory，請改用 sqlite 或 redis")
+        return MemorySessionStore()
+
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND=redis 需要安裝 redis 套件 (pip install redis)")
+        return KeyValueSessionStore(redis.Redis.from_url(SESSION_SETTINGS["redis_url"]))
+
+    raise ValueError(f"不支援的會話存儲: {backend}")
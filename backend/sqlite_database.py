@@ -0,0 +1,498 @@
+"""
+基於 SQLite 的資料庫後端
+以 WAL 模式的單一資料庫檔保存序號與對話記錄，適合記錄量大或需要依條件查詢的部署
+"""
+
+import json
+import logging
+import secrets
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from config import ADMIN_ACCESS_CODE, STORAGE_SETTINGS
+from sqlite_utils import ThreadLocalConnections
+from storage_backend import EXPORT_BATCH_SIZE, StorageBackend, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS access_codes (
+    code TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    is_used INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    used_at TEXT,
+    reset_count INTEGER,
+    usage_history TEXT NOT NULL DEFAULT '[]'
+);
+
+CREATE TABLE IF NOT EXISTS chat_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    session_id TEXT,
+    access_code TEXT,
+    user_message TEXT,
+    bot_response TEXT,
+    brand TEXT,
+    ip_address TEXT,
+    user_agent TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_logs_timestamp ON chat_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_chat_logs_access_code ON chat_logs (access_code, timestamp);
+CREATE INDEX IF NOT EXISTS idx_chat_logs_brand ON chat_logs (brand, timestamp);
+CREATE INDEX IF NOT EXISTS idx_chat_logs_session_id ON chat_logs (session_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 固定的參數化語句，sqlite3 會依語句文字快取已編譯的 prepared statement
+SQL_SELECT_CODE = "SELECT * FROM access_codes WHERE code = ?"
+SQL_SELECT_ALL_CODES = "SELECT * FROM access_codes ORDER BY rowid"
+SQL_INSERT_CODE = (
+    "INSERT OR IGNORE INTO access_codes "
+    "(code, type, description, is_used, created_at, used_at, reset_count, usage_history) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_UPDATE_CODE_STATE = (
+    "UPDATE access_codes SET is_used = ?, used_at = ?, reset_count = ?, usage_history = ? WHERE code = ?"
+)
+SQL_REDEEM_CODE = (
+    "UPDATE access_codes SET is_used = 1, used_at = ? WHERE code = ? AND type = 'one_time' AND is_used = 0"
+)
+SQL_UPDATE_CODE_HISTORY = "UPDATE access_codes SET usage_history = ? WHERE code = ?"
+SQL_DELETE_CODE = "DELETE FROM access_codes WHERE code = ?"
+SQL_SELECT_CODES_PREFIX = "SELECT rowid, * FROM access_codes WHERE rowid > ?"
+SQL_COUNT_CODES = "SELECT COUNT(*) FROM access_codes"
+SQL_INSERT_LOG = (
+    "INSERT INTO chat_logs "
+    "(timestamp, session_id, access_code, user_message, bot_response, brand, ip_address, user_agent) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_SELECT_LOGS = (
+    "SELECT timestamp, session_id, access_code, user_message, bot_response, brand, ip_address, user_agent "
+    "FROM chat_logs ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+SQL_SELECT_LOGS_BY_CODE = (
+    "SELECT timestamp, session_id, access_code, user_message, bot_response, brand, ip_address, user_agent "
+    "FROM chat_logs WHERE access_code = ? ORDER BY timestamp DESC, id DESC LIMIT ?"
+)
+SQL_QUERY_LOGS_PREFIX = (
+    "SELECT id, timestamp, session_id, access_code, user_message, bot_response, brand, ip_address, user_agent "
+    "FROM chat_logs"
+)
+# 對話記錄只增不刪，以最大 id 近似筆數 (走主鍵 B-tree 尾端，不需全表掃描)
+SQL_APPROX_COUNT_LOGS = "SELECT COALESCE(MAX(id), 0) FROM chat_logs"
+SQL_GET_META = "SELECT value FROM meta WHERE key = ?"
+SQL_SET_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+SQL_CLAIM_META = "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)"
+SQL_DELETE_META = "DELETE FROM meta WHERE key = ?"
+
+LOG_FIELDS = ("timestamp", "session_id", "access_code", "user_message",
+              "bot_response", "brand", "ip_address", "user_agent")
+
+
+class SQLiteDatabase(StorageBackend):
+    """SQLite 存儲後端
+
+    每個執行緒使用各自的連線；讀取不會被寫入阻塞 (WAL)，
+    需要先讀後寫的操作以 BEGIN IMMEDIATE 取得寫入鎖，避免並發更新互相覆蓋。
+    """
+
+    backend_name = "sqlite"
+
+    def __init__(self, db_path: str = None, busy_timeout: float = None):
+        """初始化 SQLite 後端
+
+        Args:
+            db_path: 資料庫檔案路徑，預設使用配置值
+            busy_timeout: 等待寫入鎖的秒數，預設使用配置值
+        """
+        super().__init__()
+        self.db_path = db_path or STORAGE_SETTINGS["sqlite_path"]
+        self.busy_timeout = STORAGE_SETTINGS["sqlite_busy_timeout"] if busy_timeout is None else busy_timeout
+
+        self._connections = ThreadLocalConnections(self.db_path, self.busy_timeout)
+        self._conn().executescript(SCHEMA)
+
+    # ---- 連線 ----
+
+    def _conn(self) -> sqlite3.Connection:
+        """取得目前執行緒的連線"""
+        return self._connections.get()
+
+    def _transaction(self):
+        """開始寫入交易 (BEGIN IMMEDIATE)"""
+        return self._connections.transaction()
+
+    def close(self):
+        """關閉所有執行緒的連線"""
+        super().close()
+        self._connections.close_all()
+
+    # ---- 資料轉換 ----
+
+    @staticmethod
+    def _row_to_code(row: sqlite3.Row) -> Dict:
+        """將資料列轉為與 JSON 後端相同格式的序號記錄"""
+        code_info = {
+            "code": row["code"],
+            "type": row["type"],
+            "description": row["description"],
+            "is_used": bool(row["is_used"]),
+            "created_at": row["created_at"],
+            "used_at": row["used_at"],
+            "usage_history": json.loads(row["usage_history"])
+        }
+        if row["reset_count"] is not None:
+            code_info["reset_count"] = row["reset_count"]
+        return code_info
+
+    @staticmethod
+    def _code_params(code_info: Dict) -> tuple:
+        return (
+            code_info["code"],
+            code_info["type"],
+            code_info.get("description", ""),
+            1 if code_info.get("is_used") else 0,
+            code_info["created_at"],
+            code_info.get("used_at"),
+            code_info.get("reset_count"),
+            json.dumps(code_info.get("usage_history", []), ensure_ascii=False)
+        )
+
+    def _get_code(self, conn: sqlite3.Connection, code: str) -> Optional[Dict]:
+        row = conn.execute(SQL_SELECT_CODE, (code,)).fetchone()
+        return self._row_to_code(row) if row else None
+
+    def _update_code_state(self, conn: sqlite3.Connection, code_info: Dict):
+        conn.execute(SQL_UPDATE_CODE_STATE, (
+            1 if code_info["is_used"] else 0,
+            code_info["used_at"],
+            code_info.get("reset_count"),
+            json.dumps(code_info["usage_history"], ensure_ascii=False),
+            code_info["code"]
+        ))
+
+    # ---- 序號 ----
+
+    def generate_access_code(self, code_type: str = "one_time", description: str = "") -> str:
+        """生成存取序號"""
+        conn = self._conn()
+        while True:
+            code = secrets.token_hex(8).upper()
+            cursor = conn.execute(SQL_INSERT_CODE, self._code_params(self.new_code_record(code, code_type, description)))
+            if cursor.rowcount == 1:
+                return code
+
+    def validate_access_code(self, code: str) -> Dict:
+        """驗證存取序號"""
+        row = self._conn().execute(SQL_SELECT_CODE, (code,)).fetchone()
+        if row is None:
+            return {"valid": False, "reason": "序號不存在"}
+
+        # 檢查一次性序號是否已使用
+        if row["type"] == "one_time" and row["is_used"]:
+            return {"valid": False, "reason": "序號已使用"}
+
+        return {
+            "valid": True,
+            "code": row["code"],
+            "type": row["type"],
+            "is_used": bool(row["is_used"]),
+            "created_at": row["created_at"]
+        }
+
+    def use_access_code(self, code: str) -> bool:
+        """標記序號為已使用（僅限一次性序號）"""
+        with self._transaction() as conn:
+            code_info = self._get_code(conn, code)
+            if code_info is None or code_info["type"] != "one_time":
+                return False
+
+            code_info["is_used"] = True
+            code_info["used_at"] = datetime.now().isoformat() + "Z"
+            code_info["usage_history"].append({
+                "used_at": code_info["used_at"],
+                "action": "used"
+            })
+            self._update_code_state(conn, code_info)
+            return True
+
+    def redeem_access_code(self, code: str) -> Dict:
+        """驗證並兌換序號
+
+        一次性序號以 UPDATE ... WHERE is_used = 0 兌換並檢查影響筆數，由資料庫保證只有一個請求成功；
+        WAL 搭配 synchronous=NORMAL 下每次提交只追加 WAL，不需整檔重寫。
+        """
+        used_at = datetime.now().isoformat() + "Z"
+        with self._transaction() as conn:
+            if conn.execute(SQL_REDEEM_CODE, (used_at, code)).rowcount == 0:
+                # 不是一次性序號、序號不存在或已被兌換
+                row = conn.execute(SQL_SELECT_CODE, (code,)).fetchone()
+                if row is None:
+                    return {"valid": False, "reason": "序號不存在"}
+                if row["type"] == "one_time":
+                    return {"valid": False, "reason": "序號已使用"}
+                return {
+                    "valid": True,
+                    "code": row["code"],
+                    "type": row["type"],
+                    "is_used": bool(row["is_used"]),
+                    "created_at": row["created_at"]
+                }
+
+            row = conn.execute(SQL_SELECT_CODE, (code,)).fetchone()
+            usage_history = json.loads(row["usage_history"])
+            usage_history.append({"used_at": used_at, "action": "used"})
+            conn.execute(SQL_UPDATE_CODE_HISTORY, (json.dumps(usage_history, ensure_ascii=False), code))
+
+        return {
+            "valid": True,
+            "code": row["code"],
+            "type": row["type"],
+            "is_used": False,
+            "created_at": row["created_at"]
+        }
+
+    def reset_access_code(self, code: str, admin_code: str = None) -> Dict:
+        """重置一次性序號（管理員功能）"""
+        if admin_code and not self.is_admin_code(admin_code):
+            return {"success": False, "message": "無效的管理員序號"}
+
+        with self._transaction() as conn:
+            code_info = self._get_code(conn, code)
+            if code_info is None:
+                return {"success": False, "message": "序號不存在"}
+
+            if code_info["type"] != "one_time":
+                return {"success": False, "message": "只能重置一次性序號"}
+
+            if not code_info["is_used"]:
+                return {"success": False, "message": "序號尚未使用，無需重置"}
+
+            code_info["is_used"] = False
+            code_info["used_at"] = None
+            code_info["reset_count"] = code_info.get("reset_count", 0) + 1
+            code_info["usage_history"].append({
+                "reset_at": datetime.now().isoformat() + "Z",
+                "action": "reset",
+                "reset_by": admin_code or "system"
+            })
+            self._update_code_state(conn, code_info)
+
+        self.invalidate_code_sessions(code)
+        return {
+            "success": True,
+            "message": f"序號已重置，重置次數: {code_info['reset_count']}"
+        }
+
+    def delete_access_code(self, code: str, admin_code: str = None) -> Dict:
+        """刪除序號（管理員功能）"""
+        if admin_code and not self.is_admin_code(admin_code):
+            return {"success": False, "message": "無效的管理員序號"}
+
+        with self._transaction() as conn:
+            code_info = self._get_code(conn, code)
+            if code_info is None:
+                return {"success": False, "message": "序號不存在"}
+
+            # 不允許刪除管理員序號
+            if code_info["type"] == "permanent" and code_info["code"] == ADMIN_ACCESS_CODE:
+                return {"success": False, "message": "不能刪除管理員序號"}
+
+            conn.execute(SQL_DELETE_CODE, (code,))
+
+        self.invalidate_code_sessions(code)
+        return {
+            "success": True,
+            "message": f"序號 {code} 已刪除",
+            "deleted_code": code_info
+        }
+
+    def create_custom_code(self, custom_code: str, code_type: str = "one_time", description: str = "", admin_code: str = None) -> Dict:
+        """創建自定義序號（管理員功能）"""
+        if admin_code and not self.is_admin_code(admin_code):
+            return {"success": False, "message": "無效的管理員序號"}
+
+        cursor = self._conn().execute(
+            SQL_INSERT_CODE, self._code_params(self.new_code_record(custom_code, code_type, description))
+        )
+        if cursor.rowcount == 0:
+            return {"success": False, "message": "序號已存在"}
+
+        return {
+            "success": True,
+            "message": f"成功創建 {code_type} 序號: {custom_code}",
+            "code": custom_code
+        }
+
+    def get_access_codes(self) -> List[Dict]:
+        """獲取所有序號"""
+        return [self._row_to_code(row) for row in self._conn().execute(SQL_SELECT_ALL_CODES)]
+
+    def iter_access_codes(self, code_type: str = None, is_used: bool = None,
+                          start: str = None, end: str = None) -> Iterator[Dict]:
+        """逐筆迭代符合條件的序號
+
+        以 rowid 做 keyset 分批查詢，不會在批次之間保留開啟中的游標，
+        產生器可在不同執行緒間恢復執行。
+        """
+        conditions = []
+        params: list = []
+        if code_type:
+            conditions.append("type = ?")
+            params.append(code_type)
+        if is_used is not None:
+            conditions.append("is_used = ?")
+            params.append(int(is_used))
+        if start:
+            conditions.append("created_at >= ?")
+            params.append(start)
+        if end:
+            conditions.append("created_at <= ?")
+            params.append(end)
+
+        sql = SQL_SELECT_CODES_PREFIX
+        if conditions:
+            sql += " AND " + " AND ".join(conditions)
+        sql += " ORDER BY rowid LIMIT ?"
+
+        last_rowid = 0
+        while True:
+            rows = self._conn().execute(sql, [last_rowid, *params, EXPORT_BATCH_SIZE]).fetchall()
+            for row in rows:
+                yield self._row_to_code(row)
+            if len(rows) < EXPORT_BATCH_SIZE:
+                return
+            last_rowid = rows[-1]["rowid"]
+
+    def import_codes(self, codes: List[Dict]) -> int:
+        """匯入序號記錄，已存在的序號保持不變
+
+        Returns:
+            int: 實際新增的筆數
+        """
+        with self._transaction() as conn:
+            before = conn.execute(SQL_COUNT_CODES).fetchone()[0]
+            conn.executemany(SQL_INSERT_CODE, [self._code_params(code_info) for code_info in codes])
+            return conn.execute(SQL_COUNT_CODES).fetchone()[0] - before
+
+    # ---- 對話記錄 ----
+
+    def log_chats(self, entries: List[Dict]):
+        """批次記錄多筆對話（單一交易）"""
+        if not entries:
+            return
+        with self._transaction() as conn:
+            conn.executemany(SQL_INSERT_LOG, [
+                tuple(entry.get(field) for field in LOG_FIELDS) for entry in entries
+            ])
+
+    def get_chat_logs(self, access_code: str = None, limit: int = 100) -> List[Dict]:
+        """獲取對話記錄（由新到舊）"""
+        if limit <= 0:
+            return []
+        conn = self._conn()
+        if access_code:
+            rows = conn.execute(SQL_SELECT_LOGS_BY_CODE, (access_code, limit))
+        else:
+            rows = conn.execute(SQL_SELECT_LOGS, (limit,))
+        return [dict(row) for row in rows]
+
+    def query_chat_logs(self, access_code: str = None, brand: str = None, session_id: str = None,
+                        start: str = None, end: str = None, limit: int = 100,
+                        cursor: Optional[str] = None) -> Dict:
+        """依條件分頁查詢對話記錄（由新到舊）
+
+        以 (timestamp, id) 做 keyset 分頁，每頁都是一次索引範圍掃描，與頁數深度無關。
+        """
+        if limit <= 0:
+            return {"logs": [], "next_cursor": None}
+
+        # 條件組合有限，語句文字固定，仍可被 prepared statement 快取
+        conditions = []
+        params: list = []
+        for column, value in (("access_code", access_code), ("brand", brand), ("session_id", session_id)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if start:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            conditions.append("timestamp <= ?")
+            params.append(end)
+        if cursor:
+            cursor_timestamp, cursor_id = decode_cursor(cursor, 2)
+            if not isinstance(cursor_timestamp, str) or not isinstance(cursor_id, int):
+                raise ValueError("無效的分頁游標")
+            conditions.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([cursor_timestamp, cursor_timestamp, cursor_id])
+
+        sql = SQL_QUERY_LOGS_PREFIX
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        # 多取一筆以判斷是否還有下一頁
+        params.append(limit + 1)
+
+        rows = self._conn().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+
+        logs = []
+        for row in rows:
+            entry = dict(row)
+            del entry["id"]
+            logs.append(entry)
+        return {"logs": logs, "next_cursor": next_cursor}
+
+    # ---- 其他 ----
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """讀取內部狀態值"""
+        row = self._conn().execute(SQL_GET_META, (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str):
+        """寫入內部狀態值"""
+        self._conn().execute(SQL_SET_META, (key, value))
+
+    def delete_meta(self, key: str):
+        """刪除內部狀態值"""
+        self._conn().execute(SQL_DELETE_META, (key,))
+
+    def claim_meta(self, key: str, value: str) -> bool:
+        """在寫入交易中寫入尚不存在的內部狀態值
+
+        多個 worker 同時呼叫時只有一個會成功，可用於確保一次性工作只執行一次。
+
+        Returns:
+            bool: 是否由本次呼叫寫入
+        """
+        with self._transaction() as conn:
+            return conn.execute(SQL_CLAIM_META, (key, value)).rowcount == 1
+
+    def count_codes(self) -> int:
+        return self._conn().execute(SQL_COUNT_CODES).fetchone()[0]
+
+    def get_stats(self) -> dict:
+        """獲取存儲統計"""
+        conn = self._conn()
+        stats = super().get_stats()
+        stats.update({
+            "path": self.db_path,
+            "journal_mode": conn.execute("PRAGMA journal_mode").fetchone()[0],
+            "codes": self.count_codes(),
+            "chat_logs_approx": conn.execute(SQL_APPROX_COUNT_LOGS).fetchone()[0],
+            "connections": len(self._connections)
+        })
+        return stats
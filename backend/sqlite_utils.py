@@ -0,0 +1,80 @@
+"""
+SQLite 連線工具
+為每個執行緒建立各自的 WAL 模式連線，並提供明確控制的寫入交易
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+
+class ThreadLocalConnections:
+    """每個執行緒各自持有一條連線的 SQLite 連線管理
+
+    連線使用自動提交模式，需要先讀後寫的操作透過 transaction() 以 BEGIN IMMEDIATE 取得寫入鎖。
+    """
+
+    def __init__(self, db_path: str, busy_timeout: float = 5.0, cached_statements: int = 128):
+        """初始化連線管理
+
+        Args:
+            db_path: 資料庫檔案路徑
+            busy_timeout: 等待寫入鎖的秒數
+            cached_statements: 每條連線快取的 prepared statement 數量
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+    def get(self) -> sqlite3.Connection:
+        """取得目前執行緒的連線，首次使用時建立"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout,
+                isolation_level=None,  # 自動提交，交易由 transaction() 明確控制
+                check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """以 BEGIN IMMEDIATE 開始寫入交易，離開時提交，發生例外時回滾"""
+        conn = self.get()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close_all(self):
+        """關閉所有執行緒的連線"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+    def __len__(self) -> int:
+        return len(self._connections)
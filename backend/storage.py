@@ -0,0 +1,131 @@
+"""
+存儲後端選擇與資料遷移
+依 STORAGE_BACKEND 設定建立 JSON 或 SQLite 後端，並提供 JSON 資料一次性匯入 SQLite 的工具
+"""
+
+import json
+import logging
+import os
+import sys
+
+from config import ADMIN_ACCESS_CODE, API_WORKERS, CHAT_LOG_SETTINGS, STORAGE_SETTINGS
+from chat_log_store import list_segment_files, read_segment_file
+from storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CODES_FILE = "backend/access_codes.json"
+DEFAULT_LEGACY_LOGS_FILE = "backend/chat_logs.json"
+MIGRATION_MARKER = "json_migration"
+
+
+def migrate_json_to_sqlite(sqlite_db, codes_file: str = DEFAULT_CODES_FILE, logs_dir: str = None,
+                           legacy_logs_file: str = DEFAULT_LEGACY_LOGS_FILE) -> dict:
+    """將 JSON 後端的序號與對話記錄匯入 SQLite
+
+    只執行一次：開始前在資料庫中取得標記 (完成後寫入匯入結果)，之後或同時的呼叫會直接略過，
+    避免重複匯入對話記錄。
+    原始 JSON 檔案不會被修改，可作為備份保留。
+
+    Args:
+        sqlite_db: SQLiteDatabase 實例
+        codes_file: 序號檔案路徑
+        logs_dir: 對話記錄分段目錄，預設使用配置值
+        legacy_logs_file: 舊版單一對話記錄檔路徑
+
+    Returns:
+        dict: 匯入的序號與記錄筆數
+    """
+    result = {"migrated": False, "codes": 0, "chat_logs": 0}
+    # 先原子地取得標記再匯入：多個 worker 同時啟動時只有一個會執行匯入
+    if not sqlite_db.claim_meta(MIGRATION_MARKER, json.dumps({"status": "in_progress"})):
+        return result
+
+    try:
+        if os.path.exists(codes_file):
+            try:
+                with open(codes_file, "r", encoding="utf-8") as f:
+                    codes = json.load(f).get("codes", [])
+                result["codes"] = sqlite_db.import_codes(codes)
+            except (json.JSONDecodeError, AttributeError) as e:
+                logger.warning(f"序號檔案無法解析，略過匯入: {e}")
+
+        batch_size = CHAT_LOG_SETTINGS["batch_size"]
+        if os.path.exists(legacy_logs_file):
+            try:
+                with open(legacy_logs_file, "r", encoding="utf-8") as f:
+                    logs = json.load(f).get("logs", [])
+                logs.sort(key=lambda entry: entry.get("timestamp", ""))
+                for i in range(0, len(logs), batch_size):
+                    sqlite_db.log_chats(logs[i:i + batch_size])
+                result["chat_logs"] += len(logs)
+            except (json.JSONDecodeError, AttributeError) as e:
+                logger.warning(f"舊版對話記錄無法解析，略過匯入: {e}")
+
+        for path in list_segment_files(logs_dir or CHAT_LOG_SETTINGS["directory"]):
+            entries = read_segment_file(path)
+            for i in range(0, len(entries), batch_size):
+                sqlite_db.log_chats(entries[i:i + batch_size])
+            result["chat_logs"] += len(entries)
+    except BaseException:
+        # 匯入中斷時釋放標記，下次啟動可重新匯入
+        sqlite_db.delete_meta(MIGRATION_MARKER)
+        raise
+
+    sqlite_db.set_meta(MIGRATION_MARKER, json.dumps(result))
+    result["migrated"] = True
+    logger.info(f"已將 JSON 資料匯入 SQLite: 序號 {result['codes']} 筆，對話記錄 {result['chat_logs']} 筆")
+    return result
+
+
+def create_storage(backend: str = None) -> StorageBackend:
+    """依設定建立存儲後端
+
+    Args:
+        backend: "json" 或 "sqlite"，預設使用 STORAGE_BACKEND 配置
+
+    Returns:
+        StorageBackend: 存儲後端實例
+
+    Raises:
+        RuntimeError: API_WORKERS 大於 1 時使用 json 後端
+    """
+    backend = (backend or STORAGE_SETTINGS["backend"]).lower()
+
+    # JSON 後端的序號索引與對話記錄索引只存在於單一行程，多個 worker 會各自覆寫同一組檔案
+    if backend == "json" and API_WORKERS > 1:
+        raise RuntimeError(f"API_WORKERS={API_WORKERS} 時不能使用 STORAGE_BACKEND=json，請改用 sqlite")
+
+    if backend == "sqlite":
+        from sqlite_database import SQLiteDatabase
+        sqlite_db = SQLiteDatabase()
+        # 全新的資料庫自動匯入既有的 JSON 資料
+        if STORAGE_SETTINGS["migrate_from_json"] and sqlite_db.count_codes() == 0:
+            migrate_json_to_sqlite(sqlite_db)
+        return sqlite_db
+
+    if backend == "json":
+        from json_database import JSONDatabase
+        return JSONDatabase()
+
+    raise ValueError(f"不支援的存儲後端: {backend}")
+
+
+# 全域資料庫實例
+db = create_storage()
+
+
+def init_admin_code():
+    """確保管理員序號存在"""
+    if db.ensure_admin_code():
+        print(f"已創建管理員永久通行證: {ADMIN_ACCESS_CODE}")
+
+
+if __name__ == "__main__":
+    # python backend/storage.py migrate：將 JSON 資料匯入 SQLite
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        from sqlite_database import SQLiteDatabase
+        target = db if isinstance(db, SQLiteDatabase) else SQLiteDatabase()
+        print(migrate_json_to_sqlite(target))
+    else:
+        init_admin_code()
@@ -0,0 +1,267 @@
+"""
+存儲後端介面
+定義序號、會話與對話記錄的存儲操作，JSON 與 SQLite 後端皆實作此介面
+"""
+
+import base64
+import binascii
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from config import ADMIN_ACCESS_CODE
+from session_store import create_session_store
+
+logger = logging.getLogger(__name__)
+
+# 匯出時每批讀取的筆數
+EXPORT_BATCH_SIZE = 500
+
+
+def encode_cursor(*parts) -> str:
+    """將分頁位置編碼為不透明的游標字串"""
+    return base64.urlsafe_b64encode(json.dumps(parts, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """解碼游標字串
+
+    Args:
+        cursor: encode_cursor() 產生的游標
+        size: 預期的欄位數
+
+    Raises:
+        ValueError: 游標格式不正確
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("無效的分頁游標")
+    if not isinstance(parts, list) or len(parts) != size:
+        raise ValueError("無效的分頁游標")
+    return parts
+
+
+class StorageBackend(ABC):
+    """存儲後端基底類別
+
+    序號與對話記錄的存取由各後端實作；會話由 SESSION_BACKEND 選擇的會話存儲保存，由基底類別統一處理。
+    """
+
+    backend_name = "base"
+
+    def __init__(self):
+        self.sessions = create_session_store()
+
+    # ---- 序號 ----
+
+    @abstractmethod
+    def generate_access_code(self, code_type: str = "one_time", description: str = "") -> str:
+        """生成存取序號"""
+
+    @abstractmethod
+    def validate_access_code(self, code: str) -> Dict:
+        """驗證存取序號"""
+
+    @abstractmethod
+    def use_access_code(self, code: str) -> bool:
+        """標記序號為已使用（僅限一次性序號）"""
+
+    @abstractmethod
+    def redeem_access_code(self, code: str) -> Dict:
+        """驗證並兌換序號 (登入用)
+
+        一次性序號以原子的 compare-and-set 標記為已使用，並發請求中只有一個能成功。
+
+        Returns:
+            dict: 與 validate_access_code() 相同格式的驗證結果
+        """
+
+    @abstractmethod
+    def reset_access_code(self, code: str, admin_code: str = None) -> Dict:
+        """重置一次性序號（管理員功能）"""
+
+    @abstractmethod
+    def delete_access_code(self, code: str, admin_code: str = None) -> Dict:
+        """刪除序號（管理員功能）"""
+
+    @abstractmethod
+    def create_custom_code(self, custom_code: str, code_type: str = "one_time", description: str = "", admin_code: str = None) -> Dict:
+        """創建自定義序號（管理員功能）"""
+
+    @abstractmethod
+    def get_access_codes(self) -> List[Dict]:
+        """獲取所有序號"""
+
+    @abstractmethod
+    def iter_access_codes(self, code_type: str = None, is_used: bool = None,
+                          start: str = None, end: str = None) -> Iterator[Dict]:
+        """逐筆迭代符合條件的序號 (分批讀取，供匯出使用)
+
+        Args:
+            code_type: 序號類型
+            is_used: 是否已使用
+            start: 最早建立時間 (ISO 格式，含)
+            end: 最晚建立時間 (ISO 格式，含)
+        """
+
+    def is_admin_code(self, admin_code: str) -> bool:
+        """檢查是否為有效的管理員 (永久) 序號"""
+        admin_validation = self.validate_access_code(admin_code)
+        return admin_validation["valid"] and admin_validation["type"] == "permanent"
+
+    def new_code_record(self, code: str, code_type: str, description: str) -> Dict:
+        """建立新序號記錄"""
+        new_code = {
+            "code": code,
+            "type": code_type,
+            "description": description,
+            "is_used": False,
+            "created_at": datetime.now().isoformat() + "Z",
+            "used_at": None,
+            "usage_history": []
+        }
+
+        if code_type == "one_time":
+            new_code["reset_count"] = 0
+
+        return new_code
+
+    def ensure_admin_code(self) -> bool:
+        """確保管理員序號存在
+
+        Returns:
+            bool: 是否新建了管理員序號
+        """
+        if self.validate_access_code(ADMIN_ACCESS_CODE)["valid"]:
+            return False
+        self.create_custom_code(ADMIN_ACCESS_CODE, "permanent", "管理員測試用永久通行證")
+        return True
+
+    # ---- 會話 ----
+
+    def create_session(self, access_code: str, ip_address: str, user_agent: str = "",
+                       code_type: str = None) -> str:
+        """創建會話
+
+        Args:
+            code_type: 已驗證的序號類型，會快照保存在會話中；未提供時查詢序號取得
+        """
+        if code_type is None:
+            code_validation = self.validate_access_code(access_code)
+            code_type = code_validation.get("type", "unknown") if code_validation["valid"] else "unknown"
+        return self.sessions.create(access_code, ip_address, user_agent, code_type).session_id
+
+    def validate_session(self, session_id: str) -> Dict:
+        """驗證會話
+
+        序號類型取自建立會話時的快照，不需再查詢序號；
+        序號被刪除或重置時，相關會話已由 invalidate_code_sessions() 移除。
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return {"valid": False, "reason": "會話無效或已過期"}
+
+        if not session.is_active:
+            return {"valid": False, "reason": "會話已失效"}
+
+        return {
+            "valid": True,
+            "session_id": session.session_id,
+            "access_code": session.access_code,
+            "ip_address": session.ip_address,
+            "code_type": session.code_type
+        }
+
+    def invalidate_code_sessions(self, code: str) -> int:
+        """讓使用指定序號建立的會話全部失效 (序號被刪除或重置時呼叫)"""
+        removed = self.sessions.invalidate_code(code)
+        if removed:
+            logger.info(f"序號 {code} 已變更，移除相關會話 {removed} 筆")
+        return removed
+
+    def update_session_activity(self, session_id: str):
+        """更新會話活動時間"""
+        self.sessions.touch(session_id)
+
+    # ---- 對話記錄 ----
+
+    def make_log_entry(self, session_id: str, access_code: str, user_message: str,
+                       bot_response: str, brand: str, ip_address: str, user_agent: str = "") -> Dict:
+        """建立對話記錄項目"""
+        return {
+            "timestamp": datetime.now().isoformat() + "Z",
+            "session_id": session_id,
+            "access_code": access_code,
+            "user_message": user_message,
+            "bot_response": bot_response,
+            "brand": brand,
+            "ip_address": ip_address,
+            "user_agent": user_agent
+        }
+
+    def log_chat(self, session_id: str, access_code: str, user_message: str,
+                 bot_response: str, brand: str, ip_address: str, user_agent: str = ""):
+        """記錄對話"""
+        log_entry = self.make_log_entry(
+            session_id, access_code, user_message, bot_response, brand, ip_address, user_agent
+        )
+        self.log_chats([log_entry])
+
+    @abstractmethod
+    def log_chats(self, entries: List[Dict]):
+        """批次記錄多筆對話（一次寫入）"""
+
+    @abstractmethod
+    def get_chat_logs(self, access_code: str = None, limit: int = 100) -> List[Dict]:
+        """獲取對話記錄（由新到舊）"""
+
+    @abstractmethod
+    def query_chat_logs(self, access_code: str = None, brand: str = None, session_id: str = None,
+                        start: str = None, end: str = None, limit: int = 100,
+                        cursor: Optional[str] = None) -> Dict:
+        """依條件分頁查詢對話記錄（由新到舊）
+
+        Args:
+            access_code: 序號
+            brand: 品牌識別碼
+            session_id: 會話 ID
+            start: 最早時間 (ISO 格式，含)
+            end: 最晚時間 (ISO 格式，含)
+            limit: 每頁筆數
+            cursor: 上一頁返回的 next_cursor
+
+        Returns:
+            dict: {"logs": 記錄列表, "next_cursor": 下一頁游標，沒有更多記錄時為 None}
+
+        Raises:
+            ValueError: 游標格式不正確
+        """
+
+    def iter_chat_logs(self, access_code: str = None, brand: str = None, session_id: str = None,
+                       start: str = None, end: str = None,
+                       batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict]:
+        """逐筆迭代符合條件的對話記錄（由新到舊）
+
+        以 query_chat_logs() 的游標分頁逐批讀取，記憶體用量只與 batch_size 有關。
+        """
+        cursor = None
+        while True:
+            page = self.query_chat_logs(access_code, brand, session_id, start, end, batch_size, cursor)
+            yield from page["logs"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return
+
+    # ---- 其他 ----
+
+    def get_stats(self) -> dict:
+        """獲取存儲統計"""
+        return {"backend": self.backend_name}
+
+    def close(self):
+        """釋放檔案或連線資源"""
+        self.sessions.close()
@@ -0,0 +1,241 @@
+"""
+文字處理工具模組
+提供中文句子切分、文字正規化等共用功能
+"""
+
+import math
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from config import RESPONSE_LENGTH_SETTINGS
+
+# 句子結尾標點 (含全形與半形)
+SENTENCE_ENDINGS = "。！？!?"
+
+# 可附加在句尾標點之後的收尾符號
+CLOSING_PUNCTUATION = "」』）)\"'”’"
+
+# 句子過長需要截斷時，優先在這些停頓處切開
+CLAUSE_BREAKS = "，、；：,;:"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _is_punctuation(char: str) -> bool:
+    """判斷字元是否為標點符號"""
+    return unicodedata.category(char).startswith("P")
+
+
+def normalize_text(text: str) -> str:
+    """正規化文字，用於產生快取鍵
+
+    統一全形/半形字元 (NFKC)、合併連續空白，並去除首尾的空白與標點，
+    讓「您好！」與「 您好 」視為同一段文字。
+
+    Args:
+        text: 原始文字
+
+    Returns:
+        str: 正規化後的文字
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+
+    start, end = 0, len(text)
+    while start < end and (_is_punctuation(text[start]) or text[start].isspace()):
+        start += 1
+    while end > start and (_is_punctuation(text[end - 1]) or text[end - 1].isspace()):
+        end -= 1
+    return text[start:end]
+
+
+class SentenceSplitter:
+    """增量式句子切分器
+
+    逐段餵入串流文字，遇到句尾標點時切出完整句子，其餘文字保留在緩衝區中等待後續片段。
+    """
+
+    def __init__(self, endings: str = SENTENCE_ENDINGS):
+        """初始化句子切分器
+
+        Args:
+            endings: 視為句子結尾的標點字元
+        """
+        self.endings = endings
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """餵入一段文字
+
+        Args:
+            text: 串流片段
+
+        Returns:
+            list: 本次可切出的完整句子
+        """
+        self._buffer += text
+        sentences = []
+        start = 0
+        i = 0
+        length = len(self._buffer)
+
+        while i < length:
+            if self._buffer[i] in self.endings or self._buffer[i] == "\n":
+                end = i + 1
+                # 連續的句尾標點與收尾引號歸入同一句
+                while end < length and (self._buffer[end] in self.endings or self._buffer[end] in CLOSING_PUNCTUATION):
+                    end += 1
+                # 標點位於緩衝區末端時，下一個片段可能還有收尾符號，暫不切分
+                if end == length and self._buffer[i] != "\n":
+                    break
+                sentence = self._buffer[start:end].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = end
+                i = end
+                continue
+            i += 1
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """取出緩衝區中剩餘的文字
+
+        Returns:
+            list: 剩餘的句子 (可能沒有句尾標點)
+        """
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
+
+
+def split_sentences(text: str) -> List[str]:
+    """將完整文字切分為句子
+
+    Args:
+        text: 要切分的文字
+
+    Returns:
+        list: 句子列表
+    """
+    splitter = SentenceSplitter()
+    return splitter.feed(text) + splitter.flush()
+
+
+def clip_sentence(sentence: str, max_chars: int) -> str:
+    """將單一過長的句子截短到 max_chars 以內
+
+    優先在最後一個逗號等停頓處切開，沒有停頓時直接截斷。
+
+    Args:
+        sentence: 句子
+        max_chars: 字數上限
+
+    Returns:
+        str: 截短後的句子
+    """
+    if len(sentence) <= max_chars:
+        return sentence
+    head = sentence[:max_chars]
+    for i in range(len(head) - 1, 0, -1):
+        if head[i] in CLAUSE_BREAKS:
+            return head[:i]
+    return head
+
+
+class ResponseLimiter:
+    """依字數上限逐句篩選串流文字
+
+    只輸出完整句子，加入下一句會超過上限時即停止，之後的文字全部捨棄；
+    第一句本身就超過上限時以 clip_sentence() 截短。
+    輸出的片段保留原文中句子之間的空白與換行。
+    """
+
+    def __init__(self, max_chars: Optional[int] = None):
+        """初始化
+
+        Args:
+            max_chars: 字數上限，None 表示不限制
+        """
+        self.max_chars = max_chars
+        self.length = 0  # 已輸出的句子字數
+        self.received = 0  # 收到的原始字數
+        self.truncated = False
+        self._splitter = SentenceSplitter()
+        self._raw = ""
+
+    def feed(self, text: str) -> List[str]:
+        """餵入一段串流文字
+
+        Returns:
+            list: 本次可輸出的片段，每個片段以一個完整句子結尾
+        """
+        self.received += len(text)
+        if self.truncated:
+            return []
+        self._raw += text
+        return self._accept(self._splitter.feed(text))
+
+    def passthrough(self, text: str) -> str:
+        """不需切分句子時直接轉送片段，只計入收到的字數 (不可與 feed() 混用)"""
+        self.received += len(text)
+        return text
+
+    def flush(self) -> List[str]:
+        """串流結束時取出剩餘的句子"""
+        if self.truncated:
+            return []
+        return self._accept(self._splitter.flush())
+
+    def _accept(self, sentences: List[str]) -> List[str]:
+        segments = []
+        for sentence in sentences:
+            if self.max_chars is not None and self.length + len(sentence) > self.max_chars:
+                self.truncated = True
+                if self.length > 0:
+                    break
+                sentence = clip_sentence(sentence, self.max_chars)
+
+            # 句子是原文去除首尾空白後的子字串，連同前方的空白一起輸出
+            end = self._raw.find(sentence) + len(sentence)
+            segments.append(self._raw[:end])
+            self._raw = self._raw[end:]
+            self.length += len(sentence)
+
+            if self.truncated:
+                break
+        return segments
+
+
+def truncate_sentences(text: str, max_chars: Optional[int]) -> Tuple[str, bool]:
+    """在句子邊界將文字截斷到字數上限以內
+
+    Args:
+        text: 完整文字
+        max_chars: 字數上限，None 表示不限制
+
+    Returns:
+        tuple: (截斷後的文字, 是否有截斷)
+    """
+    limiter = ResponseLimiter(max_chars)
+    segments = limiter.feed(text) + limiter.flush()
+    if not limiter.truncated:
+        return text, False
+    return "".join(segments).strip(), True
+
+
+def resolve_length_limit(max_length: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+    """將請求的 max_length (字數) 換算為 (截斷字數, 輸出 token 上限)
+
+    max_length 未提供或不大於 0 時不限制長度
+    """
+    if not max_length or max_length <= 0:
+        return None, None
+    max_chars = math.ceil(max_length * RESPONSE_LENGTH_SETTINGS["length_tolerance"])
+    max_output_tokens = max(
+        math.ceil(max_chars * RESPONSE_LENGTH_SETTINGS["tokens_per_char"]),
+        RESPONSE_LENGTH_SETTINGS["min_output_tokens"]
+    )
+    return max_chars, max_output_tokens
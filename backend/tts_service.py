@@ -6,10 +6,26 @@ import asyncio
 import edge_tts
 import base64
 import logging
-from config import TTS_VOICES, DEFAULT_SETTINGS
+from typing import AsyncIterator, Dict, Optional, Tuple
+from config import TTS_VOICES, DEFAULT_SETTINGS, TTS_SETTINGS, TTS_CACHE_SETTINGS
+from cache import LRUCache
+from concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded, SingleFlight
+from text_utils import normalize_text
 
 logger = logging.getLogger(__name__)
 
+def encode_audio(audio_data: bytes) -> str:
+    """將音訊位元組編碼為 data URI
+    
+    Args:
+        audio_data: 音訊位元組
+        
+    Returns:
+        格式為 data:audio/mpeg;base64,{data} 的字串
+    """
+    audio_base64 = base64.b64encode(audio_data).decode()
+    return f"data:audio/mpeg;base64,{audio_base64}"
+
 class TTSService:
     """TTS 服務類別"""
     
@@ -19,83 +35,169 @@ class TTSService:
         Args:
             voice: 語音模型名稱，預設使用配置中的預設語音
         """
-        self.voice = voice or DEFAULT_SETTINGS["tts_voice"]
-    
-    def set_voice(self, voice: str):
-        """設定語音模型
+        # 預設語音只在初始化時設定，每次請求的語音以參數傳入，不共用可變狀態
+        self.default_voice = voice or DEFAULT_SETTINGS["tts_voice"]
         
-        Args:
-            voice: 語音模型名稱
-        """
-        if voice in TTS_VOICES:
-            self.voice = voice
-            logger.info(f"TTS 語音已切換為: {TTS_VOICES[voice]}")
-        else:
-            logger.warning(f"不支援的語音模型: {voice}")
+        # 限制同時進行的 edge-tts 連線數，超出上限的請求排隊等待
+        self.limiter = ConcurrencyLimiter(
+            "tts",
+            TTS_SETTINGS["max_concurrency"],
+            TTS_SETTINGS["max_waiting"]
+        )
+        
+        # 音訊快取：以 (語音, 正規化文字) 為鍵，依總位元組數淘汰
+        self.cache_enabled = TTS_CACHE_SETTINGS["enabled"]
+        self.cache = LRUCache(
+            max_entries=TTS_CACHE_SETTINGS["max_entries"],
+            max_bytes=TTS_CACHE_SETTINGS["max_bytes"]
+        )
+        # 相同語音與文字的並發合成請求共用一次 edge-tts 呼叫
+        self.singleflight = SingleFlight("tts")
+        # 預先渲染的常駐音訊 (例如預設問題的回答)，不受快取淘汰影響
+        self.pinned: Dict[Tuple[str, str], bytes] = {}
     
-    async def generate_audio(self, text: str) -> str:
-        """生成語音
+    def _resolve_voice(self, voice: str = None) -> str:
+        """解析本次請求使用的語音，不支援的語音改用預設語音"""
+        voice = voice or self.default_voice
+        if voice not in TTS_VOICES:
+            logger.warning(f"不支援的語音模型: {voice}，使用預設語音")
+            voice = self.default_voice
+        return voice
+    
+    async def stream_audio(self, text: str, voice: str = None) -> AsyncIterator[bytes]:
+        """以串流方式合成語音，逐段返回 edge-tts 產生的 MP3 音訊
+        
+        快取命中時直接返回快取音訊；未命中時邊轉送邊收集，完成後寫入快取。
+        每個 edge-tts 連線在串流期間佔用一個並發名額。
         
         Args:
             text: 要轉換的文字
+            voice: 語音模型，預設使用服務的預設語音
             
-        Returns:
-            base64 編碼的音訊數據，格式為 data:audio/wav;base64,{data}
-            如果失敗則返回 None
-        """
-        try:
-            if not text or not text.strip():
-                logger.warning("TTS: 空文字輸入")
-                return None
-            
-            # 限制文字長度
-            if len(text) > 1000:
-                text = text[:1000] + "..."
-                logger.info("TTS: 文字過長，已截斷")
+        Yields:
+            bytes: MP3 音訊片段
             
-            logger.info(f"TTS: 開始生成語音，使用語音: {TTS_VOICES.get(self.voice, self.voice)}")
+        Raises:
+            ConcurrencyLimitExceeded: 等待佇列已滿時
+            Exception: edge-tts 連線或合成失敗時
+        """
+        voice = self._resolve_voice(voice)
+        
+        if not text or not text.strip():
+            logger.warning("TTS: 空文字輸入")
+            return
+        
+        # 限制文字長度
+        if len(text) > 1000:
+            text = text[:1000] + "..."
+            logger.info("TTS: 文字過長，已截斷")
+        
+        cache_key = (voice, normalize_text(text))
+        pinned = self.pinned.get(cache_key)
+        if pinned is not None:
+            yield pinned
+            return
+        
+        if self.cache_enabled:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("TTS: 使用快取音訊")
+                yield cached
+                return
+        
+        audio_chunks = []
+        async with self.limiter.acquire() as wait_time:
+            if wait_time > 0.5:
+                logger.info(f"TTS: 排隊 {wait_time:.2f} 秒 (排隊中: {self.limiter.waiting})")
+            logger.info(f"TTS: 開始生成語音，使用語音: {TTS_VOICES.get(voice, voice)}")
             
             # 創建 EdgeTTS 通信對象
-            communicate = edge_tts.Communicate(text, self.voice)
-            audio_data = b""
+            communicate = edge_tts.Communicate(text, voice)
             
-            # 收集音頻數據
+            # 轉送音頻數據 (文字長度已限制，收集的音訊量有上限)
             async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_data += chunk["data"]
-            
-            if len(audio_data) == 0:
-                logger.warning("TTS: EdgeTTS 返回空音頻數據")
-                return None
+                if chunk["type"] == "audio" and chunk["data"]:
+                    audio_chunks.append(chunk["data"])
+                    yield chunk["data"]
+        
+        if not audio_chunks:
+            logger.warning("TTS: EdgeTTS 返回空音頻數據")
+            return
+        
+        logger.info("TTS: 語音生成成功")
+        if self.cache_enabled:
+            self.cache.set(cache_key, b"".join(audio_chunks))
+    
+    async def synthesize(self, text: str, voice: str = None) -> Optional[bytes]:
+        """合成語音並返回原始音訊位元組
+        
+        不會修改服務的預設語音，可安全地並發呼叫；
+        相同語音與正規化文字的並發請求會合併為一次 edge-tts 呼叫
+        
+        Args:
+            text: 要轉換的文字
+            voice: 語音模型，預設使用服務的預設語音
             
-            if audio_data:
-                audio_base64 = base64.b64encode(audio_data).decode()
-                logger.info("TTS: 語音生成成功")
-                return f"data:audio/wav;base64,{audio_base64}"
-            else:
-                logger.warning("TTS: 未生成音訊數據")
-                return None
+        Returns:
+            MP3 音訊位元組，如果失敗則返回 None
+        """
+        try:
+            voice = self._resolve_voice(voice)
+            return await self.singleflight.do(
+                (voice, normalize_text(text or "")),
+                lambda: self._collect_audio(text, voice)
+            )
+        
+        except ConcurrencyLimitExceeded as e:
+            logger.warning(f"TTS 請求過多: {e}")
+            return None
                 
         except Exception as e:
             logger.error(f"TTS 錯誤: {e}")
             # 即使出錯也不要拋出異常，返回 None 讓上層處理
             return None
     
-    async def generate_audio_with_voice(self, text: str, voice: str) -> str:
-        """使用指定語音生成語音
+    async def _collect_audio(self, text: str, voice: str) -> Optional[bytes]:
+        """收集串流合成的完整音訊"""
+        audio_chunks = [chunk async for chunk in self.stream_audio(text, voice)]
+        return b"".join(audio_chunks) or None
+    
+    async def generate_audio(self, text: str, voice: str = None) -> str:
+        """生成語音
         
         Args:
             text: 要轉換的文字
-            voice: 指定的語音模型
+            voice: 語音模型，預設使用服務的預設語音
             
         Returns:
-            base64 編碼的音訊數據
+            base64 編碼的音訊數據，格式為 data:audio/mpeg;base64,{data}
+            如果失敗則返回 None
+        """
+        audio_data = await self.synthesize(text, voice)
+        if not audio_data:
+            return None
+        return encode_audio(audio_data)
+    
+    def pin_audio(self, text: str, audio_data: bytes, voice: str = None):
+        """將音訊設為常駐，之後相同語音與文字的請求直接返回此音訊
+        
+        Args:
+            text: 音訊對應的文字
+            audio_data: MP3 音訊位元組
+            voice: 語音模型，預設使用服務的預設語音
         """
-        original_voice = self.voice
-        self.set_voice(voice)
-        result = await self.generate_audio(text)
-        self.voice = original_voice  # 恢復原始語音設定
-        return result
+        voice = self._resolve_voice(voice)
+        self.pinned[(voice, normalize_text(text))] = audio_data
+    
+    def unpin_audio(self, text: str, voice: str = None):
+        """移除常駐音訊
+        
+        Args:
+            text: 音訊對應的文字
+            voice: 語音模型，預設使用服務的預設語音
+        """
+        voice = self._resolve_voice(voice)
+        self.pinned.pop((voice, normalize_text(text)), None)
     
     def get_available_voices(self) -> dict:
         """獲取可用的語音列表
@@ -105,13 +207,28 @@ class TTSService:
         """
         return TTS_VOICES.copy()
     
+    def get_stats(self) -> dict:
+        """獲取 TTS 統計
+        
+        Returns:
+            dict: 並發飽和度與音訊快取統計
+        """
+        return {
+            "concurrency": self.limiter.get_stats(),
+            "singleflight": self.singleflight.get_stats(),
+            "cache_enabled": self.cache_enabled,
+            "cache": self.cache.get_stats(),
+            "pinned_entries": len(self.pinned),
+            "pinned_bytes": sum(len(audio) for audio in self.pinned.values())
+        }
+    
     def get_current_voice(self) -> str:
-        """獲取當前使用的語音
+        """獲取預設語音
         
         Returns:
-            當前語音的顯示名稱
+            預設語音的顯示名稱
         """
-        return TTS_VOICES.get(self.voice, self.voice)
+        return TTS_VOICES.get(self.default_voice, self.default_voice)
 
 # 全域 TTS 服務實例
 tts_service = TTSService()
@@ -127,19 +244,48 @@ async def generate_audio(text: str, voice: str = None) -> str:
     Returns:
         base64 編碼的音訊數據
     """
-    if voice:
-        return await tts_service.generate_audio_with_voice(text, voice)
-    else:
-        return await tts_service.generate_audio(text)
+    return await tts_service.generate_audio(text, voice)
 
-def set_voice(voice: str):
-    """設定全域 TTS 語音的便利函數"""
-    tts_service.set_voice(voice)
+async def synthesize(text: str, voice: str = None) -> Optional[bytes]:
+    """合成原始音訊位元組的便利函數
+    
+    Args:
+        text: 要轉換的文字
+        voice: 可選的語音模型
+        
+    Returns:
+        MP3 音訊位元組
+    """
+    return await tts_service.synthesize(text, voice)
+
+def stream_audio(text: str, voice: str = None) -> AsyncIterator[bytes]:
+    """串流合成 MP3 音訊的便利函數
+    
+    Args:
+        text: 要轉換的文字
+        voice: 可選的語音模型
+        
+    Returns:
+        MP3 音訊片段的非同步迭代器
+    """
+    return tts_service.stream_audio(text, voice)
 
 def get_available_voices() -> dict:
     """獲取可用語音的便利函數"""
     return tts_service.get_available_voices()
 
+def pin_audio(text: str, audio_data: bytes, voice: str = None):
+    """設定常駐音訊的便利函數"""
+    tts_service.pin_audio(text, audio_data, voice)
+
+def unpin_audio(text: str, voice: str = None):
+    """移除常駐音訊的便利函數"""
+    tts_service.unpin_audio(text, voice)
+
+def get_tts_stats() -> dict:
+    """獲取 TTS 統計的便利函數"""
+    return tts_service.get_stats()
+
 def get_current_voice() -> str:
-    """獲取當前語音的便利函數"""
+    """獲取預設語音的便利函數"""
     return tts_service.get_current_voice()
@@ -407,48 +407,33 @@ createApp({
             }
         },
         
-        // 導出對話記錄
+        // 導出對話記錄 (由伺服器串流產生完整 CSV，不受畫面載入筆數限制)
         exportLogs() {
-            if (this.logs.length === 0) {
-                alert('沒有記錄可以導出');
-                return;
+            const params = { format: 'csv' };
+            if (this.selectedLogCode) {
+                params.access_code = this.selectedLogCode;
             }
-            
+            this.downloadExport('/api/admin/export/logs', params);
+        },
+        
+        // 導出序號
+        exportCodes() {
+            this.downloadExport('/api/admin/export/codes', { format: 'csv' });
+        },
+        
+        // 透過連結下載匯出檔，瀏覽器會邊接收邊寫入檔案
+        downloadExport(path, params) {
             try {
-                // 準備 CSV 數據
-                const headers = ['時間', '序號', '品牌', 'IP地址', '用戶代理', '用戶訊息', 'AI回應'];
-                const csvContent = [
-                    headers.join(','),
-                    ...this.logs.map(log => [
-                        `"${this.formatDate(log.timestamp)}"`,
-                        `"${log.access_code}"`,
-                        `"${log.brand}"`,
-                        `"${log.ip_address}"`,
-                        `"${log.user_agent || ''}"`,
-                        `"${(log.user_message || '').replace(/"/g, '""')}"`,
-                        `"${(log.bot_response || '').replace(/"/g, '""')}"`
-                    ].join(','))
-                ].join('\n');
-                
-                // 創建並下載文件
-                const blob = new Blob(['\ufeff' + csvContent], { type: 'text/csv;charset=utf-8;' });
+                const query = new URLSearchParams({ admin_code: this.adminCode, ...params });
                 const link = document.createElement('a');
-                const url = URL.createObjectURL(blob);
-                link.setAttribute('href', url);
-                
-                // 生成文件名
-                const now = new Date();
-                const dateStr = now.toISOString().slice(0, 10);
-                const timeStr = now.toTimeString().slice(0, 8).replace(/:/g, '-');
-                const filename = `對話記錄_${dateStr}_${timeStr}.csv`;
-                
-                link.setAttribute('download', filename);
+                link.setAttribute('href', `${this.API_BASE_URL}${path}?${query.toString()}`);
+                link.setAttribute('download', '');
                 link.style.visibility = 'hidden';
                 document.body.appendChild(link);
                 link.click();
                 document.body.removeChild(link);
                 
-                this.showSuccess('對話記錄導出成功！');
+                this.showSuccess('已開始下載導出檔案！');
             } catch (error) {
                 console.error('導出失敗:', error);
                 alert('導出失敗，請稍後再試');